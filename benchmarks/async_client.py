@@ -0,0 +1,135 @@
+"""asyncio client vs. thread-pooled sync client on small files.
+
+Starts a local cluster (master and nodes as processes), then uploads and
+downloads the same set of small files with:
+
+- sync:   dfs_client_lib.upload_file/download_file in a ThreadPoolExecutor
+- async:  dfs_client_async.AsyncDFSClient with asyncio.gather
+
+and reports ops/sec, p50/p99 latency and connections opened per phase.
+
+Usage:
+    python benchmarks/async_client.py
+    python benchmarks/async_client.py --files 5000 --size 2048 --threads 64 --concurrency 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_client_async import AsyncDFSClient  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    resp = fn(*args)
+    return time.perf_counter() - start, resp.get("status") == "ok"
+
+
+def run_sync(paths, out_dir, threads):
+    results = {}
+    with ThreadPoolExecutor(threads) as pool:
+        for op in ("upload", "download"):
+            if op == "upload":
+                jobs = [(dfs.upload_file, p) for p in paths]
+            else:
+                jobs = [(dfs.download_file, os.path.basename(p),
+                         os.path.join(out_dir, os.path.basename(p))) for p in paths]
+            start = time.perf_counter()
+            outcomes = list(pool.map(lambda job: timed(*job), jobs))
+            results[op] = summarize(outcomes, time.perf_counter() - start)
+    return results
+
+
+async def run_async(paths, out_dir, concurrency):
+    results = {}
+    # Latency is measured once an operation gets a slot, like the time a
+    # sync call spends on a pool thread
+    slots = asyncio.Semaphore(concurrency)
+    async with AsyncDFSClient(max_transfers=concurrency) as client:
+        for op in ("upload", "download"):
+            async def one(path):
+                async with slots:
+                    start = time.perf_counter()
+                    if op == "upload":
+                        resp = await client.upload(path)
+                    else:
+                        name = os.path.basename(path)
+                        resp = await client.download(name, os.path.join(out_dir, name))
+                    return time.perf_counter() - start, resp.get("status") == "ok"
+
+            opened = client.pool.opened
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(*(one(p) for p in paths))
+            results[op] = summarize(outcomes, time.perf_counter() - start)
+            results[op]["connections"] = client.pool.opened - opened
+    return results
+
+
+def summarize(outcomes, elapsed):
+    latencies = [lat for lat, ok in outcomes if ok]
+    return {
+        "ops": len(latencies),
+        "errors": len(outcomes) - len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async vs. thread-pooled sync client on small files")
+    parser.add_argument("--port", type=int, default=19200, help="Master port (nodes use the following ports)")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=1024, help="File size in bytes")
+    parser.add_argument("--threads", type=int, default=32, help="Thread pool size for the sync client")
+    parser.add_argument("--concurrency", type=int, default=256, help="Transfer semaphore for the async client")
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+    results = {}
+    with LocalCluster(args.nodes, args.port, mode="process") as cluster:
+        for client in ("sync", "async"):
+            src = os.path.join(cluster.work_dir, f"{client}_src")
+            out = os.path.join(cluster.work_dir, f"{client}_out")
+            os.makedirs(src)
+            os.makedirs(out)
+            paths = []
+            for i in range(args.files):
+                path = os.path.join(src, f"{client}_{i}.bin")
+                with open(path, "wb") as f:
+                    f.write(os.urandom(args.size))
+                paths.append(path)
+            if client == "sync":
+                results[client] = run_sync(paths, out, args.threads)
+            else:
+                results[client] = asyncio.run(run_async(paths, out, args.concurrency))
+
+    print(f"{args.files} files of {args.size} B; sync: {args.threads} threads, "
+          f"async: up to {args.concurrency} concurrent transfers")
+    for client, ops in results.items():
+        for op, r in ops.items():
+            conns = f"  conns={r['connections']}" if "connections" in r else ""
+            print(f"  {client:5s} {op:8s} {r['ops_per_sec']:8.0f} ops/s  p50={r['p50_ms']:.1f} ms  "
+                  f"p99={r['p99_ms']:.1f} ms  errors={r['errors']}{conns}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Bulk deletes: per-node deletes by the client vs. tombstones on the master.
+
+Starts a local cluster (master and nodes as processes, heartbeats every
+--heartbeat-interval seconds), puts --files small files on the nodes (written
+straight into their storage directories and registered with UPLOAD_DONE, two
+replicas each), kills node 1 and deletes every file, in three ways:
+
+- per-node:   what delete_file used to do for each file: DOWNLOAD_REQUEST,
+              DELETE_FILE to every alive replica, then DELETE_DONE
+- tombstone:  delete_file, one DELETE_REQUEST per file
+- batch:      delete_files, DELETE_REQUEST with up to DELETE_BATCH names
+
+It reports how long the client took (files/s), how long until the alive
+nodes had deleted every replica, and - after node 1 is started again - how
+long until it had deleted its replicas too, or how many it still holds after
+--settle seconds. Since the master keeps tombstones for DELETE_DONE as well,
+node 1 also catches up in the per-node round; before, those replicas leaked.
+
+Usage:
+    python benchmarks/bulk_delete.py
+    python benchmarks/bulk_delete.py --files 20000 --heartbeat-interval 1
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+
+NODES = 3
+
+
+def populate(cluster, names, size):
+    """Two replicas per file on nodes i and i+1 (mod NODES), registered with the master."""
+    data = os.urandom(size)
+    with socket.create_connection((cluster.host, cluster.base_port)) as s:
+        for i, name in enumerate(names):
+            holders = [1 + i % NODES, 1 + (i + 1) % NODES]
+            for k in holders:
+                with open(os.path.join(cluster.storage_dir(k), name), "wb") as f:
+                    f.write(data)
+            addrs = [f"{cluster.host}:{cluster.node_port(k)}" for k in holders]
+            dfs.send_json(s, {"type": "UPLOAD_DONE", "filename": name, "nodes": addrs, "keepalive": True})
+            dfs.recv_json(s)
+
+
+def delete_per_node(name):
+    resp = dfs.send_to_master({"type": "DOWNLOAD_REQUEST", "filename": name})
+    for addr_str in resp.get("nodes", []):
+        try:
+            with socket.create_connection(dfs.parse_addr(addr_str)) as s:
+                dfs.send_json(s, {"type": "DELETE_FILE", "filename": name})
+                dfs.recv_json(s)
+        except OSError:
+            pass  # e.g. the node is down and the master has not noticed yet
+    dfs.send_to_master({"type": "DELETE_DONE", "filename": name})
+
+
+def remaining(cluster, i, prefix):
+    return sum(1 for name in os.listdir(cluster.storage_dir(i)) if name.startswith(prefix))
+
+
+def wait_empty(cluster, nodes, prefix, timeout):
+    """Seconds until none of nodes hold files starting with prefix, or None after timeout."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if not any(remaining(cluster, i, prefix) for i in nodes):
+            return time.perf_counter() - start
+        time.sleep(0.02)
+    return None
+
+
+def run(args, mode, port):
+    os.environ["DFS_HEARTBEAT_INTERVAL"] = str(args.heartbeat_interval)
+    with LocalCluster(NODES, port, mode="process", replication_factor=2) as cluster:
+        prefix = f"bulk_{mode}_"
+        names = [f"{prefix}{i:07d}.bin" for i in range(args.files)]
+        populate(cluster, names, args.file_bytes)
+        cluster.kill_node(1)
+
+        start = time.perf_counter()
+        if mode == "per-node":
+            for name in names:
+                delete_per_node(name)
+        elif mode == "tombstone":
+            for name in names:
+                dfs.delete_file(name)
+        else:
+            dfs.delete_files(names)
+        client_s = time.perf_counter() - start
+        alive_s = wait_empty(cluster, (2, 3), prefix, args.settle)
+        alive_s = None if alive_s is None else client_s + alive_s
+
+        cluster.start_node(1)
+        cluster.wait_until_ready()
+        restarted_s = wait_empty(cluster, (1,), prefix, args.settle)
+        return {
+            "mode": mode,
+            "client_s": client_s,
+            "files_per_s": args.files / client_s,
+            "alive_nodes_clean_s": alive_s,
+            "restarted_node_clean_s": restarted_s,
+            "restarted_node_leftover": remaining(cluster, 1, prefix),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk deletes: per-node client deletes vs. master tombstones")
+    parser.add_argument("--port", type=int, default=19750, help="Master port (nodes use the next ports)")
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--file-bytes", type=int, default=1024)
+    parser.add_argument("--heartbeat-interval", type=float, default=0.5)
+    parser.add_argument("--settle", type=float, default=30,
+                        help="Seconds to wait for nodes to delete their replicas")
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    results = []
+    for k, mode in enumerate(("per-node", "tombstone", "batch")):
+        r = run(args, mode, args.port + 10 * k)
+        results.append(r)
+        alive = f"{r['alive_nodes_clean_s']:.2f}s" if r["alive_nodes_clean_s"] is not None else "not done"
+        restarted = (f"clean after {r['restarted_node_clean_s']:.2f}s" if r["restarted_node_clean_s"] is not None
+                     else f"{r['restarted_node_leftover']} files left")
+        print(f"{mode:9s}: client {r['client_s']:6.2f}s ({r['files_per_s']:7.0f} files/s), "
+              f"alive nodes clean after {alive}, restarted node {restarted}")
+
+    print(f"{args.files} files of {args.file_bytes} bytes, 2 replicas on {NODES} nodes, node 1 down while "
+          f"deleting, heartbeats every {args.heartbeat_interval}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
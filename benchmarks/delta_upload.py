@@ -0,0 +1,121 @@
+"""Delta upload vs. full re-upload of a large, slightly modified file.
+
+Starts a local cluster (master and nodes as processes), uploads a file of
+random data, then for each edit count changes that many small ranges of the
+file (plus one insertion, which shifts everything after it) and re-uploads
+it twice from the same starting point:
+
+- full:   upload_file(path)               every byte to every replica
+- delta:  upload_file(path, delta=True)   only changed blocks (dfs_delta)
+
+Bytes received by the storage nodes are read from their STATS counters, so
+they include headers, signatures and delta instructions.
+
+Times are measured over loopback, where moving bytes costs almost nothing;
+a delta upload instead pays for hashing the file on the client and the
+nodes, so it wins on wall-clock time only on links slower than that.
+
+Usage:
+    python benchmarks/delta_upload.py
+    python benchmarks/delta_upload.py --size-mb 256 --edits 1,10,100,1000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+import dfs_delta  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+
+
+def nodes_bytes_in():
+    total = 0
+    for node in dfs.get_nodes_status().get("nodes", []):
+        metrics = dfs.get_stats(node["address"]).get("metrics", {})
+        total += sum(r["bytes_in"] for r in metrics.get("requests", {}).values())
+    return total
+
+
+def edit(src, dst, edits, edit_size, rng):
+    """Copy src to dst with edits random ranges overwritten and one insertion."""
+    with open(src, "rb") as f:
+        data = bytearray(f.read())
+    for _ in range(edits):
+        pos = rng.randrange(len(data) - edit_size)
+        data[pos:pos + edit_size] = rng.randbytes(edit_size)
+    pos = rng.randrange(len(data))
+    data[pos:pos] = rng.randbytes(edit_size)
+    with open(dst, "wb") as f:
+        f.write(data)
+
+
+def timed_upload(path, delta):
+    before = nodes_bytes_in()
+    start = time.perf_counter()
+    resp = dfs.upload_file(path, delta=delta)
+    elapsed = time.perf_counter() - start
+    if resp.get("status") != "ok":
+        sys.exit(f"upload failed: {resp.get('message')}")
+    # nodes add a request's bytes to STATS when its handler returns, just
+    # after the client got its ack
+    time.sleep(0.5)
+    return {"seconds": elapsed, "bytes_sent": nodes_bytes_in() - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta upload vs. full re-upload of a modified file")
+    parser.add_argument("--port", type=int, default=19300, help="Master port (nodes use the following ports)")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--size-mb", type=int, default=128, help="File size in MiB")
+    parser.add_argument("--edits", default="1,10,100", help="Comma-separated numbers of edits to test")
+    parser.add_argument("--edit-size", type=int, default=100, help="Bytes per edit")
+    parser.add_argument("--block-size", type=int, default=dfs_delta.DELTA_BLOCK_SIZE,
+                        help="Delta signature block size in bytes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs_delta.DELTA_BLOCK_SIZE = args.block_size
+    rng = random.Random(args.seed)
+    results = []
+    with LocalCluster(args.nodes, args.port, mode="process") as cluster:
+        original = os.path.join(cluster.work_dir, "original.bin")
+        with open(original, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(rng.randbytes(1024 * 1024))
+        path = os.path.join(cluster.work_dir, "bigfile.bin")
+        modified = os.path.join(cluster.work_dir, "modified.bin")
+
+        for edits in [int(e) for e in args.edits.split(",")]:
+            edit(original, modified, edits, args.edit_size, rng)
+            r = {"edits": edits}
+            for mode in ("full", "delta"):
+                # put the original version back on the nodes, then upload the change
+                shutil.copyfile(original, path)
+                dfs.upload_file(path)
+                shutil.copyfile(modified, path)
+                r[mode] = timed_upload(path, delta=(mode == "delta"))
+            r["bytes_saved"] = r["full"]["bytes_sent"] - r["delta"]["bytes_sent"]
+            results.append(r)
+            print(f"{edits:5d} edits: full {r['full']['bytes_sent'] / 1e6:9.2f} MB in {r['full']['seconds']:6.2f}s"
+                  f" | delta {r['delta']['bytes_sent'] / 1e6:9.2f} MB in {r['delta']['seconds']:6.2f}s"
+                  f" | {r['full']['bytes_sent'] / max(r['delta']['bytes_sent'], 1):7.1f}x fewer bytes")
+
+    print(f"file: {args.size_mb} MiB, {args.edit_size} B per edit, block size {args.block_size} B, "
+          f"{args.nodes} nodes")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
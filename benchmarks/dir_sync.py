@@ -0,0 +1,105 @@
+"""Folder uploads: one upload_file per file vs. sync_directory.
+
+Starts a local cluster (master and nodes as processes) and fills folders
+with --files files of --file-kb KiB. It reports files/s and MB/s for:
+
+- serial:     upload_file for every file, one after another, without the
+              LOCK_HOLD_SECONDS demo pause (with it, each file takes 10 s
+              longer); what looping over `dfs_client_cli.py upload` did
+- sync N:     a first sync_directory with N workers, for each N in --workers
+
+and then, with the largest N, the time of a sync after:
+
+- nothing changed:    every file is skipped by size and mtime
+- all touched:        every mtime changed, content didn't; files are hashed, not sent
+- --changed% edited:  those files are uploaded again
+
+Usage:
+    python benchmarks/dir_sync.py
+    python benchmarks/dir_sync.py --files 20000 --workers 1,8,32
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+
+
+def make_folder(path, prefix, args):
+    os.makedirs(path)
+    for i in range(args.files):
+        with open(os.path.join(path, f"{prefix}_{i:07d}.bin"), "wb") as f:
+            f.write(os.urandom(args.file_kb * 1024))
+    return path
+
+
+def result(name, files, nbytes, elapsed):
+    return {"run": name, "files": files, "seconds": elapsed, "files_per_s": files / elapsed if elapsed else None,
+            "mb_per_s": nbytes / elapsed / 1e6 if elapsed else None}
+
+
+def timed_sync(name, folder, workers):
+    start = time.perf_counter()
+    resp = dfs.sync_directory(folder, workers=workers)
+    elapsed = time.perf_counter() - start
+    if resp["status"] != "ok":
+        sys.exit(f"{name}: {resp['message']}")
+    return result(name, resp["uploaded"], resp["stats"]["bytes_done"], elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Folder uploads: upload_file per file vs. sync_directory")
+    parser.add_argument("--port", type=int, default=19780, help="Master port (nodes use the next ports)")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-kb", type=int, default=16)
+    parser.add_argument("--workers", default="1,4,16", help="Comma-separated sync worker counts to compare")
+    parser.add_argument("--changed", type=float, default=1.0, help="Percent of files edited for the last sync")
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.SHORT_CIRCUIT_READS = False
+    results = []
+    with LocalCluster(args.nodes, args.port, mode="process") as cluster:
+        folder = make_folder(os.path.join(cluster.work_dir, "serial"), "serial", args)
+        names = sorted(os.listdir(folder))
+        start = time.perf_counter()
+        for name in names:
+            if dfs.upload_file(os.path.join(folder, name), lock_hold=0)["status"] != "ok":
+                sys.exit(f"upload of {name} failed")
+        results.append(result("serial", len(names), len(names) * args.file_kb * 1024, time.perf_counter() - start))
+
+        for workers in [int(w) for w in args.workers.split(",")]:
+            folder = make_folder(os.path.join(cluster.work_dir, f"sync{workers}"), f"sync{workers}", args)
+            results.append(timed_sync(f"sync {workers}", folder, workers))
+
+        results.append(timed_sync("nothing changed", folder, workers))
+        for name in os.listdir(folder):
+            os.utime(os.path.join(folder, name))
+        results.append(timed_sync("all touched", folder, workers))
+        rng = random.Random(1)
+        edited = [n for n in sorted(os.listdir(folder)) if n != dfs.SYNC_MANIFEST]
+        for name in rng.sample(edited, max(1, int(len(edited) * args.changed / 100))):
+            with open(os.path.join(folder, name), "r+b") as f:
+                f.write(os.urandom(64))
+        results.append(timed_sync(f"{args.changed:g}% edited", folder, workers))
+
+    for r in results:
+        rate = f"{r['files_per_s']:7.0f} files/s, {r['mb_per_s']:6.1f} MB/s" if r["files"] else "nothing sent"
+        print(f"{r['run']:16s}: {r['seconds']:7.2f}s, {r['files']:6d} files uploaded, {rate}")
+    print(f"{args.files} files of {args.file_kb} KiB per folder, {args.nodes} nodes")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
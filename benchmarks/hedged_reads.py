@@ -0,0 +1,96 @@
+"""Hedged-read latency benchmark.
+
+Starts a master and storage nodes in-process on localhost, makes nodes
+intermittently slow (simulating GC pauses / disk contention), then downloads
+the same files with and without hedged reads and reports p50/p99 latency.
+
+Usage:
+    python benchmarks/hedged_reads.py
+    python benchmarks/hedged_reads.py --reads 500 --slow-prob 0.02 --slow-delay 0.5
+"""
+
+import argparse
+import functools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+import storage_node  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+class SlowStorageNode(storage_node.StorageNode):
+    """StorageNode that stalls before answering a fraction of downloads."""
+
+    def __init__(self, *args, slow_prob=0.0, slow_delay=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow_prob = slow_prob
+        self.slow_delay = slow_delay
+
+    def handle_download(self, conn, header):
+        if random.random() < self.slow_prob:
+            time.sleep(self.slow_delay)
+        super().handle_download(conn, header)
+
+
+def run_reads(names, reads, out_dir, hedged):
+    latencies = []
+    for i in range(reads):
+        name = names[i % len(names)]
+        start = time.perf_counter()
+        resp = dfs.download_file(name, save_as=os.path.join(out_dir, name), hedged=hedged)
+        latencies.append(time.perf_counter() - start)
+        if resp.get("status") != "ok":
+            print(f"  read failed: {resp.get('message')}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged read p50/p99 benchmark")
+    parser.add_argument("--port", type=int, default=17500, help="Master port (nodes use the following ports)")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size", type=int, default=64 * 1024, help="File size in bytes")
+    parser.add_argument("--reads", type=int, default=300)
+    parser.add_argument("--slow-nodes", type=int, default=2, help="How many of the two replicas stall")
+    parser.add_argument("--slow-prob", type=float, default=0.02, help="Chance a slow node stalls a read")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Seconds a slow node stalls")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+    node_class = functools.partial(SlowStorageNode, slow_prob=0.0, slow_delay=args.slow_delay)
+    cluster = LocalCluster(2, args.port, mode="thread", node_class=node_class).start()
+    for node in cluster.nodes[:args.slow_nodes]:
+        node.slow_prob = args.slow_prob
+    work_dir = cluster.work_dir
+
+    names = []
+    for i in range(args.files):
+        path = os.path.join(work_dir, f"hedge_{i}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size))
+        resp = dfs.upload_file(path)
+        if resp.get("status") != "ok":
+            sys.exit(f"upload failed: {resp.get('message')}")
+        names.append(os.path.basename(path))
+
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+
+    print(f"{args.reads} reads of {args.size} B, {args.slow_nodes} node(s) stall "
+          f"{args.slow_delay}s with p={args.slow_prob}")
+    for hedged in (False, True):
+        lat = run_reads(names, args.reads, out_dir, hedged)
+        label = "hedged" if hedged else "plain"
+        print(f"  {label:7s} p50={percentile(lat, 50) * 1000:7.1f} ms  "
+              f"p99={percentile(lat, 99) * 1000:7.1f} ms  "
+              f"max={max(lat) * 1000:7.1f} ms  (hedge delay {dfs.hedge_delay() * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Download latency under an upload burst, with and without the node I/O scheduler.
+
+Starts a local cluster (master and nodes as processes) once per setting of
+DFS_IO_WORKERS, then for --duration seconds runs:
+
+- writers: threads uploading large files back to back
+- readers: threads downloading a small file back to back
+
+and reports download p50/p99 latency, upload MB/s and, from the nodes'
+STATS, how long disk operations waited for an I/O slot per class.
+DFS_IO_WORKERS=0 turns the scheduler off (every connection thread does its
+disk I/O as soon as it likes).
+
+Usage:
+    python benchmarks/io_scheduler.py
+    python benchmarks/io_scheduler.py --workers 0,1,4 --writers 8 --write-mb 64
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+def run(args, workers):
+    os.environ["DFS_IO_WORKERS"] = str(workers)
+    with LocalCluster(args.nodes, args.port, mode="process") as cluster:
+        small = os.path.join(cluster.work_dir, "small.bin")
+        with open(small, "wb") as f:
+            f.write(os.urandom(args.read_kb * 1024))
+        dfs.upload_file(small)
+
+        stop = threading.Event()
+        latencies = []
+        written = [0]
+        errors = [0]
+
+        def writer(i):
+            path = os.path.join(cluster.work_dir, f"big_{i}.bin")
+            with open(path, "wb") as f:
+                f.write(os.urandom(args.write_mb * 1024 * 1024))
+            while not stop.is_set():
+                if dfs.upload_file(path).get("status") == "ok":
+                    written[0] += args.write_mb
+                else:
+                    errors[0] += 1
+
+        def reader(i):
+            out = os.path.join(cluster.work_dir, f"small_out_{i}.bin")
+            while not stop.is_set():
+                start = time.perf_counter()
+                if dfs.download_file("small.bin", save_as=out).get("status") == "ok":
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        waits = {}
+        for node in dfs.get_nodes_status().get("nodes", []):
+            dirs = dfs.get_stats(node["address"]).get("metrics", {}).get("io", {})
+            for io in dirs.values():
+                for cls, hist in io["wait"].items():
+                    if hist["count"]:
+                        waits.setdefault(cls, []).append(hist["p99_ms"])
+
+    return {
+        "io_workers": workers,
+        "downloads": len(latencies),
+        "download_p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "download_p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "upload_mb_per_s": written[0] / elapsed,
+        "errors": errors[0],
+        "slot_wait_p99_ms": {cls: max(v) for cls, v in waits.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download latency under an upload burst, by DFS_IO_WORKERS")
+    parser.add_argument("--port", type=int, default=19400, help="Master port (nodes use the following ports)")
+    parser.add_argument("--nodes", type=int, default=2)
+    parser.add_argument("--workers", default="0,4", help="Comma-separated DFS_IO_WORKERS values to compare")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--write-mb", type=int, default=32, help="Size of each uploaded file in MiB")
+    parser.add_argument("--read-kb", type=int, default=256, help="Size of the downloaded file in KiB")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+    results = []
+    for workers in [int(w) for w in args.workers.split(",")]:
+        r = run(args, workers)
+        results.append(r)
+        waits = ", ".join(f"{cls} {ms:.1f}" for cls, ms in sorted(r["slot_wait_p99_ms"].items())) or "-"
+        print(f"DFS_IO_WORKERS={workers}: downloads p50={r['download_p50_ms']:.1f} ms "
+              f"p99={r['download_p99_ms']:.1f} ms ({r['downloads']}), "
+              f"uploads {r['upload_mb_per_s']:.1f} MB/s, errors={r['errors']}, "
+              f"slot wait p99 (ms): {waits}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
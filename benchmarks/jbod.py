@@ -0,0 +1,159 @@
+"""Upload throughput of one storage node by number of data directories.
+
+Starts an in-process cluster with a single node (replication factor 1)
+whose data directories behave like separate disks of --disk-mbps each: every
+disk operation sleeps for as long as the disk would take to move its bytes,
+and each directory gets one I/O slot (DFS_IO_WORKERS=1), so a directory does
+one operation at a time, like a spindle. Then --writers threads upload files
+back to back for --duration seconds and the node's MB/s is reported.
+
+With more than one directory it also removes one of them from under the
+node and checks that the master reports it in failed_dirs while the node
+stays ALIVE and keeps accepting uploads.
+
+All directories live on the same real filesystem here, so only the
+emulated disk time scales; on a real JBOD node each directory is a disk.
+Every disk count runs in its own process, because an in-process cluster
+can only be started once per process.
+
+Usage:
+    python benchmarks/jbod.py
+    python benchmarks/jbod.py --disks 1,2,4,8 --disk-mbps 40 --writers 16
+"""
+
+import argparse
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+import storage_node  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+
+
+class EmulatedDiskNode(storage_node.StorageNode):
+    """StorageNode whose directories each move at most disk_bps bytes/s."""
+
+    def __init__(self, *args, disk_bps=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.disk_bps = disk_bps
+
+    @contextmanager
+    def io_slot(self, header, default_class, nbytes, path):
+        with super().io_slot(header, default_class, nbytes, path):
+            time.sleep(nbytes / self.disk_bps)
+            yield
+
+
+def upload_for(cluster, args, duration):
+    stop = threading.Event()
+    written = [0]
+    errors = [0]
+
+    def writer(i):
+        path = os.path.join(cluster.work_dir, f"upload_{i}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.file_mb * 1024 * 1024))
+        while not stop.is_set():
+            if dfs.upload_file(path).get("status") == "ok":
+                written[0] += args.file_mb
+            else:
+                errors[0] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return written[0] / (time.perf_counter() - start), errors[0]
+
+
+def run(args, disks):
+    """One disk count, in this process."""
+    dfs.LOCK_HOLD_SECONDS = 0
+    storage_node.IO_WORKERS = 1
+    storage_node.DISK_CHECK_INTERVAL = 0.5
+    node_class = functools.partial(EmulatedDiskNode, disk_bps=args.disk_mbps * 1e6)
+    cluster = LocalCluster(1, args.port, mode="thread", node_class=node_class,
+                           replication_factor=1, disks=disks).start()
+    node = cluster.nodes[0]
+
+    mb_per_s, errors = upload_for(cluster, args, args.duration)
+    result = {"disks": disks, "upload_mb_per_s": mb_per_s, "errors": errors,
+              "ops_per_dir": [s.ops["write"] for s in node.io.values()]}
+
+    if disks > 1:
+        lost = node.storage_dirs[-1]
+        shutil.rmtree(lost)
+        deadline = time.time() + 10
+        reported = []
+        while time.time() < deadline and not reported:
+            time.sleep(0.5)
+            status = dfs.get_nodes_status().get("nodes", [{}])[0]
+            reported = status.get("failed_dirs", [])
+        after, after_errors = upload_for(cluster, args, min(args.duration, 5))
+        result["failure"] = {
+            "removed": lost,
+            "reported_failed_dirs": reported,
+            "node_status": status.get("status"),
+            "upload_mb_per_s_after": after,
+            "errors_after": after_errors,
+        }
+    shutil.rmtree(cluster.work_dir, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage node upload throughput by number of data directories")
+    parser.add_argument("--port", type=int, default=19500, help="Master port (the node uses the next port)")
+    parser.add_argument("--disks", default="1,2,4", help="Comma-separated directory counts to compare")
+    parser.add_argument("--disk-mbps", type=float, default=20, help="Emulated bandwidth of each disk in MB/s")
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent uploading threads")
+    parser.add_argument("--file-mb", type=int, default=8, help="Size of each uploaded file in MiB")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--run", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    if args.run is not None:
+        # the node logs to stdout too, so mark the result line
+        print("RESULT " + json.dumps(run(args, args.run)), flush=True)
+        return
+
+    results = []
+    for disks in [int(d) for d in args.disks.split(",")]:
+        cmd = [sys.executable, os.path.abspath(__file__), "--run", str(disks),
+               "--port", str(args.port), "--disk-mbps", str(args.disk_mbps),
+               "--writers", str(args.writers), "--file-mb", str(args.file_mb),
+               "--duration", str(args.duration)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        r = json.loads(next(line[7:] for line in out.splitlines() if line.startswith("RESULT ")))
+        results.append(r)
+        print(f"{disks} disk(s): {r['upload_mb_per_s']:6.1f} MB/s "
+              f"(ops per dir {r['ops_per_dir']}, errors={r['errors']})")
+        failure = r.get("failure")
+        if failure:
+            print(f"  removed {os.path.basename(failure['removed'])}: node {failure['node_status']}, "
+                  f"master reports failed_dirs={[os.path.basename(d) for d in failure['reported_failed_dirs']]}, "
+                  f"then {failure['upload_mb_per_s_after']:.1f} MB/s (errors={failure['errors_after']})")
+
+    print(f"disk bandwidth {args.disk_mbps} MB/s each, {args.writers} writers, {args.file_mb} MiB files")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Load generator for the DFS.
+
+Runs a mixed upload/download/list/delete workload with configurable file
+sizes and concurrency against a local cluster (started by dfs_cluster) or an
+existing one, and reports ops/sec, MB/s and latency percentiles per
+operation. Results can be written as JSON to track regressions.
+
+Usage:
+    python benchmarks/loadgen.py --nodes 3 --duration 20 --concurrency 8
+    python benchmarks/loadgen.py --mix upload=1,download=4 --sizes lognormal:11:2 --output run.json
+    python benchmarks/loadgen.py --external   # use the cluster at DFS_MASTER_HOST/PORT
+
+Size distributions (--sizes):
+    fixed:N               every file is N bytes
+    uniform:LO:HI         uniform between LO and HI bytes
+    lognormal:MU:SIGMA    exp(normal(MU, SIGMA)) bytes, capped at --max-size
+    choice:A,B,C          one of the listed sizes (suffixes k/m allowed, e.g. 4k,1m)
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+
+OPERATIONS = ("upload", "download", "list", "delete")
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    mult = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+
+def size_sampler(spec, max_size):
+    kind, _, rest = spec.partition(":")
+    params = rest.split(":") if rest else []
+    if kind == "fixed":
+        n = parse_size(params[0])
+        return lambda rng: n
+    if kind == "uniform":
+        lo, hi = parse_size(params[0]), parse_size(params[1])
+        return lambda rng: rng.randint(lo, hi)
+    if kind == "lognormal":
+        mu, sigma = float(params[0]), float(params[1])
+        return lambda rng: min(max_size, int(rng.lognormvariate(mu, sigma)))
+    if kind == "choice":
+        sizes = [parse_size(x) for x in params[0].split(",")]
+        return lambda rng: rng.choice(sizes)
+    raise ValueError(f"Unknown size distribution: {spec}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {op}")
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[idx]
+
+
+def summarize(samples, elapsed):
+    """samples: op -> list of (latency_s, nbytes, ok). Returns a JSON-able dict."""
+    results = {}
+    total_ops = total_bytes = 0
+    for op, rows in sorted(samples.items()):
+        lat = [r[0] for r in rows]
+        nbytes = sum(r[1] for r in rows if r[2])
+        total_ops += len(rows)
+        total_bytes += nbytes
+        results[op] = {
+            "count": len(rows),
+            "errors": sum(1 for r in rows if not r[2]),
+            "ops_per_sec": len(rows) / elapsed if elapsed else 0.0,
+            "mb_per_sec": nbytes / elapsed / 1e6 if elapsed else 0.0,
+            "latency_ms": {
+                "p50": percentile(lat, 50) * 1000,
+                "p90": percentile(lat, 90) * 1000,
+                "p99": percentile(lat, 99) * 1000,
+                "max": max(lat) * 1000 if lat else 0.0,
+            },
+        }
+    results["total"] = {
+        "count": total_ops,
+        "ops_per_sec": total_ops / elapsed if elapsed else 0.0,
+        "mb_per_sec": total_bytes / elapsed / 1e6 if elapsed else 0.0,
+    }
+    return results
+
+
+def print_report(results, elapsed):
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"  {'op':9s} {'count':>7s} {'err':>5s} {'ops/s':>9s} {'MB/s':>8s} "
+          f"{'p50ms':>8s} {'p90ms':>8s} {'p99ms':>8s} {'maxms':>8s}")
+    for op, r in results.items():
+        if op == "total":
+            continue
+        lat = r["latency_ms"]
+        print(f"  {op:9s} {r['count']:7d} {r['errors']:5d} {r['ops_per_sec']:9.1f} "
+              f"{r['mb_per_sec']:8.2f} {lat['p50']:8.1f} {lat['p90']:8.1f} "
+              f"{lat['p99']:8.1f} {lat['max']:8.1f}")
+    t = results["total"]
+    print(f"  {'total':9s} {t['count']:7d} {'':5s} {t['ops_per_sec']:9.1f} {t['mb_per_sec']:8.2f}")
+
+
+class LoadGenerator:
+    """Drives a weighted operation mix from `concurrency` client threads."""
+
+    def __init__(self, mix, sampler, concurrency, work_dir, seed=None):
+        self.mix = mix
+        self.sampler = sampler
+        self.concurrency = concurrency
+        self.work_dir = work_dir
+        self.rng = random.Random(seed)
+        self.files = []  # DFS names known to exist
+        self.files_lock = threading.Lock()
+        self.samples = {op: [] for op in mix}
+        self.samples_lock = threading.Lock()
+        self.counter = 0
+        # Random bytes that upload payloads are sliced from
+        self.payload = os.urandom(1 << 20)
+
+    def _new_name(self):
+        with self.files_lock:
+            self.counter += 1
+            return f"lg_{self.counter:08d}.bin"
+
+    def _write_local(self, path, size):
+        with open(path, "wb") as f:
+            while size > 0:
+                n = min(size, len(self.payload))
+                f.write(self.payload[:n])
+                size -= n
+
+    def _pick_file(self, rng, remove=False):
+        with self.files_lock:
+            if not self.files:
+                return None
+            idx = rng.randrange(len(self.files))
+            if remove:
+                self.files[idx], self.files[-1] = self.files[-1], self.files[idx]
+                return self.files.pop()
+            return self.files[idx]
+
+    def populate(self, count):
+        rng = random.Random(self.rng.random())
+        for _ in range(count):
+            self.do_upload(rng, os.path.join(self.work_dir, "seed"))
+
+    # ---------- Operations; each returns (bytes moved, ok) ----------
+
+    def do_upload(self, rng, scratch):
+        name = self._new_name()
+        path = os.path.join(scratch, name)
+        size = self.sampler(rng)
+        self._write_local(path, size)
+        try:
+            resp = dfs.upload_file(path)
+        finally:
+            os.remove(path)
+        ok = resp.get("status") == "ok"
+        if ok:
+            with self.files_lock:
+                self.files.append(name)
+        return size, ok
+
+    def do_download(self, rng, scratch):
+        name = self._pick_file(rng)
+        if name is None:
+            return 0, False
+        path = os.path.join(scratch, "download.tmp")
+        resp = dfs.download_file(name, save_as=path)
+        if resp.get("status") != "ok":
+            return 0, False
+        return os.path.getsize(path), True
+
+    def do_list(self, rng, scratch):
+        resp = dfs.list_files()
+        return 0, "files" in resp
+
+    def do_delete(self, rng, scratch):
+        name = self._pick_file(rng, remove=True)
+        if name is None:
+            return 0, False
+        resp = dfs.delete_file(name)
+        return 0, resp.get("status") == "ok"
+
+    # ---------- Driver ----------
+
+    def _worker(self, idx, deadline, ops_left):
+        rng = random.Random(self.rng.random() + idx)
+        scratch = os.path.join(self.work_dir, f"worker{idx}")
+        os.makedirs(scratch, exist_ok=True)
+        ops = list(self.mix)
+        weights = [self.mix[op] for op in ops]
+        handlers = {op: getattr(self, f"do_{op}") for op in ops}
+        while time.time() < deadline:
+            if ops_left is not None:
+                with self.samples_lock:
+                    if ops_left[0] <= 0:
+                        return
+                    ops_left[0] -= 1
+            op = rng.choices(ops, weights)[0]
+            start = time.perf_counter()
+            try:
+                nbytes, ok = handlers[op](rng, scratch)
+            except Exception:
+                nbytes, ok = 0, False
+            latency = time.perf_counter() - start
+            with self.samples_lock:
+                self.samples[op].append((latency, nbytes, ok))
+
+    def run(self, duration=None, ops=None):
+        deadline = time.time() + (duration if duration else 1e9)
+        ops_left = [ops] if ops else None
+        threads = [
+            threading.Thread(target=self._worker, args=(i, deadline, ops_left), daemon=True)
+            for i in range(self.concurrency)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DFS load generator")
+    parser.add_argument("--nodes", type=int, default=3, help="Storage nodes in the local cluster")
+    parser.add_argument("--port", type=int, default=7000, help="Master port of the local cluster")
+    parser.add_argument("--mode", choices=("process", "thread"), default="process",
+                        help="Run the local cluster as subprocesses or in this process")
+    parser.add_argument("--external", action="store_true",
+                        help="Use the running cluster at DFS_MASTER_HOST/DFS_MASTER_PORT")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--ops", type=int, default=None, help="Stop after this many operations")
+    parser.add_argument("--concurrency", type=int, default=4, help="Client threads")
+    parser.add_argument("--mix", default="upload=3,download=5,list=1,delete=1",
+                        help="Operation weights, e.g. upload=1,download=4")
+    parser.add_argument("--sizes", default="fixed:64k", help="File size distribution")
+    parser.add_argument("--max-size", type=parse_size, default=parse_size("64m"))
+    parser.add_argument("--prepopulate", type=int, default=20, help="Files uploaded before timing starts")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    sampler = size_sampler(args.sizes, args.max_size)
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+
+    cluster = None
+    if not args.external:
+        cluster = LocalCluster(args.nodes, args.port, mode=args.mode).start()
+
+    work_dir = tempfile.mkdtemp(prefix="dfs_loadgen_")
+    try:
+        gen = LoadGenerator(mix, sampler, args.concurrency, work_dir, seed=args.seed)
+        os.makedirs(os.path.join(work_dir, "seed"))
+        gen.populate(args.prepopulate)
+        elapsed = gen.run(duration=None if args.ops else args.duration, ops=args.ops)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if cluster is not None:
+            cluster.stop()
+
+    results = summarize(gen.samples, elapsed)
+    print_report(results, elapsed)
+
+    if args.output:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "config": {
+                "nodes": args.nodes if not args.external else None,
+                "mode": args.mode if not args.external else "external",
+                "concurrency": args.concurrency,
+                "mix": mix,
+                "sizes": args.sizes,
+                "duration": args.duration,
+                "ops": args.ops,
+                "prepopulate": args.prepopulate,
+            },
+            "elapsed_s": elapsed,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Master failover time with a hot standby.
+
+Starts a master, a standby master following it and storage nodes on
+localhost, uploads some files, then repeatedly kills whichever master is
+primary and measures how long until:
+
+- reads:  list_files() returns every file and a download succeeds
+- writes: a new upload is accepted
+- nodes:  the new primary sees every storage node ALIVE
+
+The killed master is restarted as a standby of the new primary, so the next
+round fails back the other way.
+
+Usage:
+    python benchmarks/master_failover.py
+    python benchmarks/master_failover.py --rounds 4 --files 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+
+
+def wait_for(check, timeout):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if check():
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def fmt(seconds):
+    return "timed out" if seconds is None else f"{seconds:.2f}s"
+
+
+def standby_files(cluster, standby):
+    port = cluster.standby_port(0) if standby else cluster.master_port(0)
+    resp = dfs.send_to_master_at(f"{cluster.host}:{port}", {"type": "STATS"})
+    return resp.get("metrics", {}).get("files")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure master failover time with a hot standby")
+    parser.add_argument("--port", type=int, default=18900, help="Master port (nodes use the following ports)")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2, help="Failovers to perform")
+    parser.add_argument("--timeout", type=float, default=60, help="Give up waiting after this many seconds")
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+    results = []
+    with LocalCluster(args.nodes, args.port, mode="process", standby=True) as cluster:
+        names = []
+        for i in range(args.files):
+            path = os.path.join(cluster.work_dir, f"failover_{i}.txt")
+            with open(path, "w") as f:
+                f.write(f"file {i}\n" * 10)
+            resp = dfs.upload_file(path)
+            if resp.get("status") != "ok":
+                sys.exit(f"upload failed: {resp.get('message')}")
+            names.append(os.path.basename(path))
+
+        primary_is_standby_slot = False
+        for rnd in range(1, args.rounds + 1):
+            standby_slot = not primary_is_standby_slot
+            if wait_for(lambda: standby_files(cluster, standby_slot) == len(names), args.timeout) is None:
+                sys.exit("standby did not catch up")
+
+            print(f"round {rnd}: killing primary on port "
+                  f"{cluster.standby_port(0) if primary_is_standby_slot else cluster.master_port(0)}")
+            cluster.kill_master(0, standby=primary_is_standby_slot)
+            killed_at = time.perf_counter()
+
+            def reads_ok():
+                if len(dfs.list_files().get("files", [])) != len(names):
+                    return False
+                out = os.path.join(cluster.work_dir, "out.txt")
+                return dfs.download_file(names[rnd % len(names)], save_as=out).get("status") == "ok"
+
+            reads = wait_for(reads_ok, args.timeout)
+            new_name = f"after_failover_{rnd}.txt"
+            new_path = os.path.join(cluster.work_dir, new_name)
+            with open(new_path, "w") as f:
+                f.write("written after failover\n")
+            writes = wait_for(lambda: dfs.upload_file(new_path).get("status") == "ok", args.timeout)
+            names.append(new_name)
+
+            def nodes_alive():
+                nodes = dfs.get_nodes_status().get("nodes", [])
+                return sum(n["status"] == "ALIVE" for n in nodes) == args.nodes
+
+            nodes = None
+            if wait_for(nodes_alive, args.timeout) is not None:
+                nodes = time.perf_counter() - killed_at
+            r = {"round": rnd, "reads_s": reads, "writes_after_reads_s": writes, "nodes_s": nodes}
+            results.append(r)
+            print(f"  reads ok after {fmt(reads)}, upload ok {fmt(writes)} later, "
+                  f"all nodes ALIVE after {fmt(nodes)}")
+
+            # Bring the killed master back as standby of the new primary
+            new_primary = (f"{cluster.host}:{cluster.master_port(0)}" if primary_is_standby_slot
+                           else f"{cluster.host}:{cluster.standby_port(0)}")
+            cluster.start_master(0, standby=primary_is_standby_slot, standby_of=new_primary)
+            primary_is_standby_slot = not primary_is_standby_slot
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
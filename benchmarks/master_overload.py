@@ -0,0 +1,151 @@
+"""Master behaviour under a client burst, with and without admission control.
+
+Starts a local cluster (master and nodes as processes, heartbeats every
+--heartbeat-interval seconds), registers --files files, and then lets
+--clients processes with --threads threads each hammer the master for
+--duration seconds with LIST_FILES (expensive: the whole namespace under
+the metadata lock) and FILE_INFO (cheap) requests, back to back. It runs
+twice:
+
+- off:  DFS_ADMISSION_WORKERS=0, every request is let in (the old behaviour)
+- on:   the default admission control (see dfs_admission)
+
+It reports client goodput (requests answered "ok"), latency of those,
+requests that were still "busy" after the client's retries, errors, and
+from the master's side the p99 of heartbeat handling, how many nodes it
+declared DEAD during the burst and how many client requests it shed.
+
+Usage:
+    python benchmarks/master_overload.py
+    python benchmarks/master_overload.py --clients 8 --threads 32 --files 200000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+def client_worker(master_port, names, threads, duration, list_share, seed):
+    """Burst of metadata requests from several threads; returns (latencies, busy, errors)."""
+    dfs.MASTER_PORT = master_port
+    latencies = []
+    counts = {"busy": 0, "errors": 0}
+    end = time.perf_counter() + duration
+
+    def run(i):
+        rng = random.Random(seed * 1000 + i)
+        while time.perf_counter() < end:
+            if rng.random() < list_share:
+                msg = {"type": "LIST_FILES"}
+            else:
+                msg = {"type": "FILE_INFO", "filename": rng.choice(names)}
+            start = time.perf_counter()
+            try:
+                resp = dfs.send_to_master(msg)
+            except OSError:
+                counts["errors"] += 1
+                continue
+            if resp.get("status") == "busy":
+                counts["busy"] += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return latencies, counts["busy"], counts["errors"]
+
+
+def register_files(cluster, names, node_addrs):
+    with socket.create_connection((cluster.host, cluster.base_port)) as s:
+        for name in names:
+            dfs.send_json(s, {"type": "UPLOAD_DONE", "filename": name, "nodes": node_addrs, "keepalive": True})
+            dfs.recv_json(s)
+
+
+def run(args, admission):
+    os.environ["DFS_HEARTBEAT_INTERVAL"] = str(args.heartbeat_interval)
+    os.environ["DFS_ADMISSION_WORKERS"] = "8" if admission else "0"
+    port = args.port + (100 if admission else 0)
+    with LocalCluster(args.nodes, port, mode="process") as cluster:
+        names = [f"burst_{i:07d}.bin" for i in range(args.files)]
+        register_files(cluster, names, [f"{cluster.host}:{cluster.node_port(i)}" for i in (1, 2)])
+        time.sleep(args.heartbeat_interval * 10)  # let the detector learn the heartbeat rate
+        before = dfs.get_stats()["metrics"]
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            jobs = [pool.apply_async(client_worker, (port, names, args.threads, args.duration,
+                                                     args.list_share, seed))
+                    for seed in range(args.clients)]
+            results = [job.get() for job in jobs]
+        elapsed = time.perf_counter() - start
+
+        after = dfs.get_stats()["metrics"]
+        with open(os.path.join(cluster.work_dir, "master.log")) as f:
+            dead = sum(1 for line in f if "is DEAD" in line)
+
+    latencies = [lat for lats, _, _ in results for lat in lats]
+    heartbeats = after["requests"].get("HEARTBEAT", {})
+    shed = after.get("admission", {}).get("shed", {}).get("client", 0)
+    return {
+        "admission": admission,
+        "ok_per_s": len(latencies) / elapsed,
+        "ok_p50_ms": percentile(latencies, 50) * 1000,
+        "ok_p99_ms": percentile(latencies, 99) * 1000,
+        "still_busy": sum(busy for _, busy, _ in results),
+        "errors": sum(errors for _, _, errors in results),
+        "heartbeats": heartbeats.get("count", 0) - before["requests"].get("HEARTBEAT", {}).get("count", 0),
+        "heartbeat_p99_ms": heartbeats.get("handler", {}).get("p99_ms"),
+        "nodes_declared_dead": dead,
+        "requests_shed": shed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Master under a client burst, with and without admission control")
+    parser.add_argument("--port", type=int, default=19700, help="Master port (nodes use the next ports)")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--files", type=int, default=50000, help="Files registered before the burst")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--threads", type=int, default=32, help="Threads per client process")
+    parser.add_argument("--list-share", type=float, default=0.2, help="Fraction of requests that are LIST_FILES")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--heartbeat-interval", type=float, default=0.5)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    results = []
+    for admission in (False, True):
+        r = run(args, admission)
+        results.append(r)
+        print(f"admission {'on ' if admission else 'off'}: {r['ok_per_s']:6.0f} ok/s, p50 {r['ok_p50_ms']:.1f} ms "
+              f"p99 {r['ok_p99_ms']:.1f} ms, still busy {r['still_busy']}, errors {r['errors']} | master: "
+              f"{r['heartbeats']} heartbeats (p99 {r['heartbeat_p99_ms']} ms), "
+              f"{r['nodes_declared_dead']} nodes declared DEAD, {r['requests_shed']} requests shed")
+
+    print(f"{args.clients}x{args.threads} client threads for {args.duration:.0f}s, {args.files} files, "
+          f"{args.list_share:.0%} LIST_FILES, heartbeats every {args.heartbeat_interval}s from {args.nodes} nodes")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
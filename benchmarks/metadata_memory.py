@@ -0,0 +1,146 @@
+"""Master metadata memory and lookup speed: dict of lists vs. FileTable.
+
+Fills a file table with --files entries the way the master does on
+UPLOAD_DONE, in two layouts:
+
+- dict:     filename -> list of "host:port" strings, each file with its own
+            strings (as decoded from the JSON message); the old layout
+- compact:  dfs_metadata.FileTable (node indexes packed into one int per file)
+
+With --placement random every file gets --replicas distinct nodes picked at
+random out of --nodes, so nearly every file has its own replica list; with
+--placement spread file i goes to nodes i, i+1, ... (mod --nodes), which
+gives only --nodes distinct lists, closer to what the master's placement
+produces. Names look like "dir_0042/file_000001234.dat".
+
+For each layout it reports resident memory per file (RSS growth while
+filling, so Linux only), build time, lookups/s for table[name] and
+`name in table` with --lookups random existing names, and the time to count
+under-replicated files with one node down (what the master does for every
+status push). Each layout runs in its own process so the RSS numbers don't
+mix.
+
+Usage:
+    python benchmarks/metadata_memory.py
+    python benchmarks/metadata_memory.py --files 10000000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dfs_metadata import FileTable  # noqa: E402
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def file_name(i):
+    return f"dir_{i % 1000:04d}/file_{i:09d}.dat"
+
+
+def run(args, layout):
+    rng = random.Random(args.seed)
+    ports = list(range(6001, 6001 + args.nodes))
+    gc.collect()
+    gc.disable()  # keep collector passes out of the build time
+    before = rss_bytes()
+    start = time.perf_counter()
+    table = {} if layout == "dict" else FileTable()
+    for i in range(args.files):
+        # fresh strings per file, like json.loads of an UPLOAD_DONE message
+        if args.placement == "random":
+            chosen = rng.sample(ports, args.replicas)
+        else:
+            chosen = [ports[(i + k) % args.nodes] for k in range(args.replicas)]
+        table[file_name(i)] = [f"10.0.0.1:{port}" for port in chosen]
+    build_s = time.perf_counter() - start
+    gc.enable()
+    gc.collect()
+    used = rss_bytes() - before
+
+    names = [file_name(rng.randrange(args.files)) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for name in names:
+        table[name]
+    get_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for name in names:
+        name in table  # noqa: B015
+    contains_s = time.perf_counter() - start
+
+    alive = {f"10.0.0.1:{port}" for port in ports[1:]}
+
+    def under(addrs):
+        return sum(1 for a in addrs if a in alive) < args.replicas
+
+    start = time.perf_counter()
+    if layout == "dict":
+        count = sum(1 for addrs in table.values() if under(addrs))
+    else:
+        count = table.count_files(under)
+    scan_s = time.perf_counter() - start
+
+    result = {
+        "layout": layout,
+        "bytes_per_file": used / args.files,
+        "build_s": build_s,
+        "get_per_s": args.lookups / get_s,
+        "contains_per_s": args.lookups / contains_s,
+        "under_replicated": count,
+        "under_replicated_scan_ms": scan_s * 1000,
+    }
+    if layout == "compact":
+        result["replica_sets"] = len(table.replica_sets())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Master metadata memory: dict of lists vs. FileTable")
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--placement", choices=("random", "spread"), default="random",
+                        help="How replicas are spread over the nodes (see above)")
+    parser.add_argument("--lookups", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--run", choices=("dict", "compact"), default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    if args.run is not None:
+        print("RESULT " + json.dumps(run(args, args.run)), flush=True)
+        return
+
+    results = []
+    for layout in ("dict", "compact"):
+        cmd = [sys.executable, os.path.abspath(__file__), "--run", layout, "--files", str(args.files),
+               "--nodes", str(args.nodes), "--replicas", str(args.replicas), "--placement", args.placement,
+               "--lookups", str(args.lookups), "--seed", str(args.seed)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        r = json.loads(next(line[7:] for line in out.splitlines() if line.startswith("RESULT ")))
+        results.append(r)
+        sets = f", {r['replica_sets']} replica sets" if "replica_sets" in r else ""
+        print(f"{layout:8s}: {r['bytes_per_file']:6.1f} bytes/file, build {r['build_s']:.1f}s, "
+              f"get {r['get_per_s'] / 1e6:.2f}M/s, contains {r['contains_per_s'] / 1e6:.2f}M/s, "
+              f"under-replicated count {r['under_replicated_scan_ms']:.0f} ms{sets}")
+
+    print(f"{args.files} files on {args.replicas} of {args.nodes} nodes each ({args.placement} placement), "
+          f"{args.lookups} lookups")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Metadata throughput vs. number of master shards.
+
+For each shard count, starts a local cluster (master processes + storage
+nodes), registers a set of files through UPLOAD_DONE, then has several
+client processes issue a mix of UPLOAD_REQUEST / DOWNLOAD_REQUEST /
+FILE_INFO for a fixed time and reports metadata ops/sec and latency.
+
+Scaling needs spare cores: with S shards and C client processes, about
+S + C cores are busy. On smaller machines the numbers flatten out once the
+cores are used up (the script prints a warning).
+
+Usage:
+    python benchmarks/metadata_shards.py
+    python benchmarks/metadata_shards.py --shards 1 2 4 8 --clients 8 --duration 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+OPS = ("UPLOAD_REQUEST", "DOWNLOAD_REQUEST", "FILE_INFO")
+
+
+def client_worker(shards, names, duration, seed):
+    """Issue metadata requests for duration seconds; return per-request latencies."""
+    dfs.MASTER_SHARDS = shards
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    end = time.perf_counter() + duration
+    while True:
+        start = time.perf_counter()
+        if start >= end:
+            break
+        msg = {"type": rng.choice(OPS), "filename": rng.choice(names)}
+        try:
+            dfs.send_to_master(msg)
+        except OSError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def run(shards, args, pool):
+    port = args.port + 100 * shards
+    with LocalCluster(args.nodes, port, mode="process", shards=shards) as cluster:
+        names = [f"meta_{i}.bin" for i in range(args.files)]
+        node_addrs = [f"{cluster.host}:{cluster.node_port(i)}" for i in range(1, args.nodes + 1)]
+        for name in names:
+            dfs.send_to_master({"type": "UPLOAD_DONE", "filename": name, "nodes": node_addrs[:2]})
+
+        started = time.perf_counter()
+        results = pool.starmap(client_worker, [
+            (cluster.master_addrs, names, args.duration, args.seed + c) for c in range(args.clients)
+        ])
+        elapsed = time.perf_counter() - started
+
+    latencies = [x for lat, _ in results for x in lat]
+    errors = sum(e for _, e in results)
+    return {
+        "shards": shards,
+        "ops": len(latencies),
+        "errors": errors,
+        "ops_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata ops/sec with 1..N master shards")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--files", type=int, default=2000, help="Files registered before measuring")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per shard count")
+    parser.add_argument("--port", type=int, default=18000, help="Base port")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if cores < max(args.shards) + args.clients:
+        print(f"WARNING: {cores} CPU core(s) for up to {max(args.shards)} shards + "
+              f"{args.clients} clients; throughput will stop scaling once cores run out.")
+
+    results = []
+    with multiprocessing.Pool(args.clients) as pool:
+        for shards in args.shards:
+            r = run(shards, args, pool)
+            results.append(r)
+            base = results[0]["ops_per_sec"]
+            print(f"  {shards:2d} shard(s): {r['ops_per_sec']:8.0f} ops/s  (x{r['ops_per_sec'] / base:.2f})  "
+                  f"p50={r['p50_ms']:.2f} ms  p99={r['p99_ms']:.2f} ms  errors={r['errors']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
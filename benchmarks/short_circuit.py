@@ -0,0 +1,119 @@
+"""Local reads through TCP loopback vs. short-circuit file descriptors.
+
+Starts a local cluster with one storage node (master and node as
+processes) on this host, uploads a --size-mb file and then, with
+SHORT_CIRCUIT_READS off and on:
+
+- downloads it --rounds times with download_file and reports MB/s and the
+  CPU time used by the client and by the node (from /proc, Linux only)
+- reads --preads random 4 KiB records through open_file() and reports
+  reads/s and p50/p99 latency
+
+The file was just written, so it is served from the page cache; the
+numbers show the cost of moving bytes, not of the disk.
+
+Usage:
+    python benchmarks/short_circuit.py
+    python benchmarks/short_circuit.py --size-mb 1024 --rounds 3 --preads 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+def process_cpu(pid):
+    """CPU seconds (user + system) used so far by pid, or None off Linux."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def measure(args, cluster, name, node_pid):
+    out = os.path.join(cluster.work_dir, "out.bin")
+    client_cpu = time.process_time()
+    node_cpu = process_cpu(node_pid)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        resp = dfs.download_file(name, save_as=out)
+        if resp.get("status") != "ok":
+            sys.exit(f"download failed: {resp.get('message')}")
+    elapsed = time.perf_counter() - start
+    client_cpu = time.process_time() - client_cpu
+    node_after = process_cpu(node_pid)
+    r = {
+        "short_circuit": "short-circuit" in resp["message"],
+        "download_mb_per_s": args.size_mb * args.rounds / elapsed,
+        "client_cpu_s_per_gb": client_cpu / (args.size_mb * args.rounds / 1024),
+        "node_cpu_s_per_gb": ((node_after - node_cpu) / (args.size_mb * args.rounds / 1024)
+                              if node_cpu is not None else None),
+    }
+
+    rng = random.Random(args.seed)
+    size = args.size_mb * 1024 * 1024
+    latencies = []
+    with dfs.open_file(name) as f:
+        start = time.perf_counter()
+        for _ in range(args.preads):
+            t0 = time.perf_counter()
+            f.pread(4096, rng.randrange(size - 4096))
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+    r["preads_per_s"] = args.preads / elapsed
+    r["pread_p50_us"] = percentile(latencies, 50) * 1e6
+    r["pread_p99_us"] = percentile(latencies, 99) * 1e6
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local reads: TCP loopback vs. short-circuit")
+    parser.add_argument("--port", type=int, default=19600, help="Master port (the node uses the next port)")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=5, help="Full downloads per mode")
+    parser.add_argument("--preads", type=int, default=5000, help="Random 4 KiB reads per mode")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    results = []
+    with LocalCluster(1, args.port, mode="process", replication_factor=1) as cluster:
+        path = os.path.join(cluster.work_dir, "big.bin")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        if dfs.upload_file(path).get("status") != "ok":
+            sys.exit("upload failed")
+        node_pid = cluster.procs[-1].pid
+
+        for short_circuit in (False, True):
+            dfs.SHORT_CIRCUIT_READS = short_circuit
+            r = measure(args, cluster, "big.bin", node_pid)
+            results.append(r)
+            label = "short-circuit" if r["short_circuit"] else "tcp          "
+            node_cpu = f"{r['node_cpu_s_per_gb']:.2f}" if r["node_cpu_s_per_gb"] is not None else "?"
+            print(f"{label}: download {r['download_mb_per_s']:7.0f} MB/s, CPU s/GB client "
+                  f"{r['client_cpu_s_per_gb']:.2f} node {node_cpu} | 4 KiB preads {r['preads_per_s']:7.0f}/s "
+                  f"p50 {r['pread_p50_us']:.0f} us p99 {r['pread_p99_us']:.0f} us")
+
+    print(f"file: {args.size_mb} MiB, {args.rounds} downloads and {args.preads} random reads per mode")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
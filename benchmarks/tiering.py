@@ -0,0 +1,173 @@
+"""Read latency of a skewed workload with and without a fast storage tier.
+
+Starts an in-process cluster with a single node (replication factor 1),
+uploads --files files and then reads them with Zipf-distributed popularity
+(a few files get most of the reads) from --readers threads for --duration
+seconds, twice:
+
+- capacity only:  the node has just its capacity directory
+- tiered:         the node also has a fast-tier directory holding at most
+                  --fast-pct percent of the data, and hot files are promoted
+                  to it every DFS_TIER_INTERVAL (--tier-interval) seconds
+
+Both directories live on the same real disk here, so their speed is
+emulated: every disk operation on the capacity tier takes --hdd-ms plus its
+bytes at --hdd-mbps, and on the fast tier --ssd-ms plus its bytes at
+--ssd-mbps, with one operation at a time per directory (DFS_IO_WORKERS=1).
+Latencies are reported for the second half of each run, once the tiered
+node had time to promote. Each run happens in its own process, because an
+in-process cluster can only be started once per process.
+
+Usage:
+    python benchmarks/tiering.py
+    python benchmarks/tiering.py --files 500 --fast-pct 5 --zipf 1.2 --duration 60
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+import storage_node  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+class EmulatedTierNode(storage_node.StorageNode):
+    """StorageNode whose fast-tier directory behaves like an SSD and the rest like HDDs."""
+
+    def __init__(self, *args, hdd=(0, 0), ssd=(0, 0), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hdd = hdd  # (seconds per operation, bytes/s)
+        self.ssd = ssd
+
+    @contextmanager
+    def io_slot(self, header, default_class, nbytes, path):
+        with super().io_slot(header, default_class, nbytes, path):
+            op_s, bps = self.ssd if os.path.dirname(path) == self.fast_dir else self.hdd
+            time.sleep(op_s + nbytes / bps)
+            yield
+
+
+def run(args, tiered):
+    """One configuration, in this process."""
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+    storage_node.IO_WORKERS = 1
+    storage_node.TIER_INTERVAL = args.tier_interval
+    storage_node.TIER_COMPRESS = args.compress
+    storage_node.FAST_TIER_BYTES = int(args.files * args.file_kb * 1024 * args.fast_pct / 100)
+    node_class = functools.partial(EmulatedTierNode,
+                                   hdd=(args.hdd_ms / 1000, args.hdd_mbps * 1e6),
+                                   ssd=(args.ssd_ms / 1000, args.ssd_mbps * 1e6))
+    cluster = LocalCluster(1, args.port, mode="thread", node_class=node_class,
+                           replication_factor=1, fast_tier=tiered).start()
+    node = cluster.nodes[0]
+
+    rng = random.Random(args.seed)
+    names = []
+    for i in range(args.files):
+        path = os.path.join(cluster.work_dir, f"file_{i:05d}.bin")
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(args.file_kb * 1024))
+        if dfs.upload_file(path).get("status") != "ok":
+            sys.exit(f"upload of {path} failed")
+        names.append(os.path.basename(path))
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(args.files)]
+
+    samples = []  # (time, latency)
+    errors = [0]
+    stop = threading.Event()
+
+    def reader(i):
+        r = random.Random(args.seed + i)
+        out = os.path.join(cluster.work_dir, f"out_{i}.bin")
+        while not stop.is_set():
+            name = r.choices(names, weights)[0]
+            start = time.perf_counter()
+            if dfs.download_file(name, save_as=out).get("status") == "ok":
+                samples.append((start, time.perf_counter() - start))
+            else:
+                errors[0] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    begin = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    late = [lat for start, lat in samples if start >= begin + args.duration / 2]
+    return {
+        "tiered": tiered,
+        "reads": len(late),
+        "read_p50_ms": percentile(late, 50) * 1000,
+        "read_p99_ms": percentile(late, 99) * 1000,
+        "reads_per_s": len(late) / (args.duration / 2),
+        "errors": errors[0],
+        "tiers": node.tier_stats() if tiered else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skewed read latency with and without a fast storage tier")
+    parser.add_argument("--port", type=int, default=19550, help="Master port (the node uses the next port)")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-kb", type=int, default=256)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of file popularity")
+    parser.add_argument("--fast-pct", type=float, default=10, help="Fast tier size as a percentage of the data")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--tier-interval", type=float, default=2)
+    parser.add_argument("--compress", action="store_true", help="Compress files demoted to the capacity tier")
+    parser.add_argument("--hdd-ms", type=float, default=4, help="Emulated capacity-tier time per operation")
+    parser.add_argument("--hdd-mbps", type=float, default=150)
+    parser.add_argument("--ssd-ms", type=float, default=0.1, help="Emulated fast-tier time per operation")
+    parser.add_argument("--ssd-mbps", type=float, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--run", choices=("flat", "tiered"), default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    if args.run is not None:
+        # the node logs to stdout too, so mark the result line
+        print("RESULT " + json.dumps(run(args, args.run == "tiered")), flush=True)
+        return
+
+    results = []
+    for mode in ("flat", "tiered"):
+        cmd = [sys.executable, os.path.abspath(__file__), "--run", mode]
+        for key, value in vars(args).items():
+            if key not in ("run", "output", "compress"):
+                cmd += [f"--{key.replace('_', '-')}", str(value)]
+        if args.compress:
+            cmd.append("--compress")
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        r = json.loads(next(line[7:] for line in out.splitlines() if line.startswith("RESULT ")))
+        results.append(r)
+        label = "tiered       " if r["tiered"] else "capacity only"
+        print(f"{label}: reads p50={r['read_p50_ms']:.1f} ms p99={r['read_p99_ms']:.1f} ms, "
+              f"{r['reads_per_s']:.0f} reads/s, errors={r['errors']}"
+              + (f", tiers {r['tiers']}" if r["tiers"] else ""))
+
+    print(f"{args.files} files of {args.file_kb} KiB, zipf {args.zipf}, fast tier {args.fast_pct}% of the data, "
+          f"{args.readers} readers; latencies from the last {args.duration / 2:.0f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Cost of request tracing at different sampling rates.
+
+Starts a local cluster (master and nodes as processes), then for each
+sampling rate in --rates uploads and downloads a small file --ops times
+and reports operations/s and p50/p99 latency. Masters and nodes only
+trace requests that arrive with a trace context, so the client's
+dfs_tracing.SAMPLE_RATE is the only setting that changes between rounds.
+Small files make the per-request overhead as visible as it gets.
+
+Usage:
+    python benchmarks/tracing_overhead.py
+    python benchmarks/tracing_overhead.py --rates 0,0.01,0.1,1 --ops 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfs_client_lib as dfs  # noqa: E402
+import dfs_tracing  # noqa: E402
+from dfs_cluster import LocalCluster  # noqa: E402
+from loadgen import percentile  # noqa: E402
+
+
+def measure(args, cluster, rate):
+    dfs_tracing.SAMPLE_RATE = rate
+    path = os.path.join(cluster.work_dir, "small.bin")
+    out = os.path.join(cluster.work_dir, "out.bin")
+    latencies = {"upload": [], "download": []}
+    start = time.perf_counter()
+    for _ in range(args.ops):
+        t0 = time.perf_counter()
+        if dfs.upload_file(path).get("status") != "ok":
+            sys.exit("upload failed")
+        t1 = time.perf_counter()
+        if dfs.download_file("small.bin", save_as=out).get("status") != "ok":
+            sys.exit("download failed")
+        latencies["upload"].append(t1 - t0)
+        latencies["download"].append(time.perf_counter() - t1)
+    elapsed = time.perf_counter() - start
+    r = {"sample_rate": rate, "ops_per_s": 2 * args.ops / elapsed}
+    for op, values in latencies.items():
+        r[f"{op}_p50_ms"] = percentile(values, 50) * 1000
+        r[f"{op}_p99_ms"] = percentile(values, 99) * 1000
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request tracing overhead by sampling rate")
+    parser.add_argument("--port", type=int, default=19650, help="Master port (nodes use the next ports)")
+    parser.add_argument("--nodes", type=int, default=2)
+    parser.add_argument("--rates", default="0,0.01,1", help="Comma-separated sampling rates to compare")
+    parser.add_argument("--ops", type=int, default=500, help="Uploads (and as many downloads) per rate")
+    parser.add_argument("--file-kb", type=int, default=4)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    args = parser.parse_args()
+
+    dfs.LOCK_HOLD_SECONDS = 0
+    dfs.SHORT_CIRCUIT_READS = False  # measure the TCP path through a node
+    results = []
+    with LocalCluster(args.nodes, args.port, mode="process") as cluster:
+        with open(os.path.join(cluster.work_dir, "small.bin"), "wb") as f:
+            f.write(os.urandom(args.file_kb * 1024))
+        measure(args, cluster, 0)  # warm up
+        for rate in [float(r) for r in args.rates.split(",")]:
+            r = measure(args, cluster, rate)
+            results.append(r)
+            print(f"sample rate {rate:<5g}: {r['ops_per_s']:6.0f} ops/s, upload p50 {r['upload_p50_ms']:.2f} ms "
+                  f"p99 {r['upload_p99_ms']:.2f} ms, download p50 {r['download_p50_ms']:.2f} ms "
+                  f"p99 {r['download_p99_ms']:.2f} ms")
+
+    print(f"{args.nodes} nodes, {args.file_kb} KiB file, {args.ops} uploads + {args.ops} downloads per rate")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
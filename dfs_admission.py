@@ -0,0 +1,144 @@
+# dfs_admission.py
+"""Admission control for the master.
+
+Every request the master handles (apart from long-lived streams and
+diagnostics) first takes one of a fixed number of worker slots. Requests
+that find them all busy wait in a bounded queue per priority class:
+
+- "control":  node heartbeats and registrations
+- "finish":   client requests that end work already done or hand back what
+              a client holds (upload completion, lock release)
+- "client":   other client metadata requests
+
+A slot that frees up always goes to the oldest waiting request of the
+highest class. Control requests may also use control_reserve extra slots
+that the other classes never get. So heartbeats don't queue behind a burst
+of client calls (even slow ones holding every regular slot), and healthy
+nodes are not declared dead because the master is busy.
+
+A client request is shed - answered right away with "busy" and a
+retry_after hint instead of queued - when its queue is full, or when the
+queue delay of admitted requests has stayed above target_delay for a whole
+interval. That is the CoDel rule: a standing queue rather than a short
+burst. Queueing longer would only make clients time out after the master
+did the work anyway. Control and finish requests are shed only when their
+own queue is full: shedding an upload's completion would throw away the
+transfer it completes, and shedding a lock release would leave the file
+locked.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dfs_metrics import Histogram
+
+PRIORITIES = ("control", "finish", "client")  # highest first
+DEFAULT_QUEUE_LIMITS = {"control": 10000, "finish": 10000, "client": 256}
+
+
+class AdmissionController:
+    """
+    Run at most `workers` requests at once, highest class first, shedding
+    client requests under a standing queue. workers=0 admits everything.
+    """
+
+    def __init__(self, workers=8, queue_limits=None, target_delay=0.05, interval=0.1, max_retry_after=2.0,
+                 control_reserve=2):
+        self.workers = workers
+        self.control_reserve = control_reserve
+        self.queue_limits = dict(DEFAULT_QUEUE_LIMITS, **(queue_limits or {}))
+        self.target_delay = target_delay
+        self.interval = interval
+        self.max_retry_after = max_retry_after
+        self.busy = 0
+        self._queues = {cls: deque() for cls in PRIORITIES}
+        # when the queue delay last went above target_delay (None: below)
+        self._above_since = None
+        self._delay = 0.0  # queue delay of the last admitted request
+        self._lock = threading.Lock()
+        self.wait = {cls: Histogram() for cls in PRIORITIES}
+        self.admitted = {cls: 0 for cls in PRIORITIES}
+        self.shed = {cls: 0 for cls in PRIORITIES}
+
+    def _overloaded(self, now):
+        """Caller holds _lock."""
+        return self._above_since is not None and now - self._above_since >= self.interval
+
+    def _retry_after(self):
+        """Seconds a shed sender should wait: about how long the queue takes to drain. Caller holds _lock."""
+        queued = sum(len(q) for q in self._queues.values())
+        delay = max(self.target_delay, self._delay) * (1 + queued / max(self.workers, 1))
+        return round(min(self.max_retry_after, delay), 3)
+
+    def _acquire(self, cls):
+        if not self.workers:
+            return None
+        t0 = time.perf_counter()
+        waiter = None
+        with self._lock:
+            limit = self.workers + (self.control_reserve if cls == "control" else 0)
+            # nobody of this class or a higher one may be waiting already
+            ahead = PRIORITIES[:PRIORITIES.index(cls) + 1]
+            if self.busy < limit and not any(self._queues[c] for c in ahead):
+                self.busy += 1
+            else:
+                queue = self._queues[cls]
+                if len(queue) >= self.queue_limits[cls] or (cls == "client" and self._overloaded(t0)):
+                    self.shed[cls] += 1
+                    return self._retry_after()
+                waiter = threading.Event()
+                queue.append(waiter)
+        if waiter is not None:
+            waiter.wait()
+        now = time.perf_counter()
+        waited = now - t0
+        with self._lock:
+            self.wait[cls].observe(waited)
+            self.admitted[cls] += 1
+            self._delay = waited
+            if waited < self.target_delay:
+                self._above_since = None
+            elif self._above_since is None:
+                self._above_since = now
+        return None
+
+    def _release(self):
+        with self._lock:
+            for cls in PRIORITIES:
+                # only control requests get the control reserve
+                if self._queues[cls] and (cls == "control" or self.busy <= self.workers):
+                    waiter = self._queues[cls].popleft()
+                    break
+            else:
+                self.busy -= 1
+                return
+        # the slot passes straight to the waiter, so busy stays the same
+        waiter.set()
+
+    @contextmanager
+    def slot(self, cls):
+        """
+        `with admission.slot("client") as retry_after:` - hold a worker slot
+        for one request. retry_after is None when the request was admitted,
+        otherwise it was shed and retry_after is the backoff hint in seconds.
+        """
+        retry_after = self._acquire(cls)
+        try:
+            yield retry_after
+        finally:
+            if retry_after is None and self.workers:
+                self._release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "overloaded": self._overloaded(time.perf_counter()),
+                "queued": {cls: len(q) for cls, q in self._queues.items()},
+                "admitted": dict(self.admitted),
+                "shed": dict(self.shed),
+                "wait": {cls: h.to_dict() for cls, h in self.wait.items()},
+            }
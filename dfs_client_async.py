@@ -0,0 +1,316 @@
+# dfs_client_async.py
+"""asyncio client for the DFS.
+
+Same operations as dfs_client_lib (upload, download, list, info, delete)
+for programs that run on an event loop, so thousands of small-file
+operations can be in flight from one process without a thread each:
+
+    async with AsyncDFSClient() as client:
+        await client.upload("report.pdf")
+        resp = await client.download_bytes("report.pdf")  # resp["data"]
+
+Connections to masters and storage nodes are kept in a shared pool and
+reused across operations (requests carry "keepalive"). A semaphore caps how
+many uploads/downloads/deletes run at once; further calls wait their turn.
+
+Master addresses, sharding and standby failover follow dfs_client_lib's
+configuration (MASTER_SHARDS / MASTER_HOST / MASTER_PORT). Unlike
+dfs_client_lib.upload_file, upload does not hold the write lock for
+LOCK_HOLD_SECONDS (that pause only exists to demo lock collisions).
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+import dfs_client_lib as dfs
+
+# Uploads/downloads/deletes running at once per client
+MAX_CONCURRENT_TRANSFERS = 256
+
+# Idle connections kept per address (None: as many as MAX_CONCURRENT_TRANSFERS)
+MAX_IDLE_PER_ADDR = None
+
+# Stream buffer limit; a LIST_FILES response is a single header line
+STREAM_LIMIT = 64 * 1024 * 1024
+
+CHUNK_SIZE = 65536
+
+
+class ConnectionPool:
+    """Idle (reader, writer) pairs per "host:port", reused across requests."""
+
+    def __init__(self, max_idle_per_addr=MAX_CONCURRENT_TRANSFERS, timeout=dfs.STALL_TIMEOUT):
+        self.max_idle = max_idle_per_addr
+        self.timeout = timeout
+        self.idle = {}  # addr -> [(reader, writer), ...]
+        self.opened = 0  # connections opened, for stats
+
+    async def _open(self, addr_str):
+        host, port = dfs.parse_addr(addr_str)
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(host, port, limit=STREAM_LIMIT), self.timeout)
+        self.opened += 1
+        return conn
+
+    @asynccontextmanager
+    async def connection(self, addr_str, fresh=False):
+        """
+        Borrow a connection to addr_str. It goes back to the pool when the
+        block exits normally and is closed if the block raises, since the
+        stream may then be left mid-message.
+        """
+        idle = self.idle.get(addr_str)
+        conn = idle.pop() if idle and not fresh else None
+        reused = conn is not None
+        if conn is None:
+            conn = await self._open(addr_str)
+        try:
+            yield conn, reused
+        except BaseException:
+            conn[1].close()
+            raise
+        self._release(addr_str, conn)
+
+    def _release(self, addr_str, conn):
+        reader, writer = conn
+        idle = self.idle.setdefault(addr_str, [])
+        if writer.is_closing() or reader.at_eof() or len(idle) >= self.max_idle:
+            writer.close()
+        else:
+            idle.append(conn)
+
+    async def close(self):
+        for conns in self.idle.values():
+            for _, writer in conns:
+                writer.close()
+        for conns in self.idle.values():
+            for _, writer in conns:
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+        self.idle.clear()
+
+
+async def send_json(writer, obj):
+    writer.write(json.dumps(obj).encode() + b"\n")
+    await writer.drain()
+
+
+async def recv_json(reader, timeout=dfs.STALL_TIMEOUT):
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    if not line:
+        raise ConnectionError("Connection closed by peer")
+    return json.loads(line)
+
+
+class AsyncDFSClient:
+    def __init__(self, max_transfers=MAX_CONCURRENT_TRANSFERS, max_idle_per_addr=MAX_IDLE_PER_ADDR):
+        self.pool = ConnectionPool(max_idle_per_addr or max_transfers)
+        self.transfers = asyncio.Semaphore(max_transfers)
+        self.client_id = dfs.CLIENT_ID
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.pool.close()
+
+    # ---------- Requests ----------
+
+    async def request(self, addr_str, message):
+        """
+        Send one JSON request on a pooled connection and return the reply.
+
+        A pooled connection the peer has closed in the meantime fails on
+        first use; the request is then retried once on a fresh connection.
+        """
+        message = dict(message, keepalive=True)
+        for fresh in (False, True):
+            reused = False
+            try:
+                async with self.pool.connection(addr_str, fresh=fresh) as ((reader, writer), reused):
+                    await send_json(writer, message)
+                    return await recv_json(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if fresh or not reused:
+                    raise
+
+    async def _send_to_group(self, group, message):
+        """Like dfs_client_lib.send_to_master_at: fail over within a shard's masters, back off while busy."""
+        addrs = dfs.master_candidates(group)
+        deadline = time.time() + (dfs.MASTER_FAILOVER_WAIT if len(addrs) > 1 else 0)
+        while True:
+            errors = []
+            for addr_str in addrs:
+                try:
+                    resp = await self.request(addr_str, message)
+                    for attempt in range(dfs.BUSY_RETRIES):
+                        if resp.get("status") != "busy":
+                            break
+                        await asyncio.sleep(dfs.busy_backoff(resp.get("retry_after"), attempt))
+                        resp = await self.request(addr_str, message)
+                except (OSError, asyncio.TimeoutError, ValueError) as e:
+                    errors.append(f"{addr_str}: {e!r}")
+                    continue
+                if resp.get("status") == "standby":
+                    errors.append(f"{addr_str}: standby")
+                    continue
+                dfs.set_active_master(group, addr_str)
+                return resp
+            if time.time() >= deadline:
+                raise ConnectionError("No master reachable: " + "; ".join(errors))
+            await asyncio.sleep(0.2)
+
+    async def send_to_master(self, message):
+        """Route message like dfs_client_lib.send_to_master."""
+        if "filename" in message:
+            return await self._send_to_group(dfs.shard_for(message["filename"]), message)
+        shards = dfs.master_addrs()
+        if message.get("type") == "LIST_FILES" and len(shards) > 1:
+            replies = await asyncio.gather(*(self._send_to_group(g, message) for g in shards))
+            return {"files": sorted(f for r in replies for f in r.get("files", []))}
+        return await self._send_to_group(shards[0], message)
+
+    # ---------- High-level API ----------
+
+    async def list(self):
+        return await self.send_to_master({"type": "LIST_FILES"})
+
+    async def info(self, filename):
+        return await self.send_to_master({"type": "FILE_INFO", "filename": os.path.basename(filename)})
+
+    async def nodes_status(self):
+        return await self.send_to_master({"type": "NODES_STATUS"})
+
+    async def upload(self, filepath, dfs_name=None):
+        """Upload a local file (stored under its basename unless dfs_name is given)."""
+        if not os.path.exists(filepath):
+            return {"status": "error", "message": f"File {filepath} not found"}
+        data = await asyncio.to_thread(_read_file, filepath)
+        return await self.upload_bytes(dfs_name or os.path.basename(filepath), data)
+
+    async def upload_bytes(self, dfs_name, data):
+        """Store data as dfs_name on the replicas the master picks."""
+        async with self.transfers:
+            lock_resp = await self.send_to_master({
+                "type": "LOCK_REQUEST", "filename": dfs_name, "client_id": self.client_id})
+            if lock_resp.get("status") != "ok":
+                return {"status": "error",
+                        "message": lock_resp.get("message", f"File '{dfs_name}' is locked")}
+            try:
+                resp = await self.send_to_master({"type": "UPLOAD_REQUEST", "filename": dfs_name})
+                nodes = resp.get("nodes", [])
+                if not nodes:
+                    return {"status": "error", "message": "No nodes available for upload"}
+
+                results = await asyncio.gather(
+                    *(self._upload_to_node(addr_str, dfs_name, data) for addr_str in nodes),
+                    return_exceptions=True)
+                for addr_str, result in zip(nodes, results):
+                    if isinstance(result, BaseException):
+                        return {"status": "error", "message": f"Upload to {addr_str} failed: {result!r}"}
+
+                done = await self.send_to_master({"type": "UPLOAD_DONE", "filename": dfs_name, "nodes": nodes})
+                if done.get("status") != "ok":
+                    return {"status": "error", "message": "Master failed to register upload"}
+                return {"status": "ok", "message": f"Uploaded {dfs_name} to {len(nodes)} nodes"}
+            finally:
+                try:
+                    release = await self.send_to_master({
+                        "type": "LOCK_RELEASE", "filename": dfs_name, "client_id": self.client_id})
+                except (OSError, asyncio.TimeoutError) as e:
+                    release = {"status": "error", "message": repr(e)}
+                if release.get("status") != "ok":
+                    print(f"[CLIENT] Could not release the lock on {dfs_name}: {release.get('message', release)}")
+
+    async def _upload_to_node(self, addr_str, dfs_name, data):
+        header = {"type": "UPLOAD_FILE", "filename": dfs_name, "size": len(data),
+                  "client_id": self.client_id, "keepalive": True}
+        async with self.pool.connection(addr_str) as ((reader, writer), _):
+            await send_json(writer, header)
+            ready = await recv_json(reader)
+            if ready.get("status") != "ready":
+                raise ConnectionError(f"Node {addr_str} not ready")
+            writer.write(data)
+            await writer.drain()
+            ack = await recv_json(reader)
+            if ack.get("status") != "ok":
+                raise ConnectionError(ack.get("message", "Upload not acknowledged"))
+
+    async def download(self, filename, save_as=None):
+        """Download filename to save_as (default: its DFS name in the current directory)."""
+        dfs_name = os.path.basename(filename)
+        resp = await self.download_bytes(dfs_name)
+        if resp["status"] != "ok":
+            return resp
+        save_as = save_as or dfs_name
+        await asyncio.to_thread(_write_file, save_as, resp["data"])
+        return {"status": "ok", "message": f"Downloaded {dfs_name} from {resp['node']} -> {save_as}"}
+
+    async def download_bytes(self, filename):
+        """
+        Return {"status": "ok", "data": bytes, "node": address} for filename,
+        or an error dict. Replicas are tried in dfs_client_lib.order_replicas order, resuming at the
+        current offset when one fails mid-transfer.
+        """
+        dfs_name = os.path.basename(filename)
+        async with self.transfers:
+            resp = await self.send_to_master({"type": "DOWNLOAD_REQUEST", "filename": dfs_name})
+            if resp.get("status") != "ok":
+                return {"status": "error", "message": resp.get("message", "Download failed")}
+            nodes = resp.get("nodes", [])
+            if not nodes:
+                return {"status": "error", "message": "No alive replicas returned by master"}
+
+            chunks = []
+            errors = []
+            for addr_str in dfs.order_replicas(nodes, resp.get("fast", ())):
+                try:
+                    await self._read_from_node(addr_str, dfs_name, chunks)
+                    return {"status": "ok", "data": b"".join(chunks), "node": addr_str}
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                    errors.append(f"{addr_str}: {e!r}")
+            return {"status": "error", "message": "Failed to download from all replicas: " + "; ".join(errors)}
+
+    async def _read_from_node(self, addr_str, dfs_name, chunks):
+        offset = sum(len(c) for c in chunks)
+        header = {"type": "DOWNLOAD_FILE", "filename": dfs_name, "offset": offset,
+                  "client_id": self.client_id, "keepalive": True}
+        async with self.pool.connection(addr_str) as ((reader, writer), _):
+            await send_json(writer, header)
+            info = await recv_json(reader)
+            if info.get("status") != "ok":
+                raise FileNotFoundError(info.get("message", "Node error"))
+            remaining = info["size"] - offset
+            while remaining > 0:
+                chunk = await asyncio.wait_for(reader.read(min(CHUNK_SIZE, remaining)), dfs.STALL_TIMEOUT)
+                if not chunk:
+                    raise ConnectionError("Connection closed mid-transfer")
+                chunks.append(chunk)
+                remaining -= len(chunk)
+
+    async def delete(self, filename):
+        """One DELETE_REQUEST; nodes delete the replicas in the background (see dfs_client_lib.delete_file)."""
+        dfs_name = os.path.basename(filename)
+        async with self.transfers:
+            resp = await self.send_to_master({"type": "DELETE_REQUEST", "filename": dfs_name})
+            if resp.get("status") == "ok":
+                return {"status": "ok", "message": f"Deleted {dfs_name} from DFS"}
+            return {"status": "error", "message": resp.get("message", "Master failed to remove metadata")}
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
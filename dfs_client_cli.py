@@ -2,6 +2,7 @@
 
 import argparse
 import dfs_client_lib as dfs
+import dfs_tracing
 
 def cmd_list(args):
     resp = dfs.list_files()
@@ -15,22 +16,79 @@ def cmd_status(args):
     nodes = resp.get("nodes", [])
     print("Nodes status:")
     for n in nodes:
-        print(f"  - {n['id']} @ {n['address']} [{n['status']}]")
+        degraded = f" DEGRADED, failed dirs: {', '.join(n['failed_dirs'])}" if n.get("failed_dirs") else ""
+        print(f"  - {n['id']} @ {n['address']} [{n['status']}] load={n.get('load', 0)}{degraded}")
+
+def cmd_stats(args):
+    targets = [(None, None)]  # (node address, master shard)
+    if args.node:
+        targets = [(args.node, None)]
+    elif args.all:
+        targets = [(None, group) for group in dfs.master_addrs()]
+        targets += [(n["address"], None) for n in dfs.get_nodes_status().get("nodes", [])
+                    if n["status"] == "ALIVE"]
+    for node, master in targets:
+        try:
+            resp = dfs.get_stats(node, master=master)
+        except Exception as e:
+            print(f"{node or master}: unreachable ({e})")
+            continue
+        if node is not None:
+            title = f"{resp.get('node_id')} @ {node}"
+        elif master is not None:
+            title = f"master @ {dfs.master_candidates(master)[0]}"
+        else:
+            title = "master"
+        print(f"== {title}")
+        for line in dfs.format_stats(resp.get("metrics", {})):
+            print(line)
 
 def cmd_upload(args):
-    resp = dfs.upload_file(args.path)
+    resp = dfs.upload_file(args.path, resume=args.resume, delta=args.delta or None)
     print(resp.get("message", resp))
 
 def cmd_download(args):
-    resp = dfs.download_file(args.filename, save_as=args.output)
+    resp = dfs.download_file(args.filename, save_as=args.output, hedged=args.hedged or None,
+                             resume=args.resume)
     print(resp.get("message", resp))
 
 def cmd_delete(args):
-    resp = dfs.delete_file(args.filename)
+    if len(args.filenames) == 1:
+        resp = dfs.delete_file(args.filenames[0])
+    else:
+        resp = dfs.delete_files(args.filenames)
+        for name in resp.get("missing", []):
+            print(f"Not found: {name}")
+    print(resp.get("message", resp))
+
+def cmd_sync(args):
+    def progress(s):
+        print(f"\r  {s['done']}/{s['files']} files, {s['bytes_done'] / 1e6:.1f} MB, "
+              f"{s['mb_per_s']:.1f} MB/s, {s['failed']} failed", end="", flush=True)
+
+    resp = dfs.sync_directory(args.folder, workers=args.workers, delete=args.delete,
+                              manifest_path=args.manifest, progress=progress)
+    print()
+    for name, message in resp.get("failed", []):
+        print(f"Failed: {name}: {message}")
     print(resp.get("message", resp))
 
+def cmd_trace(args):
+    spans = dfs.collect_trace(args.trace_id)
+    if args.trace_id:
+        if not spans:
+            print(f"No spans of trace {args.trace_id} (buffers only keep recent spans)")
+        for line in dfs_tracing.timeline(spans):
+            print(line)
+        return
+    print("Recent traces:")
+    for t in dfs_tracing.summarize(spans)[-args.limit:]:
+        duration = f"{t['duration_ms']:.1f} ms" if t["duration_ms"] is not None else "?"
+        print(f"  - {t['trace_id']} {t['name'] or '?'} {duration} ({t['spans']} spans)")
+
 def main():
     parser = argparse.ArgumentParser(description="DFS Client CLI")
+    parser.add_argument("--trace", action="store_true", help="Trace this command and print its timeline")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # list
@@ -41,24 +99,61 @@ def main():
     p_status = subparsers.add_parser("status", help="Show nodes status")
     p_status.set_defaults(func=cmd_status)
 
+    # stats
+    p_stats = subparsers.add_parser("stats", help="Show request metrics from master/nodes")
+    p_stats.add_argument("--node", help="Query this node (host:port) instead of the master", default=None)
+    p_stats.add_argument("--all", action="store_true", help="Query every master shard and every alive node")
+    p_stats.set_defaults(func=cmd_stats)
+
     # upload
     p_upload = subparsers.add_parser("upload", help="Upload a file")
     p_upload.add_argument("path", help="Path to local file")
+    p_upload.add_argument("--resume", action="store_true",
+                          help="Continue an interrupted upload, keeping what the nodes already have")
+    p_upload.add_argument("--delta", action="store_true",
+                          help="Send only the blocks that changed since the version the nodes hold")
     p_upload.set_defaults(func=cmd_upload)
 
     # download
     p_download = subparsers.add_parser("download", help="Download a file")
     p_download.add_argument("filename", help="Filename in DFS")
     p_download.add_argument("-o", "--output", help="Save as (local path)", default=None)
+    p_download.add_argument("--hedged", action="store_true",
+                            help="Race a second replica if the first one is slow to respond")
+    p_download.add_argument("--resume", action="store_true",
+                            help="Continue from a partial <output>.part left by an interrupted download")
     p_download.set_defaults(func=cmd_download)
 
     # delete
-    p_delete = subparsers.add_parser("delete", help="Delete a file from DFS")
-    p_delete.add_argument("filename", help="Filename in DFS")
+    p_delete = subparsers.add_parser("delete", help="Delete files from DFS")
+    p_delete.add_argument("filenames", nargs="+", help="Filenames in DFS")
     p_delete.set_defaults(func=cmd_delete)
 
+    # sync
+    p_sync = subparsers.add_parser("sync", help="Upload the new and changed files of a folder")
+    p_sync.add_argument("folder", help="Local folder (its files, not subfolders)")
+    p_sync.add_argument("--workers", type=int, default=dfs.SYNC_WORKERS, help="Uploads at once")
+    p_sync.add_argument("--delete", action="store_true",
+                        help="Also delete DFS files that an earlier sync uploaded and are gone from the folder")
+    p_sync.add_argument("--manifest", default=None,
+                        help=f"Manifest of synced files (default: <folder>/{dfs.SYNC_MANIFEST})")
+    p_sync.set_defaults(func=cmd_sync)
+
+    # trace
+    p_trace = subparsers.add_parser("trace", help="Show a request trace, or list recent traces")
+    p_trace.add_argument("trace_id", nargs="?", help="Trace id (default: list recent traces)", default=None)
+    p_trace.add_argument("--limit", type=int, default=20, help="Traces to list")
+    p_trace.set_defaults(func=cmd_trace)
+
     args = parser.parse_args()
-    args.func(args)
+    if not args.trace:
+        args.func(args)
+        return
+    with dfs_tracing.trace(f"cli {args.command}", sample=True) as root:
+        args.func(args)
+    print(f"Trace {root.trace_id}:")
+    for line in dfs_tracing.timeline(dfs.collect_trace(root.trace_id)):
+        print(line)
 
 if __name__ == "__main__":
     main()
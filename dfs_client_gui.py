@@ -2,6 +2,7 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+import queue
 import threading
 
 import dfs_client_lib as dfs  # our shared client library
@@ -13,9 +14,18 @@ class DFSClientGUI:
         self.root.title("Distributed File System Client")
         self.root.geometry("900x500")
 
+        # Workers queue UI updates here; drain_ui_queue runs them on the Tk loop
+        self.ui_queue = queue.Queue()
+
         self.create_widgets()
+        self.root.after(100, self.drain_ui_queue)
         self.refresh_files()
 
+        # Node panel is kept live by the master's status stream
+        self.subscription = dfs.StatusSubscription(
+            lambda state: self.call_ui(self.render_nodes_status, state)).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     # ---------- UI Layout ----------
 
     def create_widgets(self):
@@ -96,6 +106,34 @@ class DFSClientGUI:
         self.nodes_text.delete("1.0", tk.END)
         self.nodes_text.insert(tk.END, text)
 
+    def call_ui(self, fn, *args):
+        """Run fn(*args) on the Tk main loop (safe from worker threads)."""
+        self.ui_queue.put((fn, args))
+
+    def drain_ui_queue(self):
+        try:
+            while True:
+                fn, args = self.ui_queue.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        self.root.after(100, self.drain_ui_queue)
+
+    def render_nodes_status(self, state):
+        if not state["connected"]:
+            self.set_nodes_status(f"Master unreachable: {state['error']}")
+            return
+        lines = [f"{state['files']} files, {state['under_replicated']} under-replicated"]
+        for nid, n in sorted(state["nodes"].items()):
+            lines.append(f"{nid} @ {n['address']} [{n['status']}] load={n['load']} "
+                         f"used={n['disk_used'] // 1024} KB "
+                         f"in={n['in_rate'] // 1024} KB/s out={n['out_rate'] // 1024} KB/s")
+        self.set_nodes_status("\n".join(lines))
+
+    def on_close(self):
+        self.subscription.stop()
+        self.root.destroy()
+
     def run_in_thread(self, target, *args):
         t = threading.Thread(target=target, args=args)
         t.daemon = True
@@ -128,19 +166,19 @@ class DFSClientGUI:
         try:
             resp = dfs.get_file_info(filename)
             if resp.get("status") != "ok":
-                self.log("[DETAILS] Error: " + resp.get("message"))
+                self.call_ui(self.log, "[DETAILS] Error: " + resp.get("message"))
                 return
 
             replicas = resp.get("replicas", [])
-            self.log(f"[DETAILS] File: {filename}")
+            self.call_ui(self.log, f"[DETAILS] File: {filename}")
             for r in replicas:
                 nid = r["node_id"]
                 addr = r["address"]
                 alive = "ALIVE" if r["alive"] else "DEAD"
-                self.log(f"  - {nid} @ {addr} [{alive}]")
+                self.call_ui(self.log, f"  - {nid} @ {addr} [{alive}]")
 
         except Exception as e:
-            self.log(f"[DETAILS] Error: {e}")
+            self.call_ui(self.log, f"[DETAILS] Error: {e}")
 
 
     def on_upload(self):
@@ -153,8 +191,8 @@ class DFSClientGUI:
 
     def _upload_worker(self, path):
         resp = dfs.upload_file(path)
-        self.log("[UPLOAD] " + resp.get("message", str(resp)))
-        self.refresh_files()
+        self.call_ui(self.log, "[UPLOAD] " + resp.get("message", str(resp)))
+        self.call_ui(self.refresh_files)
 
     def on_download(self):
         filename = self.get_selected_filename()
@@ -171,7 +209,7 @@ class DFSClientGUI:
 
     def _download_worker(self, filename, save_as):
         resp = dfs.download_file(filename, save_as=save_as)
-        self.log("[DOWNLOAD] " + resp.get("message", str(resp)))
+        self.call_ui(self.log, "[DOWNLOAD] " + resp.get("message", str(resp)))
 
     def on_delete(self):
         filename = self.get_selected_filename()
@@ -187,8 +225,8 @@ class DFSClientGUI:
 
     def _delete_worker(self, filename):
         resp = dfs.delete_file(filename)
-        self.log("[DELETE] " + resp.get("message", str(resp)))
-        self.refresh_files()
+        self.call_ui(self.log, "[DELETE] " + resp.get("message", str(resp)))
+        self.call_ui(self.refresh_files)
 
     def on_list_files(self):
         self.refresh_files()
@@ -199,7 +237,9 @@ class DFSClientGUI:
 
     def _list_files_worker(self):
         resp = dfs.list_files()
-        files = resp.get("files", [])
+        self.call_ui(self._show_files, resp.get("files", []))
+
+    def _show_files(self, files):
         self.files_listbox.delete(0, tk.END)
         for f in files:
             self.files_listbox.insert(tk.END, f)
@@ -216,8 +256,8 @@ class DFSClientGUI:
         for n in nodes:
             lines.append(f"{n['id']} @ {n['address']} [{n['status']}]")
         status_text = "\n".join(lines) if lines else "No nodes registered."
-        self.set_nodes_status(status_text)
-        self.log("[NODES] Status updated.")
+        self.call_ui(self.set_nodes_status, status_text)
+        self.call_ui(self.log, "[NODES] Status updated.")
 
 
 if __name__ == "__main__":
@@ -1,35 +1,243 @@
 # dfs_client_lib.py
 
+import atexit
+import contextvars
+import hashlib
+import io
 import socket
 import json
 import os
+import queue
+import random
+import struct
+import threading
 import time
 import uuid
+from collections import deque
 
-MASTER_HOST = "127.0.0.1"
-MASTER_PORT = 5000
+import dfs_delta
+import dfs_tracing
+from dfs_hashring import HashRing, shards_from_env
+
+MASTER_HOST = os.environ.get("DFS_MASTER_HOST", "127.0.0.1")
+MASTER_PORT = int(os.environ.get("DFS_MASTER_PORT", 5000))
+
+# Metadata shards ("host:port" of each master). Empty means a single master
+# at MASTER_HOST:MASTER_PORT; see dfs_hashring. An entry may list a primary
+# and its standbys as "host:port|host:port"; requests fail over between them.
+MASTER_SHARDS = shards_from_env()
+
+# Seconds to keep retrying a shard whose masters are all unreachable or
+# standby, which covers a standby taking over (only with standbys configured)
+MASTER_FAILOVER_WAIT = 10
+
+# recv_json peeks this many bytes at a time for the end of a header; large
+# headers (snapshots, bulk deletes, inventories) take one peek per chunk
+RECV_PEEK_BYTES = 64 * 1024
+
+# An overloaded master answers "busy" with a retry_after hint (seconds). The
+# request is retried up to BUSY_RETRIES times, waiting a random time between
+# half and all of the hint doubled per attempt (at least BUSY_BACKOFF_MIN,
+# at most BUSY_BACKOFF_MAX), so clients shed together don't return together.
+BUSY_RETRIES = 6
+BUSY_BACKOFF_MIN = 0.05
+BUSY_BACKOFF_MAX = 5.0
+
+# Spans of finished traces are sent to the master by a background thread,
+# one attempt each with this timeout, to the last known primary only.
+# Reports that fail, or find TRACE_REPORT_QUEUE reports already waiting, are
+# dropped. At exit the client waits up to TRACE_REPORT_TIMEOUT for the rest.
+TRACE_REPORT_TIMEOUT = 1.0
+TRACE_REPORT_QUEUE = 100
 
 # This uniquely identifies this client process (GUI or CLI instance)
 CLIENT_ID = str(uuid.uuid4())
 
+# Seconds a replica may go without sending any bytes before we give up on it
+# and continue the transfer from another replica.
+STALL_TIMEOUT = 10
+
+# Smoothing factor for the per-node latency/throughput averages.
+EWMA_ALPHA = 0.3
+
+# Seconds a node that just failed is ranked behind every healthy replica.
+FAILURE_PENALTY = 30
+
+# Seconds upload_file holds the write lock before transferring, so concurrent
+# clients can be seen colliding on the lock (demo critical section).
+LOCK_HOLD_SECONDS = 10
+
+# File names per DELETE_REQUEST sent by delete_files
+DELETE_BATCH = 1000
+
+# Transfers a TransferManager (and so sync_directory) runs at once, and
+# seconds between its progress callbacks
+SYNC_WORKERS = 16
+PROGRESS_INTERVAL = 0.5
+# sync_directory's record of what it uploaded, kept in the synced folder
+SYNC_MANIFEST = ".dfs_sync.json"
+# Changed files at least this large are sent as deltas by sync_directory
+SYNC_DELTA_MIN_BYTES = 1024 * 1024
+
+# Attempts per node for an upload, and rounds over all replicas for a
+# download; each retry resumes where the failed attempt stopped.
+TRANSFER_RETRIES = 3
+RETRY_DELAY = 1.0
+
+# Delta uploads: when a node already holds a version of the file, send only
+# the blocks that changed (see dfs_delta). Per call: upload_file(delta=True).
+DELTA_UPLOADS = False
+
+# Read-ahead of DFSFile: sequential reads fetch this much extra, starting at
+# READAHEAD_MIN and doubling per sequential fetch; random reads fetch only
+# the bytes asked for.
+READAHEAD_MIN = 128 * 1024
+READAHEAD_MAX = 8 * 1024 * 1024
+
+# Hedged reads: when the chosen replica has not delivered its first bytes
+# within the HEDGE_PERCENTILE of recently observed first-byte latencies, the
+# same read is sent to a second replica and the slower one is cancelled.
+HEDGED_READS = False
+HEDGE_PERCENTILE = 95
+# Delay used until enough first-byte samples have been collected.
+HEDGE_DEFAULT_DELAY = 0.05
+HEDGE_MIN_SAMPLES = 20
+
+# Short-circuit reads: a replica on this host (the master tells us its Unix
+# domain socket) passes us an open file descriptor, and we read the file
+# straight from disk instead of through TCP. The socket must be served by the
+# user the node runs as (SO_PEERCRED, so Linux only).
+SHORT_CIRCUIT_READS = os.environ.get("DFS_SHORT_CIRCUIT", "1") != "0" and hasattr(socket, "recv_fds") \
+    and hasattr(socket, "SO_PEERCRED")
+
 
 def send_json(conn, obj):
-    conn.sendall(json.dumps(obj).encode())
+    if "type" in obj:
+        dfs_tracing.inject(obj)  # request headers carry the trace context, if any
+    conn.sendall(json.dumps(obj).encode() + b"\n")
 
 
 def recv_json(conn):
-    data = conn.recv(4096).decode()
-    if not data:
-        raise ConnectionError("No data from server")
-    return json.loads(data)
+    """Read one newline-terminated JSON header.
+
+    Only the header bytes are consumed, so file data sent right behind it
+    stays on the socket for the caller to read.
+    """
+    buf = bytearray()
+    while True:
+        peek = conn.recv(RECV_PEEK_BYTES, socket.MSG_PEEK)
+        if not peek:
+            raise ConnectionError("No data from server")
+        end = peek.find(b"\n")
+        take = len(peek) if end < 0 else end + 1
+        data = conn.recv(take)
+        buf += data
+        if end >= 0 and len(data) == take:
+            break
+    return json.loads(buf)
+
+
+def master_addrs():
+    """Master shards in configuration order ("host:port" or "primary|standby" groups)."""
+    return list(MASTER_SHARDS) or [f"{MASTER_HOST}:{MASTER_PORT}"]
+
+
+# shard group -> address that last answered as primary
+_active_master = {}
+
+
+def set_active_master(group, addr_str):
+    """Remember addr_str as the master of group that answered as primary."""
+    _active_master[group] = addr_str
+
+
+def master_candidates(group):
+    """Addresses of one shard's masters, the last known primary first."""
+    addrs = group.split("|")
+    active = _active_master.get(group)
+    if active in addrs:
+        i = addrs.index(active)
+        addrs = addrs[i:] + addrs[:i]
+    return addrs
+
+
+_ring = None
+
+
+def shard_for(filename):
+    """Address of the master shard that owns filename."""
+    global _ring
+    shards = master_addrs()
+    if _ring is None or _ring.shards != shards:
+        _ring = HashRing(shards)
+    return _ring.shard_for(filename)
+
+
+def busy_backoff(retry_after, attempt):
+    """Seconds to wait before retry number attempt (0-based) of a request shed with retry_after."""
+    ceiling = min(BUSY_BACKOFF_MAX, max(retry_after or 0, BUSY_BACKOFF_MIN) * 2 ** attempt)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _request_master(addr_str, message):
+    """One request to one master, retried with backoff while it answers "busy"."""
+    for attempt in range(BUSY_RETRIES + 1):
+        with dfs_tracing.span(f"master {message.get('type')}", master=addr_str), \
+                socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+            send_json(s, message)
+            resp = recv_json(s)
+        if resp.get("status") != "busy" or attempt == BUSY_RETRIES:
+            return resp
+        time.sleep(busy_backoff(resp.get("retry_after"), attempt))
+
+
+def send_to_master_at(group, message: dict) -> dict:
+    """
+    Send message to one shard, trying its masters in turn. A master that is
+    down or answers "standby" is skipped; while every master of a group with
+    standbys is, retry for up to MASTER_FAILOVER_WAIT seconds. A master that
+    answers "busy" is asked again after a backoff (see BUSY_RETRIES); if it
+    stays busy, its last "busy" reply is returned.
+    """
+    addrs = master_candidates(group)
+    deadline = time.time() + (MASTER_FAILOVER_WAIT if len(addrs) > 1 else 0)
+    while True:
+        errors = []
+        for addr_str in addrs:
+            try:
+                resp = _request_master(addr_str, message)
+            except OSError as e:
+                errors.append(f"{addr_str}: {e}")
+                continue
+            if resp.get("status") == "standby":
+                errors.append(f"{addr_str}: standby")
+                continue
+            set_active_master(group, addr_str)
+            return resp
+        if time.time() >= deadline:
+            if len(addrs) == 1:
+                raise ConnectionError(errors[0])
+            raise ConnectionError("No primary master: " + "; ".join(errors))
+        time.sleep(0.2)
 
 
 def send_to_master(message: dict) -> dict:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((MASTER_HOST, MASTER_PORT))
-        send_json(s, message)
-        resp = recv_json(s)
-    return resp
+    """
+    Send message to the master shard responsible for it.
+
+    Requests about one file go to the shard owning that file name,
+    LIST_FILES is asked of every shard and merged, and cluster-wide requests
+    (node status, stats) go to the first shard - every shard knows all nodes.
+    """
+    if "filename" in message:
+        return send_to_master_at(shard_for(message["filename"]), message)
+    shards = master_addrs()
+    if message.get("type") == "LIST_FILES" and len(shards) > 1:
+        files = []
+        for addr_str in shards:
+            files.extend(send_to_master_at(addr_str, message).get("files", []))
+        return {"files": sorted(files)}
+    return send_to_master_at(shards[0], message)
 
 
 def parse_addr(addr_str):
@@ -37,6 +245,288 @@ def parse_addr(addr_str):
     return host, int(port_str)
 
 
+# ---------- Replica selection ----------
+
+class ReplicaStats:
+    """Running view of how one storage node has performed for this client."""
+
+    def __init__(self):
+        self.latency = None      # EWMA seconds until the response header arrives
+        self.throughput = None   # EWMA bytes/second of the payload
+        self.inflight = 0        # transfers currently running against the node
+        self.failed_at = None    # time of the most recent error or stall
+
+    def record(self, latency=None, throughput=None):
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency)
+        if throughput is not None:
+            self.throughput = throughput if self.throughput is None else (
+                EWMA_ALPHA * throughput + (1 - EWMA_ALPHA) * self.throughput)
+
+    def score(self):
+        """Estimated cost (seconds) of reading 1 MiB from this node; lower is better.
+
+        Nodes we have not measured yet score 0 so they get tried.
+        """
+        cost = self.latency or 0.0
+        if self.throughput:
+            cost += (1 << 20) / self.throughput
+        cost *= 1 + self.inflight
+        if self.failed_at is not None and time.time() - self.failed_at < FAILURE_PENALTY:
+            cost += FAILURE_PENALTY
+        return cost
+
+
+_replica_stats = {}
+_stats_lock = threading.Lock()
+
+# Recent seconds-to-first-byte of reads, across all nodes
+_first_byte_samples = deque(maxlen=512)
+
+
+def hedge_delay():
+    """Seconds to wait on the first replica before sending a hedged read."""
+    with _stats_lock:
+        samples = sorted(_first_byte_samples)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    idx = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))
+    return samples[idx]
+
+
+def _stats_for(addr_str):
+    with _stats_lock:
+        stats = _replica_stats.get(addr_str)
+        if stats is None:
+            stats = _replica_stats[addr_str] = ReplicaStats()
+        return stats
+
+
+def order_replicas(addrs, preferred=()):
+    """
+    Order replica addresses for a read.
+
+    The first entry is picked with power-of-two-choices (the better of two
+    random replicas) so load spreads across replicas with similar scores;
+    the rest follow best-first and serve as failover targets. Replicas in
+    preferred (e.g. on a node's fast tier) go before all others.
+    """
+    first_choice = [a for a in addrs if a in preferred]
+    if first_choice and len(first_choice) < len(addrs):
+        return order_replicas(first_choice) + order_replicas([a for a in addrs if a not in preferred])
+    if len(addrs) <= 1:
+        return list(addrs)
+    with _stats_lock:
+        scores = {a: (_replica_stats[a].score() if a in _replica_stats else 0.0) for a in addrs}
+    a, b = random.sample(list(addrs), 2)
+    first = a if scores[a] <= scores[b] else b
+    rest = sorted((x for x in addrs if x != first), key=lambda x: scores[x])
+    return [first] + rest
+
+
+class _HedgeRace:
+    """The sink, the attempts and the winner of one hedged read."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.lock = threading.Lock()
+        self.winner = None
+        self.attempts = []
+
+
+class ReadAttempt:
+    """
+    One in-flight read of a file from a single replica (used by hedged reads).
+
+    It is the sink _read_from_node appends to: the first attempt to receive
+    data wins the race, cancels the others and from then on writes straight
+    into the race's sink. Nothing is buffered, whichever attempt wins.
+    """
+
+    def __init__(self, addr_str, race):
+        self.addr = addr_str
+        self.race = race
+        self.sock = None
+        self.cancelled = False
+        # Set once the first bytes arrive, or when the attempt ends either way
+        self.started = threading.Event()
+
+    def append(self, data):
+        race = self.race
+        if race.winner is not self:
+            with race.lock:
+                if race.winner is None:
+                    race.winner = self
+                    for other in race.attempts:
+                        if other is not self:
+                            other.cancel()
+            if race.winner is not self:
+                raise ConnectionError("Read cancelled")
+        race.sink.append(data)
+
+    def cancel(self):
+        self.cancelled = True
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _read_from_node(addr_str, dfs_name, offset, chunks, attempt=None):
+    """
+    Stream dfs_name from one node starting at offset, appending data to chunks
+    (a list or a sink such as _PartialFile).
+
+    Returns the total file size. Raises on error or stall; whatever arrived
+    before that is already in chunks, so the caller can resume elsewhere.
+    """
+    host, port = parse_addr(addr_str)
+    stats = _stats_for(addr_str)
+    with _stats_lock:
+        stats.inflight += 1
+    try:
+        start = time.time()
+        with dfs_tracing.span("read", node=addr_str, offset=offset), \
+                socket.create_connection((host, port), timeout=STALL_TIMEOUT) as s:
+            if attempt is not None:
+                attempt.sock = s
+                if attempt.cancelled:
+                    raise ConnectionError("Read cancelled")
+            send_json(s, {"type": "DOWNLOAD_FILE", "filename": dfs_name, "offset": offset,
+                          "client_id": CLIENT_ID})
+            info = recv_json(s)
+            if info.get("status") != "ok":
+                raise FileNotFoundError(info.get("message", "Node error"))
+            header_at = time.time()
+
+            size = info.get("size")
+            remaining = size - offset
+            received = 0
+            first_byte_at = header_at if remaining <= 0 else None
+            while remaining > 0:
+                # recv raises socket.timeout once the node stalls
+                chunk = s.recv(min(4096, remaining))
+                if not chunk:
+                    raise ConnectionError("Connection closed mid-transfer")
+                if first_byte_at is None:
+                    first_byte_at = time.time()
+                    if attempt is not None:
+                        attempt.started.set()
+                chunks.append(chunk)
+                received += len(chunk)
+                remaining -= len(chunk)
+            dfs_tracing.annotate(bytes=received)
+
+        elapsed = time.time() - header_at
+        with _stats_lock:
+            stats.record(
+                latency=header_at - start,
+                throughput=received / elapsed if received >= 65536 and elapsed > 0 else None,
+            )
+            _first_byte_samples.append(first_byte_at - start)
+        return size
+    except Exception:
+        # A hedged read we cancelled ourselves says nothing about the node
+        if attempt is None or not attempt.cancelled:
+            with _stats_lock:
+                stats.failed_at = time.time()
+        raise
+    finally:
+        with _stats_lock:
+            stats.inflight -= 1
+        if attempt is not None:
+            attempt.started.set()
+
+
+def _hedged_read(addrs, dfs_name, sink):
+    """
+    Read dfs_name into sink from addrs[0], sending the same read to addrs[1]
+    if the first replica has not started delivering within hedge_delay() (or
+    fails before it does).
+
+    The race only lasts until the first bytes arrive: the replica that sends
+    them streams the rest into sink and the other read is cancelled. Returns
+    the winner's address. Raises if both replicas fail, or if the winner fails
+    mid-transfer; sink then holds what arrived, so the caller can resume at
+    sink.size elsewhere.
+    """
+    race = _HedgeRace(sink)
+    results = queue.Queue()
+
+    def run(attempt):
+        try:
+            _read_from_node(attempt.addr, dfs_name, 0, attempt, attempt)
+            results.put((attempt, None))
+        except Exception as e:
+            results.put((attempt, e))
+
+    def launch(addr_str):
+        attempt = ReadAttempt(addr_str, race)
+        with race.lock:
+            race.attempts.append(attempt)
+            if race.winner is not None:
+                attempt.cancel()
+        # the thread's read span belongs to the caller's trace
+        threading.Thread(target=contextvars.copy_context().run, args=(run, attempt), daemon=True).start()
+
+    launch(addrs[0])
+    if not race.attempts[0].started.wait(hedge_delay()):
+        launch(addrs[1])
+
+    errors = []
+    while True:
+        attempt, err = results.get()
+        if err is None:
+            # the winner, or the first to finish an empty file
+            for other in race.attempts:
+                if other is not attempt:
+                    other.cancel()
+            return attempt.addr
+        errors.append(f"{attempt.addr}: {err}")
+        if attempt is race.winner:
+            raise ConnectionError("; ".join(errors))
+        if len(race.attempts) == 1:
+            # primary failed before the hedge delay ran out
+            launch(addrs[1])
+        elif len(errors) == len(race.attempts):
+            raise ConnectionError("; ".join(errors))
+
+
+def format_stats(metrics):
+    """Render the metrics of a STATS response as text lines (CLI / dashboard)."""
+    lines = [f"{metrics.get('role', '?')}: up {metrics.get('uptime_s', 0):.0f}s, "
+             f"{metrics.get('active_connections', 0)} active connection(s)"]
+    for key in ("ha_role", "files", "nodes_alive"):
+        if key in metrics:
+            lines.append(f"  {key}: {metrics[key]}")
+    admission = metrics.get("admission")
+    if admission:
+        lines.append(f"  admission: {admission['busy']}/{admission['workers']} workers busy"
+                     + (", OVERLOADED" if admission["overloaded"] else ""))
+        for cls, hist in admission["wait"].items():
+            lines.append(f"    {cls:10s} queued {admission['queued'][cls]:4d}  admitted {admission['admitted'][cls]:8d}  "
+                         f"shed {admission['shed'][cls]:6d}  wait avg {hist['avg_ms']:.2f} ms  p99 {hist['p99_ms']:.2f} ms")
+    if metrics.get("failed_dirs"):
+        lines.append(f"  failed_dirs: {', '.join(metrics['failed_dirs'])}")
+    for directory, io in metrics.get("io", {}).items():
+        lines.append(f"  io {directory}: {io['busy']}/{io['workers']} slots busy")
+        for cls, hist in io["wait"].items():
+            lines.append(f"    {cls:10s} queued {io['queued'][cls]:4d}  ops {io['ops'][cls]:8d}  "
+                         f"wait avg {hist['avg_ms']:.2f} ms  p99 {hist['p99_ms']:.2f} ms")
+    if metrics.get("io_throttled_s"):
+        lines.append(f"  io_throttled_s: {metrics['io_throttled_s']}")
+    lines.append(f"  {'type':18s} {'count':>8s} {'in KB':>9s} {'out KB':>9s} "
+                 f"{'avg ms':>8s} {'p99 ms':>8s} {'lock ms':>8s}")
+    for mtype, r in sorted(metrics.get("requests", {}).items()):
+        lines.append(f"  {mtype:18s} {r['count']:8d} {r['bytes_in'] / 1024:9.1f} "
+                     f"{r['bytes_out'] / 1024:9.1f} {r['handler']['avg_ms']:8.2f} "
+                     f"{r['handler']['p99_ms']:8.2f} {r['lock_wait']['avg_ms']:8.3f}")
+    return lines
+
+
 # ---------- High-level API ----------
 
 def list_files():
@@ -55,7 +545,325 @@ def get_nodes_status():
     return send_to_master(req)
 
 
-def upload_file(filepath: str):
+class StatusSubscription:
+    """
+    Live cluster status pushed by the master (SUBSCRIBE_STATUS).
+
+    Runs a background thread per master shard, each holding one connection,
+    and calls on_update(state) with the merged view after every message:
+        {"nodes": {node_id: {...}}, "files": int, "under_replicated": int,
+         "connected": bool, "error": str or None}
+    File counters are summed over shards; "connected" means every shard is.
+    on_update runs on a subscription thread; GUI code should hand the state
+    to its own main loop. Reconnects with backoff if a master goes away,
+    moving to a shard's standby once it has taken over.
+    """
+
+    def __init__(self, on_update, reconnect_delay=2.0):
+        self.on_update = on_update
+        self.reconnect_delay = reconnect_delay
+        self.state = {"nodes": {}, "files": 0, "under_replicated": 0,
+                      "connected": False, "error": None}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._socks = {}
+        self._addrs = master_addrs()
+        self._shards = {}  # shard -> {"files", "under_replicated", "connected"}
+        self._threads = [threading.Thread(target=self._run, args=(group,), daemon=True)
+                         for group in self._addrs]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for sock in list(self._socks.values()):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _publish(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            self.state["files"] = sum(sh["files"] for sh in shards)
+            self.state["under_replicated"] = sum(sh["under_replicated"] for sh in shards)
+            self.state["connected"] = (len(shards) == len(self._addrs)
+                                       and all(sh["connected"] for sh in shards))
+            state = dict(self.state)
+            state["nodes"] = {k: dict(v) for k, v in self.state["nodes"].items()}
+        self.on_update(state)
+
+    def _apply(self, group, msg):
+        with self._lock:
+            # Every shard reports the same nodes; only the first one is needed
+            if group == self._addrs[0]:
+                if msg.get("full"):
+                    self.state["nodes"] = {}
+                for n in msg.get("nodes", []):
+                    self.state["nodes"][n["id"]] = n
+            shard = self._shards[group]
+            shard["files"] = msg.get("files", 0)
+            shard["under_replicated"] = msg.get("under_replicated", 0)
+
+    def _set_connected(self, group, connected, error=None):
+        with self._lock:
+            shard = self._shards.setdefault(group, {"files": 0, "under_replicated": 0})
+            shard["connected"] = connected
+            self.state["error"] = error
+
+    def _run(self, group):
+        attempt = 0
+        while not self._stop.is_set():
+            candidates = master_candidates(group)
+            addr_str = candidates[attempt % len(candidates)]
+            try:
+                with socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+                    self._socks[group] = s
+                    s.settimeout(None)
+                    send_json(s, {"type": "SUBSCRIBE_STATUS"})
+                    buf = b""
+                    while not self._stop.is_set():
+                        data = s.recv(65536)
+                        if not data:
+                            raise ConnectionError("Master closed the status stream")
+                        buf += data
+                        *lines, buf = buf.split(b"\n")
+                        for line in lines:
+                            if not line.strip():
+                                continue
+                            msg = json.loads(line)
+                            if msg.get("status") == "standby":
+                                raise ConnectionError(f"{addr_str} is a standby")
+                            if msg.get("full"):
+                                set_active_master(group, addr_str)
+                                self._set_connected(group, True)
+                                attempt = 0
+                            self._apply(group, msg)
+                        if lines:
+                            self._publish()
+            except (OSError, ValueError) as e:
+                if self._stop.is_set():
+                    break
+                self._set_connected(group, False, f"{addr_str}: {e}")
+                self._publish()
+                attempt += 1
+            finally:
+                self._socks.pop(group, None)
+            # try the next master of the group right away, then back off
+            if attempt % len(candidates):
+                continue
+            self._stop.wait(self.reconnect_delay)
+
+
+def get_stats(node_addr: str = None, master: str = None):
+    """Fetch request metrics from the master (or the given master shard),
+    or from the node at node_addr."""
+    if node_addr is None:
+        if master is not None:
+            return send_to_master_at(master, {"type": "STATS"})
+        return send_to_master({"type": "STATS"})
+    host, port = parse_addr(node_addr)
+    with socket.create_connection((host, port), timeout=STALL_TIMEOUT) as s:
+        send_json(s, {"type": "STATS"})
+        return recv_json(s)
+
+
+_trace_reports = queue.Queue(TRACE_REPORT_QUEUE)
+_trace_sender = None
+_trace_sender_lock = threading.Lock()
+
+
+def _report_trace(spans):
+    """
+    dfs_tracing reporter: keep this client's spans of a finished trace at
+    the master. Only queues them, so the traced operation never waits for
+    the master (see TRACE_REPORT_TIMEOUT).
+    """
+    global _trace_sender
+    try:
+        _trace_reports.put_nowait(spans)
+    except queue.Full:
+        return
+    with _trace_sender_lock:
+        if _trace_sender is None:
+            _trace_sender = threading.Thread(target=_send_trace_reports, daemon=True)
+            _trace_sender.start()
+
+
+def _send_trace_reports():
+    while True:
+        spans = _trace_reports.get()
+        try:
+            addr_str = master_candidates(master_addrs()[0])[0]
+            with socket.create_connection(parse_addr(addr_str), timeout=TRACE_REPORT_TIMEOUT) as s:
+                send_json(s, {"type": "TRACE_REPORT", "spans": spans})
+                recv_json(s)
+        except (OSError, ValueError):
+            pass  # dropped; traces are diagnostics
+        finally:
+            _trace_reports.task_done()
+
+
+@atexit.register
+def _flush_trace_reports():
+    """Give queued trace reports up to TRACE_REPORT_TIMEOUT to go out before the process exits."""
+    deadline = time.monotonic() + TRACE_REPORT_TIMEOUT
+    while _trace_reports.unfinished_tasks and _trace_sender is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+dfs_tracing.REPORTERS.append(_report_trace)
+
+
+def collect_trace(trace_id=None):
+    """
+    Spans of one trace (or of every buffered trace) from this process, all
+    master shards and all alive nodes, without duplicates.
+    """
+    spans = {s["span_id"]: s for s in dfs_tracing.dump(trace_id)}
+    msg = {"type": "TRACE_DUMP", "trace_id": trace_id}
+    sources = [("master", addr_str) for addr_str in master_addrs()]
+    try:
+        sources += [("node", n["address"]) for n in get_nodes_status().get("nodes", [])
+                    if n.get("status") == "ALIVE"]
+    except OSError:
+        pass
+    for kind, addr_str in sources:
+        try:
+            if kind == "master":
+                resp = send_to_master_at(addr_str, msg)
+            else:
+                with socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+                    send_json(s, msg)
+                    resp = recv_json(s)
+        except OSError:
+            continue
+        for span in resp.get("spans", []):
+            spans[span["span_id"]] = span
+    return sorted(spans.values(), key=lambda s: s["start"])
+
+
+def _node_checksums(addr_str, dfs_name, partial, length=None):
+    """BLOCK_CHECKSUMS of dfs_name on one node (its partial upload if partial)."""
+    msg = {"type": "BLOCK_CHECKSUMS", "filename": dfs_name, "partial": partial, "client_id": CLIENT_ID}
+    if length is not None:
+        msg["length"] = length
+    with socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+        send_json(s, msg)
+        resp = recv_json(s)
+    if resp.get("status") != "ok":
+        raise ConnectionError(resp.get("message", "Checksum request failed"))
+    return resp
+
+
+def _verified_prefix(path, checksums):
+    """Bytes at the start of local file path that match the node's block checksums."""
+    block_size = checksums["block_size"]
+    length = checksums["length"]  # bytes the checksums cover
+    verified = 0
+    with open(path, "rb") as f:
+        for digest in checksums["blocks"]:
+            want = min(block_size, length - verified)
+            data = f.read(want)
+            if len(data) < want or hashlib.sha256(data).hexdigest() != digest:
+                break
+            verified += len(data)
+    return verified
+
+
+def _upload_to_node(addr_str, filepath, dfs_name, filesize, resume):
+    """
+    Send filepath to one node. With resume, first ask the node what it kept
+    of an earlier attempt and send only the rest.
+    """
+    offset = 0
+    if resume:
+        offset = _verified_prefix(filepath, _node_checksums(addr_str, dfs_name, True, filesize))
+    with dfs_tracing.span("upload", node=addr_str, offset=offset, bytes=filesize - offset), \
+            socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+        send_json(s, {"type": "UPLOAD_FILE", "filename": dfs_name, "size": filesize, "offset": offset,
+                      "client_id": CLIENT_ID})
+        ready = recv_json(s)
+        if ready.get("status") != "ready":
+            raise ConnectionError(ready.get("message", f"Node {addr_str} not ready"))
+        with open(filepath, "rb") as f:
+            f.seek(offset)
+            while True:
+                chunk = f.read(65536)
+                if not chunk:
+                    break
+                s.sendall(chunk)
+        # the node renames the file into place before acknowledging
+        ack = recv_json(s)
+        if ack.get("status") != "ok":
+            raise ConnectionError(ack.get("message", "Upload not acknowledged"))
+    return offset
+
+
+def _delta_upload_to_node(addr_str, filepath, dfs_name, filesize, sha256, deltas):
+    """
+    Send filepath to one node as a delta against the version it holds.
+
+    deltas caches computed deltas by the node's signatures, so replicas
+    with identical copies are diffed once. Returns the literal bytes sent,
+    or None if the node has no copy or the file changed too much, in which
+    case the caller sends the whole file.
+    """
+    with dfs_tracing.span("get_signatures", node=addr_str), \
+            socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+        send_json(s, {"type": "GET_SIGNATURES", "filename": dfs_name,
+                      "block_size": dfs_delta.DELTA_BLOCK_SIZE, "client_id": CLIENT_ID})
+        sig = recv_json(s)
+    if sig.get("status") != "ok":
+        return None
+    key = (sig["size"], sig["block_size"],
+           hashlib.sha256(json.dumps(sig["signatures"]).encode()).hexdigest())
+    if key not in deltas:
+        with dfs_tracing.span("compute_delta"):
+            deltas[key] = dfs_delta.compute_delta(filepath, sig["signatures"], sig["size"], sig["block_size"])
+    ops = deltas[key]
+    if ops is None:
+        return None
+
+    with dfs_tracing.span("delta_upload", node=addr_str, bytes=dfs_delta.delta_literal_bytes(ops)), \
+            socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT) as s:
+        send_json(s, {"type": "DELTA_UPLOAD", "filename": dfs_name, "size": filesize,
+                      "block_size": sig["block_size"], "sha256": sha256, "client_id": CLIENT_ID})
+        ready = recv_json(s)
+        if ready.get("status") != "ready":
+            raise ConnectionError(ready.get("message", f"Node {addr_str} not ready"))
+        with open(filepath, "rb") as f:
+            for op in ops:
+                if op[0] == "copy":
+                    send_json(s, {"op": "copy", "block": op[1], "count": op[2]})
+                    continue
+                send_json(s, {"op": "data", "length": op[2]})
+                f.seek(op[1])
+                remaining = op[2]
+                while remaining > 0:
+                    chunk = f.read(min(65536, remaining))
+                    s.sendall(chunk)
+                    remaining -= len(chunk)
+        send_json(s, {"op": "end"})
+        ack = recv_json(s)
+        if ack.get("status") != "ok":
+            raise ConnectionError(ack.get("message", "Delta upload not acknowledged"))
+    return dfs_delta.delta_literal_bytes(ops)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dfs_tracing.traced("upload_file")
+def upload_file(filepath: str, resume: bool = False, delta: bool = None, lock_hold: float = None):
     """
     Upload file to DFS with replication and write-locking.
 
@@ -63,15 +871,32 @@ def upload_file(filepath: str):
       1. Check file exists locally.
       2. Acquire write lock from master.
       3. Ask master where to upload.
-      4. Upload to each node.
+      4. Upload to each node; nodes commit the file only once it is complete.
+         A failed transfer is retried (TRANSFER_RETRIES), continuing from
+         the bytes the node already holds after checking their checksums.
       5. Inform master (UPLOAD_DONE).
       6. Release write lock.
+
+    With resume=True the first attempt already continues whatever an earlier
+    interrupted upload of this file left on the nodes.
+
+    With delta=True (default: DELTA_UPLOADS) nodes that hold a version of
+    the file get only the changed blocks and rebuild the new version from
+    their copy; the others, and any failed delta, get the whole file.
+
+    lock_hold (default: LOCK_HOLD_SECONDS) is how long the write lock is
+    held before transferring; bulk uploads such as sync_directory pass 0.
     """
+    if delta is None:
+        delta = DELTA_UPLOADS
+    if lock_hold is None:
+        lock_hold = LOCK_HOLD_SECONDS
     if not os.path.exists(filepath):
         return {"status": "error", "message": f"File {filepath} not found"}
 
     filename = os.path.basename(filepath)   # DFS filename
     filesize = os.path.getsize(filepath)
+    dfs_tracing.annotate(filename=filename, size=filesize)
 
     # 1 & 2. Acquire lock for this filename
     lock_resp = send_to_master({
@@ -87,7 +912,9 @@ def upload_file(filepath: str):
         }
 
     # Hold lock for a while so concurrent clients can collide (demo critical section)
-    time.sleep(10)
+    if lock_hold:
+        with dfs_tracing.span("lock_hold"):
+            time.sleep(lock_hold)
 
     try:
         # 3. Ask master for nodes
@@ -97,26 +924,33 @@ def upload_file(filepath: str):
             return {"status": "error", "message": "No nodes available for upload"}
 
         # 4. Upload to each node
-        with open(filepath, "rb") as f:
-            file_data = f.read()
-
+        resumed = 0
+        sent = 0
+        if delta:
+            sha256 = _file_sha256(filepath)
+            deltas = {}
         for addr_str in nodes:
-            host, port = parse_addr(addr_str)
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.connect((host, port))
-                    header = {
-                        "type": "UPLOAD_FILE",
-                        "filename": filename,
-                        "size": filesize,
-                    }
-                    send_json(s, header)
-                    ready = recv_json(s)
-                    if ready.get("status") != "ready":
-                        return {"status": "error", "message": f"Node {addr_str} not ready"}
-                    s.sendall(file_data)
-            except Exception as e:
-                return {"status": "error", "message": f"Upload to {addr_str} failed: {e}"}
+            if delta and not resume:
+                try:
+                    literal = _delta_upload_to_node(addr_str, filepath, filename, filesize, sha256, deltas)
+                except Exception as e:
+                    print(f"[CLIENT] Delta upload to {addr_str} failed ({e}), sending the whole file")
+                    literal = None
+                if literal is not None:
+                    sent += literal
+                    continue
+            sent += filesize
+            for attempt in range(TRANSFER_RETRIES):
+                try:
+                    resumed += _upload_to_node(addr_str, filepath, filename, filesize,
+                                               resume=resume or attempt > 0)
+                    break
+                except Exception as e:
+                    error = e
+                    if attempt + 1 < TRANSFER_RETRIES:
+                        time.sleep(RETRY_DELAY)
+            else:
+                return {"status": "error", "message": f"Upload to {addr_str} failed: {error}"}
 
         # 5. Inform master
         done_resp = send_to_master({
@@ -126,33 +960,142 @@ def upload_file(filepath: str):
         })
 
         if done_resp.get("status") == "ok":
-            return {"status": "ok", "message": f"Uploaded {filename} to {len(nodes)} nodes"}
+            message = f"Uploaded {filename} to {len(nodes)} nodes"
+            if resumed:
+                message += f" ({resumed} bytes already on the nodes were kept)"
+            if delta:
+                message += f" (delta: sent {sent} of {filesize * len(nodes)} bytes)"
+            return {"status": "ok", "message": message}
         else:
             return {"status": "error", "message": "Master failed to register upload"}
 
     finally:
         # 6. Always try to release lock (even if upload failed midway)
         try:
-            send_to_master({
+            release = send_to_master({
                 "type": "LOCK_RELEASE",
                 "filename": filename,
                 "client_id": CLIENT_ID
             })
-        except Exception:
-            # If master is down, just ignore here
-            pass
+        except Exception as e:
+            release = {"status": "error", "message": str(e)}
+        if release.get("status") != "ok":
+            print(f"[CLIENT] Could not release the lock on {filename}: {release.get('message', release)}")
+
+
+class _PartialFile:
+    """Sink for _read_from_node that streams into the partial download file."""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.size = size
+
+    def append(self, data):
+        self.f.write(data)
+        self.size += len(data)
+
 
+def _open_local(addr_str, sock_path, dfs_name, uid=None):
+    """
+    Ask the replica at addr_str for an open file descriptor of dfs_name over
+    its Unix domain socket (OPEN_FILE). Returns (fd, size), or None when the
+    socket is not on this host, belongs to another node or the node declines.
+
+    The process listening on the socket must run as uid, the user the node
+    reported to the master (or as this client's user, if unknown); anyone
+    else could have put a socket at that path.
+    """
+    if not SHORT_CIRCUIT_READS or not sock_path or not os.path.exists(sock_path):
+        return None
+    fds = []
+    try:
+        with dfs_tracing.span("open_local", node=addr_str), \
+                socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(STALL_TIMEOUT)
+            s.connect(sock_path)
+            creds = s.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+            if struct.unpack("3i", creds)[1] != (os.geteuid() if uid is None else uid):
+                return None
+            send_json(s, {"type": "OPEN_FILE", "filename": dfs_name, "client_id": CLIENT_ID})
+            msg, fds, _, _ = socket.recv_fds(s, 65536, 1)
+            while msg and not msg.endswith(b"\n"):
+                chunk = s.recv(65536)
+                if not chunk:
+                    break
+                msg += chunk
+        resp = json.loads(msg)
+        if resp.get("status") == "ok" and resp.get("addr") == addr_str and fds:
+            return fds.pop(), resp["size"]
+    except (OSError, ValueError):
+        pass
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return None
+
+
+def _pread_all(fd, n, offset):
+    """n bytes at offset of fd (fewer only at end of file)."""
+    parts = []
+    while n > 0:
+        data = os.pread(fd, n, offset)
+        if not data:
+            break
+        parts.append(data)
+        n -= len(data)
+        offset += len(data)
+    return b"".join(parts)
 
-def download_file(filename: str, save_as: str = None):
+
+def _copy_local(fd, f, size):
+    """Copy size bytes of fd into the open file f, in the kernel where possible. Returns bytes copied."""
+    f.flush()
+    out = f.fileno()
+    copied = 0
+    kernel = hasattr(os, "sendfile")
+    while copied < size:
+        n = 0
+        if kernel:
+            try:
+                n = os.sendfile(out, fd, copied, size - copied)
+            except OSError:
+                kernel = False  # e.g. macOS only sends to sockets
+                continue
+        else:
+            data = os.pread(fd, min(size - copied, 1024 * 1024), copied)
+            f.write(data)
+            f.flush()
+            n = len(data)
+        if not n:
+            break
+        copied += n
+    return copied
+
+
+@dfs_tracing.traced("download_file")
+def download_file(filename: str, save_as: str = None, hedged: bool = None, resume: bool = False):
     """
     Download file from DFS.
       1. Ask master for alive replicas.
-      2. Download from the first available node.
+      2. Download from the best replica (see order_replicas) into
+         save_as + ".part", failing over to the next one and resuming at the
+         current byte offset if a node errors or stalls mid-transfer. If every
+         replica fails, try them all again (TRANSFER_RETRIES rounds).
+      3. Rename the finished file to save_as.
+
+    With hedged=True (default: HEDGED_READS) a slow first replica is raced
+    against a second one and whichever finishes first wins. A replica on this
+    host is read directly from its disk instead (see SHORT_CIRCUIT_READS).
+
+    If all attempts fail the ".part" file is kept; calling again with
+    resume=True continues from the part of it that matches the replica's
+    block checksums.
 
     NOTE: We always use os.path.basename(filename) as DFS key,
     so passing a full path still works.
     """
     dfs_name = os.path.basename(filename)  # normalize to DFS filename
+    dfs_tracing.annotate(filename=dfs_name)
 
     # 1. Ask master
     resp = send_to_master({"type": "DOWNLOAD_REQUEST", "filename": dfs_name})
@@ -163,79 +1106,539 @@ def download_file(filename: str, save_as: str = None):
     if not nodes:
         return {"status": "error", "message": "No alive replicas returned by master"}
 
-    target_addr = nodes[0]
-    host, port = parse_addr(target_addr)
+    if hedged is None:
+        hedged = HEDGED_READS
+    if save_as is None:
+        save_as = dfs_name  # default to DFS filename
+    part_path = save_as + ".part"
+    replicas = order_replicas(nodes, resp.get("fast", ()))
+
+    offset = 0
+    if resume and os.path.exists(part_path):
+        local_size = os.path.getsize(part_path)
+        for addr_str in replicas:
+            try:
+                offset = _verified_prefix(part_path, _node_checksums(addr_str, dfs_name, False, local_size))
+                break
+            except Exception:
+                continue
 
-    # 2. Ask node for file
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect((host, port))
-            header = {"type": "DOWNLOAD_FILE", "filename": dfs_name}
-            send_json(s, header)
-            info = recv_json(s)
+    # 2. Ask nodes for file
+    errors = []
+    target_addr = None
+    local = False
+    with open(part_path, "r+b" if offset else "wb") as f:
+        f.seek(offset)
+        f.truncate()
+        sink = _PartialFile(f, offset)
 
-            if info.get("status") != "ok":
-                return {"status": "error", "message": info.get("message", "Node error")}
+        sockets = resp.get("sockets", {})
+        socket_uids = resp.get("socket_uids", {})
+        for addr_str in replicas if offset == 0 else ():
+            opened = _open_local(addr_str, sockets.get(addr_str), dfs_name, socket_uids.get(addr_str))
+            if opened is None:
+                continue
+            fd, size = opened
+            try:
+                with dfs_tracing.span("copy_local", node=addr_str, bytes=size):
+                    copied = _copy_local(fd, f, size)
+            except OSError as e:
+                copied = -1
+                errors.append(f"{addr_str} (local): {e}")
+            finally:
+                os.close(fd)
+            if copied == size:
+                target_addr, local = addr_str, True
+                break
+            f.seek(0)
+            f.truncate()
 
-            size = info.get("size")
-            remaining = size
-            chunks = []
+        if target_addr is None and hedged and offset == 0 and len(replicas) > 1:
+            try:
+                with dfs_tracing.span("hedged_read"):
+                    target_addr = _hedged_read(replicas, dfs_name, sink)
+            except Exception as e:
+                errors.append(str(e))
 
-            while remaining > 0:
-                chunk = s.recv(min(4096, remaining))
-                if not chunk:
+        for attempt in range(TRANSFER_RETRIES):
+            if target_addr is not None:
+                break
+            if attempt:
+                time.sleep(RETRY_DELAY)
+            for addr_str in replicas:
+                try:
+                    _read_from_node(addr_str, dfs_name, sink.size, sink)
+                    target_addr = addr_str
                     break
-                chunks.append(chunk)
-                remaining -= len(chunk)
+                except Exception as e:
+                    errors.append(f"{addr_str}: {e}")
 
-        data = b"".join(chunks)
+    if target_addr is None:
+        return {"status": "error",
+                "message": f"Failed to download from all replicas ({sink.size} bytes kept in {part_path}, "
+                           f"retry with resume): " + "; ".join(errors)}
 
-    except Exception as e:
-        return {"status": "error", "message": f"Failed to download from {target_addr}: {e}"}
+    # 3. Move into place
+    os.replace(part_path, save_as)
 
-    # 3. Save to disk
-    if save_as is None:
-        save_as = dfs_name  # default to DFS filename
+    message = f"Downloaded {dfs_name} from {target_addr} -> {save_as}"
+    if local:
+        message += " (short-circuit)"
+    if offset:
+        message += f" (resumed at byte {offset})"
+    return {"status": "ok", "message": message}
 
-    with open(save_as, "wb") as f:
-        f.write(data)
 
-    return {"status": "ok", "message": f"Downloaded {dfs_name} from {target_addr} -> {save_as}"}
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(65536, n - len(buf)))
+        if not chunk:
+            raise ConnectionError("Connection closed mid-transfer")
+        buf += chunk
+    return bytes(buf)
 
 
+class DFSFile(io.RawIOBase):
+    """
+    Read-only, seekable file object for a file in the DFS.
+
+    Reads are ranged requests (DOWNLOAD_FILE with offset and length) over
+    one kept-alive connection to a replica, so reading a few records of a
+    large file only transfers those records. Sequential reads turn on
+    read-ahead, which grows from READAHEAD_MIN to READAHEAD_MAX while the
+    reader keeps going; the last fetched range is kept in a buffer. If the
+    replica fails, the read moves to the next one.
+
+    Works with anything that takes a binary file object (zipfile, tarfile,
+    io.TextIOWrapper, ...). pread(n, offset) reads without moving the file
+    position and without disturbing read-ahead, and can be called from
+    several threads.
+
+    If a replica runs on this host, the file is read through a descriptor
+    the node hands over (see SHORT_CIRCUIT_READS) and `local` names that
+    replica; reads then go straight to the disk, without read-ahead.
+    """
+
+    def __init__(self, filename):
+        super().__init__()
+        self.name = os.path.basename(filename)
+        self._sock = None
+        self._lock = threading.Lock()
+        self._pos = 0
+        self._buf = b""
+        self._buf_start = 0
+        self._readahead = 0
+        self._last_end = None
+        self.bytes_fetched = 0  # payload bytes received from nodes
+        self.size = 0
+        self._fd = None
+        self.local = None
+
+        resp = send_to_master({"type": "DOWNLOAD_REQUEST", "filename": self.name})
+        if resp.get("status") != "ok":
+            raise FileNotFoundError(resp.get("message", f"File {self.name} not found"))
+        self._replicas = order_replicas(resp.get("nodes", []), resp.get("fast", ()))
+        if not self._replicas:
+            raise FileNotFoundError("No alive replicas returned by master")
+        sockets = resp.get("sockets", {})
+        socket_uids = resp.get("socket_uids", {})
+        for addr_str in self._replicas:
+            opened = _open_local(addr_str, sockets.get(addr_str), self.name, socket_uids.get(addr_str))
+            if opened is not None:
+                (self._fd, self.size), self.local = opened, addr_str
+                return
+        self._request(0, 0)  # learn the size
+
+    # ---------- Node requests ----------
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _request(self, offset, length):
+        """Fetch length bytes at offset from a replica. Caller holds _lock (or is __init__)."""
+        errors = []
+        for _ in range(len(self._replicas)):
+            addr_str = self._replicas[0]
+            try:
+                with dfs_tracing.span("read_range", node=addr_str, offset=offset, length=length):
+                    if self._sock is None:
+                        self._sock = socket.create_connection(parse_addr(addr_str), timeout=STALL_TIMEOUT)
+                    send_json(self._sock, {"type": "DOWNLOAD_FILE", "filename": self.name,
+                                           "offset": offset, "length": length,
+                                           "client_id": CLIENT_ID, "keepalive": True})
+                    info = recv_json(self._sock)
+                    if info.get("status") != "ok":
+                        raise FileNotFoundError(info.get("message", "Node error"))
+                    data = _recv_exact(self._sock, info["length"])
+                self.size = info["size"]
+                self.bytes_fetched += len(data)
+                return data
+            except (OSError, ValueError) as e:
+                errors.append(f"{addr_str}: {e!r}")
+                self._disconnect()
+                stats = _stats_for(addr_str)
+                with _stats_lock:
+                    stats.failed_at = time.time()
+                self._replicas.append(self._replicas.pop(0))
+        raise OSError(f"Reading {self.name} failed on all replicas: " + "; ".join(errors))
+
+    def _read_at(self, offset, n, sequential):
+        """Up to n bytes at offset, from the buffer where possible."""
+        with self._lock:
+            if self.closed:
+                raise ValueError("I/O operation on closed file.")
+            n = min(n, self.size - offset)
+            if n <= 0:
+                return b""
+            if self._fd is not None:
+                return _pread_all(self._fd, n, offset)
+            end = offset + n
+            buf_end = self._buf_start + len(self._buf)
+            if self._buf_start <= offset and end <= buf_end:
+                data = self._buf[offset - self._buf_start:end - self._buf_start]
+            else:
+                # keep what the buffer has of the start of the range
+                head = b""
+                if self._buf_start <= offset < buf_end:
+                    head = self._buf[offset - self._buf_start:]
+                fetch_from = offset + len(head)
+                extra = 0
+                if sequential:
+                    if offset == self._last_end:
+                        self._readahead = min(max(self._readahead * 2, READAHEAD_MIN), READAHEAD_MAX)
+                    else:
+                        self._readahead = 0
+                    extra = self._readahead
+                fetched = self._request(fetch_from, end - fetch_from + extra)
+                data = head + fetched[:end - fetch_from]
+                if sequential:
+                    self._buf, self._buf_start = fetched, fetch_from
+            if sequential:
+                self._last_end = end
+            return data
+
+    # ---------- File object interface ----------
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        with memoryview(b) as view, view.cast("B") as out:
+            data = self._read_at(self._pos, len(out), True)
+            out[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def readall(self):
+        data = self._read_at(self._pos, self.size - self._pos, True)
+        self._pos += len(data)
+        return data
+
+    def peek(self, n=0):
+        """Buffered bytes at the current position (fetching if there are none)."""
+        with self._lock:
+            start = self._pos - self._buf_start
+            if 0 <= start < len(self._buf):
+                return self._buf[start:]
+        return self._read_at(self._pos, max(n, 1), True)
+
+    def pread(self, n, offset):
+        """Read up to n bytes at offset without moving the file position."""
+        if offset < 0:
+            raise ValueError("negative offset")
+        return self._read_at(offset, n, False)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._buf = b""
+        super().close()
+
+
+def open_file(filename: str) -> DFSFile:
+    """Open a DFS file for random-access reading (see DFSFile)."""
+    return DFSFile(filename)
+
+
+@dfs_tracing.traced("delete_file")
 def delete_file(filename: str):
     """
-    Delete a file from all replicas:
-      1. Ask master (DOWNLOAD_REQUEST) to get list of node addresses.
-      2. Send DELETE_FILE to each node.
-      3. Inform master with DELETE_DONE.
+    Delete a file from the DFS with one master request (DELETE_REQUEST).
+    The master drops the file from its metadata right away and tells the
+    nodes holding replicas to delete them with their next heartbeats (nodes
+    that are down do so once they are back).
 
     NOTE: We normalize filename to basename so callers can pass full paths.
     """
     dfs_name = os.path.basename(filename)
+    dfs_tracing.annotate(filename=dfs_name)
+    resp = send_to_master({"type": "DELETE_REQUEST", "filename": dfs_name})
+    if resp.get("status") == "ok":
+        return {"status": "ok", "message": f"Deleted {dfs_name} from DFS"}
+    return {"status": "error", "message": resp.get("message", "Master failed to remove metadata")}
 
-    # 1. Get list of nodes holding this file
-    resp = send_to_master({"type": "DOWNLOAD_REQUEST", "filename": dfs_name})
-    if resp.get("status") != "ok":
-        return {"status": "error", "message": resp.get("message", "File not found")}
 
-    nodes = resp.get("nodes", [])
+@dfs_tracing.traced("delete_files")
+def delete_files(filenames):
+    """
+    Delete many files, DELETE_BATCH names per request to the shard owning
+    them (see delete_file). The result lists the names that were not found.
+    """
+    by_shard = {}
+    for filename in filenames:
+        dfs_name = os.path.basename(filename)
+        by_shard.setdefault(shard_for(dfs_name), []).append(dfs_name)
+    deleted = 0
+    missing = []
+    for group, names in by_shard.items():
+        for i in range(0, len(names), DELETE_BATCH):
+            resp = send_to_master_at(group, {"type": "DELETE_REQUEST", "filenames": names[i:i + DELETE_BATCH]})
+            if resp.get("status") != "ok":
+                return {"status": "error", "message": resp.get("message", "Master failed to remove metadata"),
+                        "deleted": deleted}
+            deleted += resp["deleted"]
+            missing.extend(resp["missing"])
+    return {"status": "ok", "message": f"Deleted {deleted} files from DFS", "deleted": deleted,
+            "missing": missing}
 
-    # 2. Delete on each node
-    for addr_str in nodes:
-        host, port = parse_addr(addr_str)
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((host, port))
-                header = {"type": "DELETE_FILE", "filename": dfs_name}
-                send_json(s, header)
-                _ = recv_json(s)  # ignore details for now
-        except Exception as e:
-            print(f"[CLIENT] Delete on {addr_str} failed: {e}")
 
-    # 3. Inform master
-    done_resp = send_to_master({"type": "DELETE_DONE", "filename": dfs_name})
-    if done_resp.get("status") == "ok":
-        return {"status": "ok", "message": f"Deleted {dfs_name} from DFS"}
-    else:
-        return {"status": "error", "message": "Master failed to remove metadata"}
+# ---------- Bulk transfers ----------
+
+class TransferManager:
+    """
+    Runs transfers on a fixed pool of worker threads and keeps aggregate
+    progress. submit() blocks while 4 transfers per worker are waiting, so
+    it can be fed from a walk over any number of files:
+
+        with TransferManager(workers=8, progress=print) as tm:
+            for path in paths:
+                tm.upload(path)
+        print(tm.stats())
+
+    progress, if given, is called with stats() at most every
+    PROGRESS_INTERVAL seconds from a worker, and once more at the end.
+    """
+
+    def __init__(self, workers=SYNC_WORKERS, progress=None):
+        self.progress = progress
+        self.files = 0
+        self.done = 0
+        self.bytes = 0       # bytes of submitted transfers, where known up front
+        self.bytes_done = 0
+        self.failed = []     # (name, message)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(workers * 4)
+        self._start = time.perf_counter()
+        self._last_progress = 0.0
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, name, nbytes, transfer, on_done=None):
+        """
+        Queue transfer() (returning a status dict) for a file of nbytes;
+        on_done(resp) runs in the worker afterwards. A reply may carry
+        "bytes" to count instead of nbytes (e.g. 0 for a skipped file).
+        """
+        with self._lock:
+            self.files += 1
+            self.bytes += nbytes
+        self._queue.put((name, nbytes, transfer, on_done))
+
+    def upload(self, path, on_done=None, **kwargs):
+        """upload_file(path, **kwargs) without the write-lock demo pause."""
+        kwargs.setdefault("lock_hold", 0)
+        self.submit(os.path.basename(path), os.path.getsize(path), lambda: upload_file(path, **kwargs), on_done)
+
+    def download(self, filename, save_as=None, on_done=None, **kwargs):
+        """download_file(filename, save_as, **kwargs)."""
+        save_as = save_as or os.path.basename(filename)
+
+        def transfer():
+            resp = download_file(filename, save_as=save_as, **kwargs)
+            if resp.get("status") == "ok":
+                resp["bytes"] = os.path.getsize(save_as)
+            return resp
+
+        self.submit(os.path.basename(filename), 0, transfer, on_done)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            name, nbytes, transfer, on_done = item
+            try:
+                resp = transfer()
+                if on_done is not None:
+                    on_done(resp)
+            except Exception as e:
+                resp = {"status": "error", "message": str(e)}
+            with self._lock:
+                self.done += 1
+                if resp.get("status") == "ok":
+                    self.bytes_done += resp.get("bytes", nbytes)
+                else:
+                    self.failed.append((name, resp.get("message", "failed")))
+            self._report()
+
+    def _report(self, force=False):
+        if self.progress is None:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last_progress < PROGRESS_INTERVAL:
+                return
+            self._last_progress = now
+        self.progress(self.stats())
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            return {
+                "files": self.files,
+                "done": self.done,
+                "failed": len(self.failed),
+                "bytes": self.bytes,
+                "bytes_done": self.bytes_done,
+                "elapsed_s": round(elapsed, 3),
+                "files_per_s": self.done / elapsed if elapsed else 0.0,
+                "mb_per_s": self.bytes_done / elapsed / 1e6 if elapsed else 0.0,
+            }
+
+    def wait(self):
+        """Finish every submitted transfer and stop the workers; returns stats()."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._report(force=True)
+        return self.stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.wait()
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def sync_directory(folder, workers=SYNC_WORKERS, delete=False, manifest_path=None, progress=None):
+    """
+    Upload the files in folder that the DFS doesn't have in their current
+    version, on a TransferManager with `workers` threads.
+
+    The sync is one-level and one-way: DFS names are flat, so only the
+    files directly in folder are synced, not subfolders; and files only
+    go up. DFS files changed or added elsewhere are not downloaded (use
+    TransferManager.download for that).
+
+    A manifest (default: SYNC_MANIFEST in folder) records the size, mtime
+    and SHA-256 of every file as last uploaded. A file that is in the DFS
+    with the recorded size and mtime is skipped without being read; one
+    whose mtime changed but whose content hash did not is only re-recorded.
+    Changed files of at least SYNC_DELTA_MIN_BYTES go as delta uploads.
+
+    With delete=True, files that an earlier sync uploaded and that are gone
+    from folder are deleted from the DFS too (other DFS files are left alone).
+    """
+    manifest_path = manifest_path or os.path.join(folder, SYNC_MANIFEST)
+    manifest = _load_manifest(manifest_path)
+    remote = set(list_files().get("files", []))
+    manifest_lock = threading.Lock()
+    counts = {"uploaded": 0, "unchanged": 0, "rehashed": 0, "deleted": 0}
+
+    def sync_file(path, name, st, recorded):
+        sha256 = _file_sha256(path)
+        if recorded and recorded["sha256"] == sha256 and name in remote:
+            resp = {"status": "ok", "bytes": 0}
+            counts_key = "rehashed"
+        else:
+            big = st.st_size >= SYNC_DELTA_MIN_BYTES
+            resp = upload_file(path, delta=big and name in remote, lock_hold=0)
+            counts_key = "uploaded"
+        if resp.get("status") == "ok":
+            with manifest_lock:
+                manifest[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256}
+                counts[counts_key] += 1
+        return resp
+
+    own_files = {os.path.abspath(manifest_path), os.path.abspath(manifest_path) + ".tmp"}
+    local = set()
+    try:
+        with TransferManager(workers, progress) as tm, os.scandir(folder) as it:
+            for entry in it:
+                if not entry.is_file() or os.path.abspath(entry.path) in own_files:
+                    continue
+                name = entry.name
+                local.add(name)
+                st = entry.stat()
+                recorded = manifest.get(name)
+                if recorded and name in remote and recorded["size"] == st.st_size \
+                        and recorded["mtime_ns"] == st.st_mtime_ns:
+                    counts["unchanged"] += 1
+                    continue
+                tm.submit(name, st.st_size,
+                          lambda path=entry.path, name=name, st=st, recorded=recorded:
+                          sync_file(path, name, st, recorded))
+        if delete:
+            gone = [name for name in manifest if name not in local and name in remote]
+            if gone:
+                resp = delete_files(gone)
+                counts["deleted"] = resp.get("deleted", 0)
+                if resp.get("status") != "ok":
+                    tm.failed.append(("(delete)", resp.get("message")))
+            remote.difference_update(gone)
+        # forget files that are neither here nor in the DFS any more
+        for name in [n for n in manifest if n not in local and n not in remote]:
+            del manifest[name]
+    finally:
+        # also after an interrupted sync, so the next one resumes where it stopped
+        _save_manifest(manifest_path, manifest)
+
+    stats = tm.stats()
+    message = (f"Synced {folder}: {counts['uploaded']} uploaded, {counts['unchanged'] + counts['rehashed']} "
+               f"unchanged, {counts['deleted']} deleted, {stats['failed']} failed in {stats['elapsed_s']:.1f}s "
+               f"({stats['mb_per_s']:.1f} MB/s)")
+    return dict(counts, status="ok" if not tm.failed else "error", message=message,
+                failed=tm.failed, stats=stats)
@@ -0,0 +1,319 @@
+# dfs_cluster.py
+"""Local multi-node cluster harness.
+
+Starts a master and N storage nodes on localhost ports with temporary
+storage directories, headless and on any OS. Used by the scripts in
+benchmarks/ and handy for manual testing:
+
+    python dfs_cluster.py --nodes 3 --port 7000
+
+Two modes:
+- "process": master and nodes run as subprocesses (logs go to <work_dir>/*.log).
+  The cluster can be stopped and started again within one Python process.
+- "thread": everything runs inside the calling process. Faster to start and
+  allows custom StorageNode subclasses, but because the servers use
+  module-level state only one such cluster can exist per process, and its
+  threads live until the process exits.
+
+With shards > 1 (process mode only) several master processes split the
+namespace (see dfs_hashring); nodes register with all of them. With
+standby=True every shard also gets a hot-standby master process. With
+disks > 1 every node stores files across that many data directories, and
+with fast_tier=True every node also gets a fast-tier directory (see
+"Storage Tiers" in CONFIG.md).
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import dfs_client_lib as dfs
+
+PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds to wait for the master and nodes to come up
+STARTUP_TIMEOUT = 15
+
+
+def wait_for_port(host, port, timeout=STARTUP_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+class LocalCluster:
+    """A master plus num_nodes storage nodes on consecutive localhost ports.
+
+    The master listens on base_port and node i (1-based) on base_port + i;
+    extra master shards follow the nodes. Starting the cluster points
+    dfs_client_lib at its master(s).
+    """
+
+    def __init__(self, num_nodes=3, base_port=7000, mode="process", work_dir=None,
+                 replication_factor=None, node_class=None, host="127.0.0.1",
+                 metrics_port=None, shards=1, standby=False, disks=1, fast_tier=False):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown cluster mode: {mode}")
+        if (shards > 1 or standby) and mode != "process":
+            raise ValueError("Multiple master shards and standbys need mode='process'")
+        self.num_nodes = num_nodes
+        self.shards = shards
+        self.standby = standby
+        self.disks = disks
+        self.fast_tier = fast_tier
+        self.base_port = base_port
+        self.mode = mode
+        self.host = host
+        self.replication_factor = replication_factor
+        self.node_class = node_class
+        # Prometheus endpoints: master on metrics_port, node i on metrics_port + i
+        self.metrics_port = metrics_port
+        self.owns_work_dir = work_dir is None
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="dfs_cluster_")
+        self.procs = []
+        self.masters = {}  # (shard, is_standby) -> master process (process mode only)
+        self.node_procs = {}  # node index -> node process (process mode only)
+        self.nodes = []  # StorageNode objects (thread mode only)
+
+    # ---------- Addresses ----------
+
+    @property
+    def master_addr(self):
+        return f"{self.host}:{self.base_port}"
+
+    def master_port(self, k):
+        """Port of master shard k (0-based)."""
+        return self.base_port if k == 0 else self.base_port + self.num_nodes + k
+
+    def standby_port(self, k):
+        """Port of the standby master of shard k."""
+        return self.base_port + self.num_nodes + self.shards + k
+
+    @property
+    def master_addrs(self):
+        """One entry per shard: "host:port", or "primary|standby" with standbys."""
+        addrs = []
+        for k in range(self.shards):
+            addr = f"{self.host}:{self.master_port(k)}"
+            if self.standby:
+                addr += f"|{self.host}:{self.standby_port(k)}"
+            addrs.append(addr)
+        return addrs
+
+    def node_port(self, i):
+        return self.base_port + i
+
+    def node_id(self, i):
+        return f"node{i}"
+
+    def storage_dir(self, i):
+        return os.path.join(self.work_dir, f"storage_node{i}")
+
+    def storage_dirs(self, i):
+        """Data directories of node i: storage_dir(i), then one per extra disk."""
+        return [self.storage_dir(i)] + [f"{self.storage_dir(i)}_disk{k}" for k in range(1, self.disks)]
+
+    def fast_dir(self, i):
+        """Fast-tier directory of node i, or None without fast_tier."""
+        return f"{self.storage_dir(i)}_fast" if self.fast_tier else None
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        dfs.MASTER_HOST = self.host
+        dfs.MASTER_PORT = self.base_port
+        dfs.MASTER_SHARDS = self.master_addrs if self.shards > 1 or self.standby else []
+        if self.mode == "process":
+            self._start_processes()
+        else:
+            self._start_threads()
+        self.wait_until_ready()
+        return self
+
+    def _env(self, index=0, master_port=None, standby_of=None):
+        env = dict(os.environ)
+        env["DFS_MASTER_HOST"] = self.host
+        env["DFS_MASTER_PORT"] = str(master_port or self.base_port)
+        env["PYTHONUNBUFFERED"] = "1"
+        env.pop("DFS_MASTER_SHARDS", None)
+        env.pop("DFS_STANDBY_OF", None)
+        if self.shards > 1 or self.standby:
+            env["DFS_MASTER_SHARDS"] = ",".join(self.master_addrs)
+        if standby_of:
+            env["DFS_STANDBY_OF"] = standby_of
+        if self.replication_factor is not None:
+            env["DFS_REPLICATION_FACTOR"] = str(self.replication_factor)
+        env.pop("DFS_METRICS_PORT", None)
+        if self.metrics_port:
+            env["DFS_METRICS_PORT"] = str(self.metrics_port + index)
+        return env
+
+    def _spawn(self, name, args, index=0, master_port=None, standby_of=None):
+        log = open(os.path.join(self.work_dir, f"{name}.log"), "a")
+        proc = subprocess.Popen(
+            [sys.executable] + args,
+            cwd=PROJECT_PATH,
+            env=self._env(index, master_port, standby_of),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        log.close()  # the child keeps its own handle
+        self.procs.append(proc)
+        return proc
+
+    def start_master(self, k, standby=False, standby_of=None):
+        """Start master shard k (or its standby), following standby_of if given."""
+        name = "master" if k == 0 else f"master{k}"
+        if standby:
+            name += "_standby"
+            port = self.standby_port(k)
+            index = self.num_nodes + self.shards + k
+            standby_of = standby_of or f"{self.host}:{self.master_port(k)}"
+        else:
+            port = self.master_port(k)
+            index = 0 if k == 0 else self.num_nodes + k
+        proc = self._spawn(name, [os.path.join(PROJECT_PATH, "master_server.py")],
+                           index=index, master_port=port, standby_of=standby_of)
+        self.masters[(k, standby)] = proc
+        if not wait_for_port(self.host, port):
+            self.stop()
+            raise RuntimeError(f"Master did not start on {self.host}:{port}")
+        return proc
+
+    def kill_master(self, k, standby=False):
+        """Kill master shard k (or its standby) abruptly, to test failover."""
+        proc = self.masters.pop((k, standby))
+        proc.kill()
+        proc.wait()
+
+    def start_node(self, i):
+        """Start storage node i (1-based), e.g. again after kill_node(i)."""
+        args = [os.path.join(PROJECT_PATH, "storage_node.py"),
+                self.node_id(i), str(self.node_port(i)), ",".join(self.storage_dirs(i))]
+        if self.fast_tier:
+            args.append(self.fast_dir(i))
+        self.node_procs[i] = self._spawn(self.node_id(i), args, index=i)
+        return self.node_procs[i]
+
+    def kill_node(self, i):
+        """Kill storage node i abruptly; its files stay on disk."""
+        proc = self.node_procs.pop(i)
+        proc.kill()
+        proc.wait()
+
+    def _start_processes(self):
+        for k in range(self.shards):
+            self.start_master(k)
+            if self.standby:
+                self.start_master(k, standby=True)
+        for i in range(1, self.num_nodes + 1):
+            self.start_node(i)
+
+    def _start_threads(self):
+        import master_server
+        import storage_node
+
+        master_server.MASTER_HOST = storage_node.MASTER_HOST = self.host
+        master_server.MASTER_PORT = storage_node.MASTER_PORT = self.base_port
+        storage_node.MASTER_SHARDS = []
+        if self.replication_factor is not None:
+            master_server.REPLICATION_FACTOR = self.replication_factor
+        master_server.METRICS_PORT = self.metrics_port
+
+        threading.Thread(target=master_server.start_master, daemon=True).start()
+        if not wait_for_port(self.host, self.base_port):
+            raise RuntimeError(f"Master did not start on {self.master_addr}")
+
+        node_class = self.node_class or storage_node.StorageNode
+        for i in range(1, self.num_nodes + 1):
+            node = node_class(self.node_id(i), self.host, self.node_port(i), self.storage_dirs(i),
+                              metrics_port=self.metrics_port + i if self.metrics_port else None,
+                              fast_dir=self.fast_dir(i))
+            self.nodes.append(node)
+            threading.Thread(target=node.start_server, daemon=True).start()
+
+    def wait_until_ready(self, timeout=STARTUP_TIMEOUT):
+        """Block until every node is registered with every master and ALIVE."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                ready = 0
+                for addr_str in self.master_addrs:
+                    nodes = dfs.send_to_master_at(addr_str, {"type": "NODES_STATUS"}).get("nodes", [])
+                    alive = [n for n in nodes if n["status"] == "ALIVE"]
+                    ready += len(alive) >= self.num_nodes
+                if ready == self.shards:
+                    return
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.1)
+        raise RuntimeError(f"Cluster not ready after {timeout}s (logs in {self.work_dir})")
+
+    def stop(self):
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.procs = []
+        self.masters = {}
+        self.node_procs = {}
+        if self.owns_work_dir and self.mode == "process":
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local DFS cluster until Ctrl+C")
+    parser.add_argument("--nodes", type=int, default=3, help="Number of storage nodes")
+    parser.add_argument("--port", type=int, default=7000, help="Master port; nodes use the following ports")
+    parser.add_argument("--dir", default=None, help="Work directory (default: a new temp dir, removed on exit)")
+    parser.add_argument("--replication", type=int, default=None, help="Replication factor")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics: master on this port, node i on port + i")
+    parser.add_argument("--shards", type=int, default=1, help="Number of master shards")
+    parser.add_argument("--standby", action="store_true", help="Run a hot-standby master for every shard")
+    parser.add_argument("--disks", type=int, default=1, help="Data directories per storage node")
+    parser.add_argument("--fast-tier", action="store_true", help="Give every storage node a fast-tier directory")
+    args = parser.parse_args()
+
+    cluster = LocalCluster(args.nodes, args.port, mode="process", work_dir=args.dir,
+                           replication_factor=args.replication, metrics_port=args.metrics_port,
+                           shards=args.shards, standby=args.standby, disks=args.disks,
+                           fast_tier=args.fast_tier)
+    with cluster:
+        masters = ",".join(cluster.master_addrs)
+        print(f"[CLUSTER] Master @ {masters}, {args.nodes} nodes, logs in {cluster.work_dir}")
+        if args.shards > 1 or args.standby:
+            print(f"[CLUSTER] Point clients at it with DFS_MASTER_SHARDS={masters}. Ctrl+C to stop.")
+        else:
+            print(f"[CLUSTER] Point clients at it with DFS_MASTER_PORT={args.port}. Ctrl+C to stop.")
+        try:
+            while all(p.poll() is None for p in cluster.procs):
+                time.sleep(1)
+            print("[CLUSTER] A process exited; shutting down.")
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
 import os
+import queue
 import threading
 import time
 
@@ -10,6 +11,16 @@ import dfs_client_lib as dfs  # reuse your existing client lib
 
 PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
 
+NODE_COLUMNS = ("address", "status", "load", "used", "free", "in", "out")
+
+
+def fmt_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
 class DFSDashboard:
     def __init__(self, root):
         self.root = root
@@ -21,7 +32,18 @@ class DFSDashboard:
         self.node_procs = []
         self.client_procs = []
 
+        # Worker threads never touch widgets; they queue (fn, args) here and
+        # the Tk main loop runs them in drain_ui_queue.
+        self.ui_queue = queue.Queue()
+        self.connected = None
+
         self.create_widgets()
+        self.root.after(100, self.drain_ui_queue)
+
+        # Live node status pushed by the master
+        self.subscription = dfs.StatusSubscription(
+            lambda state: self.call_ui(self.render_status, state)).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # ---------- UI ----------
     def create_widgets(self):
@@ -37,15 +59,27 @@ class DFSDashboard:
         client_btn = ttk.Button(top_frame, text="Start Extra Client", command=self.on_start_client)
         client_btn.pack(side=tk.LEFT, padx=5)
 
-        status_btn = ttk.Button(top_frame, text="Refresh Node Status", command=self.on_refresh_nodes)
+        status_btn = ttk.Button(top_frame, text="Reconnect Status", command=self.on_refresh_nodes)
         status_btn.pack(side=tk.LEFT, padx=5)
 
+        stats_btn = ttk.Button(top_frame, text="Show Stats", command=self.on_show_stats)
+        stats_btn.pack(side=tk.LEFT, padx=5)
+
         # Node status panel
         nodes_frame = ttk.LabelFrame(self.root, text="Node Status", padding=10)
         nodes_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        self.nodes_text = tk.Text(nodes_frame, height=10, wrap=tk.WORD)
-        self.nodes_text.pack(fill=tk.BOTH, expand=True)
+        self.summary_var = tk.StringVar(value="Connecting to master...")
+        ttk.Label(nodes_frame, textvariable=self.summary_var).pack(side=tk.TOP, anchor=tk.W)
+
+        self.nodes_tree = ttk.Treeview(nodes_frame, columns=NODE_COLUMNS, height=10)
+        self.nodes_tree.heading("#0", text="node")
+        self.nodes_tree.column("#0", width=70)
+        for col in NODE_COLUMNS:
+            self.nodes_tree.heading(col, text=col)
+            self.nodes_tree.column(col, width=70, anchor=tk.E)
+        self.nodes_tree.column("address", width=110, anchor=tk.W)
+        self.nodes_tree.pack(fill=tk.BOTH, expand=True)
 
         # Log panel
         log_frame = ttk.LabelFrame(self.root, text="Dashboard Log", padding=10)
@@ -58,9 +92,51 @@ class DFSDashboard:
         self.log_text.insert(tk.END, msg + "\n")
         self.log_text.see(tk.END)
 
-    def set_nodes_status(self, text: str):
-        self.nodes_text.delete("1.0", tk.END)
-        self.nodes_text.insert(tk.END, text)
+    def call_ui(self, fn, *args):
+        """Run fn(*args) on the Tk main loop (safe from any thread)."""
+        self.ui_queue.put((fn, args))
+
+    def drain_ui_queue(self):
+        try:
+            while True:
+                fn, args = self.ui_queue.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        self.root.after(100, self.drain_ui_queue)
+
+    def render_status(self, state):
+        """Update only the rows that changed since the last push."""
+        if state["connected"] != self.connected:
+            self.connected = state["connected"]
+            self.log("Status stream connected." if self.connected
+                     else f"Status stream lost: {state['error']}")
+        if not state["connected"]:
+            self.summary_var.set("Master unreachable, retrying...")
+            return
+
+        for nid, n in state["nodes"].items():
+            status = n["status"]
+            if n.get("failed_dirs"):
+                status += f" ({len(n['failed_dirs'])} disk(s) failed)"
+            values = (n["address"], status, n["load"], fmt_bytes(n["disk_used"]),
+                      fmt_bytes(n["disk_free"]), fmt_bytes(n["in_rate"]) + "/s",
+                      fmt_bytes(n["out_rate"]) + "/s")
+            if not self.nodes_tree.exists(nid):
+                self.nodes_tree.insert("", tk.END, iid=nid, text=nid, values=values)
+            elif tuple(str(v) for v in self.nodes_tree.item(nid, "values")) != tuple(str(v) for v in values):
+                self.nodes_tree.item(nid, values=values)
+        for nid in self.nodes_tree.get_children():
+            if nid not in state["nodes"]:
+                self.nodes_tree.delete(nid)
+
+        alive = sum(1 for n in state["nodes"].values() if n["status"] == "ALIVE")
+        self.summary_var.set(f"{alive}/{len(state['nodes'])} nodes alive, {state['files']} files, "
+                             f"{state['under_replicated']} under-replicated")
+
+    def on_close(self):
+        self.subscription.stop()
+        self.root.destroy()
 
     # ---------- Process control ----------
     def start_process(self, title, cmd_args):
@@ -143,18 +219,32 @@ class DFSDashboard:
 
     # ---------- Node status ----------
     def on_refresh_nodes(self):
+        """Re-open the status stream; the master answers with a full view."""
+        self.subscription.stop()
+        self.subscription = dfs.StatusSubscription(
+            lambda state: self.call_ui(self.render_status, state)).start()
+        self.log("Reconnecting status stream...")
+
+    # ---------- Metrics ----------
+    def on_show_stats(self):
         def worker():
+            lines = []
             try:
-                resp = dfs.get_nodes_status()
-                nodes = resp.get("nodes", [])
-                lines = []
-                for n in nodes:
-                    lines.append(f"{n['id']} @ {n['address']} [{n['status']}]")
-                status_text = "\n".join(lines) if lines else "No nodes registered."
-                self.set_nodes_status(status_text)
-                self.log("Node status refreshed.")
+                lines += dfs.format_stats(dfs.get_stats().get("metrics", {}))
+                for n in dfs.get_nodes_status().get("nodes", []):
+                    if n["status"] != "ALIVE":
+                        continue
+                    try:
+                        resp = dfs.get_stats(n["address"])
+                        lines.append("")
+                        lines.append(f"{n['id']} @ {n['address']}")
+                        lines += dfs.format_stats(resp.get("metrics", {}))
+                    except Exception as e:
+                        lines.append(f"{n['id']}: unreachable ({e})")
             except Exception as e:
-                self.log(f"[ERROR] Cannot get node status: {e}")
+                self.call_ui(self.log, f"[ERROR] Cannot get stats: {e}")
+                return
+            self.call_ui(self.log, "\n".join(lines))
 
         threading.Thread(target=worker, daemon=True).start()
 
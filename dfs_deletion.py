@@ -0,0 +1,184 @@
+# dfs_deletion.py
+"""Replica deletion bookkeeping for the master.
+
+Deleting a file drops it from the metadata at once; its replicas are
+deleted later, by the nodes holding them. DeletionTracker keeps, per node
+address ("host:port"):
+
+    tombstones   filename -> time deleted
+                 replicas the node still has to delete. Every heartbeat
+                 reply names up to a batch of them, the node acknowledges
+                 those it deleted in its next heartbeat. Kept until
+                 acknowledged, so a node that is down when a file is
+                 deleted cleans up once it is back.
+
+    candidates   filename -> time, oldest first
+                 replicas this master placed there and may have left
+                 behind: the node was chosen for an upload that did not list
+                 it in UPLOAD_DONE (yet), or it held a version that a newer
+                 upload moved elsewhere. An inventory from the node turns
+                 those still not in the metadata there into tombstones.
+
+Only candidates are ever reclaimed from an inventory. A file the master
+knows nothing about is left alone: that master may just be missing
+metadata (restarted without a standby, a new shard, a node reporting to the
+wrong shard), and deleting it would lose data.
+
+The tracker holds no lock of its own; the master calls it under its
+metadata lock. file_table arguments are mappings of filename -> replica
+addresses (a FileTable on the master).
+"""
+
+import itertools
+import time
+
+
+class DeletionTracker:
+    """Tombstones and orphan candidates per node address (see module docstring)."""
+
+    def __init__(self, orphan_ttl=86400):
+        self.orphan_ttl = orphan_ttl
+        self.tombstones = {}
+        self.candidates = {}
+
+    def clear(self):
+        self.tombstones.clear()
+        self.candidates.clear()
+
+    def pending_deletes(self):
+        return sum(len(names) for names in list(self.tombstones.values()))
+
+    def pending_candidates(self):
+        return sum(len(names) for names in list(self.candidates.values()))
+
+    # ---------- Tombstones ----------
+
+    def add_tombstones(self, addr_str, filenames, now=None):
+        """Schedule filenames for deletion on the node at addr_str."""
+        now = time.time() if now is None else now
+        pending = self.tombstones.setdefault(addr_str, {})
+        for filename in filenames:
+            pending.setdefault(filename, now)
+
+    def cancel_tombstones(self, filename, addrs):
+        """
+        A new version of filename goes to addrs: don't delete it there.
+        Returns whether any tombstone was cancelled.
+        """
+        cancelled = False
+        for addr_str in addrs:
+            pending = self.tombstones.get(addr_str)
+            if pending and pending.pop(filename, None) is not None:
+                cancelled = True
+                if not pending:
+                    del self.tombstones[addr_str]
+        return cancelled
+
+    def ack(self, addr_str, filenames):
+        """The node at addr_str deleted filenames (or never had them)."""
+        pending = self.tombstones.get(addr_str)
+        if not pending:
+            return
+        for filename in filenames:
+            pending.pop(filename, None)
+        if not pending:
+            del self.tombstones[addr_str]
+
+    def batch(self, addr_str, limit):
+        """The next (at most limit) files the node at addr_str should delete, oldest first."""
+        return list(itertools.islice(self.tombstones.get(addr_str, ()), limit))
+
+    def has_tombstone(self, addr_str, filename):
+        return filename in self.tombstones.get(addr_str, ())
+
+    # ---------- Orphan candidates ----------
+
+    def add_candidates(self, filename, addrs, now=None):
+        """filename may be left behind at addrs."""
+        now = time.time() if now is None else now
+        for addr_str in addrs:
+            candidates = self.candidates.setdefault(addr_str, {})
+            candidates.pop(filename, None)  # keep the dict ordered by time
+            candidates[filename] = now
+
+    def drop_candidates(self, filename, addrs):
+        """filename is in the metadata at addrs again."""
+        for addr_str in addrs:
+            candidates = self.candidates.get(addr_str)
+            if candidates and candidates.pop(filename, None) is not None and not candidates:
+                del self.candidates[addr_str]
+
+    def expire_candidates(self, addr_str, now=None):
+        """Forget candidates at addr_str older than orphan_ttl."""
+        candidates = self.candidates.get(addr_str, {})
+        cutoff = (time.time() if now is None else now) - self.orphan_ttl
+        for filename, since in list(candidates.items()):
+            if since > cutoff:
+                break
+            del candidates[filename]
+        if not candidates:
+            self.candidates.pop(addr_str, None)
+
+    # ---------- Metadata changes ----------
+
+    def upload_requested(self, file_table, filename, addrs, now=None):
+        """
+        filename is about to be sent to addrs. Until UPLOAD_DONE lists them,
+        what reaches addrs that don't hold it yet may be left behind; and a
+        deleted earlier version must not take the new one with it. Returns
+        whether any tombstone was cancelled.
+        """
+        current = file_table.get(filename, ())
+        self.add_candidates(filename, [a for a in addrs if a not in current], now)
+        return self.cancel_tombstones(filename, addrs)
+
+    def record_upload(self, file_table, filename, addrs, now=None):
+        """
+        filename's new version is on addrs; replicas of the old version
+        elsewhere become candidates.
+        """
+        old = file_table.get(filename, ())
+        file_table[filename] = addrs
+        self.cancel_tombstones(filename, addrs)
+        self.drop_candidates(filename, addrs)
+        self.add_candidates(filename, [a for a in old if a not in addrs], now)
+
+    def delete(self, file_table, filenames, now=None):
+        """
+        Drop filenames from file_table and leave a tombstone for each
+        replica. Returns (deleted, missing): deleted is a list of
+        (filename, replica addresses), missing the names not found.
+        """
+        now = time.time() if now is None else now
+        deleted, missing = [], []
+        for filename in filenames:
+            addrs = file_table.pop(filename, None)
+            if addrs is None:
+                missing.append(filename)
+                continue
+            for addr_str in addrs:
+                self.add_tombstones(addr_str, [filename], now)
+            deleted.append((filename, addrs))
+        return deleted, missing
+
+    def reclaim(self, addr_str, filenames, file_table, locked=(), now=None):
+        """
+        Inventory from the node at addr_str: filenames it has held for a
+        while. Tombstones the candidates among them that file_table does not
+        list there and that are not locked for an upload. Returns (orphans,
+        unknown): the names tombstoned, and how many other names file_table
+        does not list there either (left alone).
+        """
+        self.expire_candidates(addr_str, now)
+        pending = self.tombstones.get(addr_str, {})
+        candidates = self.candidates.get(addr_str, {})
+        unrecorded = [name for name in filenames
+                      if name not in pending and addr_str not in file_table.get(name, ())]
+        orphans = [name for name in unrecorded if name in candidates and name not in locked]
+        if orphans:
+            self.add_tombstones(addr_str, orphans, now)
+            for name in orphans:
+                del candidates[name]
+            if not candidates:
+                del self.candidates[addr_str]
+        return orphans, len(unrecorded) - len(orphans)
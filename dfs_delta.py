@@ -0,0 +1,175 @@
+# dfs_delta.py
+"""rsync-style deltas for re-uploading files that changed only a little.
+
+A storage node describes its current copy of a file as one signature per
+block: a weak Adler-32 checksum, which can be rolled forward one byte at a
+time, and an MD5 digest to confirm a weak match. The client slides a window
+over its new version of the file; wherever the window's checksums match a
+block the node already has, it tells the node to copy that block instead of
+sending the bytes. Everything else is sent as literal data.
+
+A delta is a list of operations on the new file:
+
+    ("copy", block_index, block_count)   # blocks of the node's current copy
+    ("data", offset, length)             # bytes of the new file, sent as-is
+
+Literal data is referenced by offset into the local file rather than held in
+memory, so large files can be diffed and sent in pieces.
+"""
+
+import hashlib
+import zlib
+
+# Block size for signatures; smaller blocks find more matches around edits
+# but make the signature list longer
+DELTA_BLOCK_SIZE = 64 * 1024
+
+# Stop diffing and fall back to a full upload once this share of the new file
+# turned out to be literal data (rolling byte by byte is slow in Python)
+DELTA_GIVE_UP_RATIO = 0.5
+
+_ADLER_MOD = 65521
+_READ_SIZE = 8 * 1024 * 1024
+
+
+def strong_checksum(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def _find_block(table, window, weak):
+    """Index of the base block equal to window, or None."""
+    candidates = table.get(weak)
+    if candidates:
+        strong = strong_checksum(window)
+        for s, index in candidates:
+            if s == strong:
+                return index
+    return None
+
+
+def block_signatures(blocks):
+    """[[weak, strong], ...] for an iterable of blocks."""
+    return [[zlib.adler32(block), strong_checksum(block)] for block in blocks]
+
+
+def file_signatures(path, block_size=DELTA_BLOCK_SIZE):
+    """Signatures of each block of path (the last one may be short)."""
+    with open(path, "rb") as f:
+        return block_signatures(iter(lambda: f.read(block_size), b""))
+
+
+def compute_delta(path, signatures, base_size, block_size=DELTA_BLOCK_SIZE,
+                  give_up_ratio=DELTA_GIVE_UP_RATIO):
+    """
+    Delta turning the node's copy (signatures, base_size bytes) into the
+    file at path, or None if more than give_up_ratio of it is new data.
+    """
+    table = {}
+    tail = None  # (index, length, strong) of a short last block
+    for index, (weak, strong) in enumerate(signatures):
+        length = min(block_size, base_size - index * block_size)
+        if length == block_size:
+            table.setdefault(weak, []).append((strong, index))
+        elif length > 0:
+            tail = (index, length, strong)
+
+    ops = []
+    literal_total = 0
+
+    def emit_literal(start, end):
+        nonlocal literal_total
+        if end > start:
+            ops.append(("data", start, end - start))
+            literal_total += end - start
+
+    def emit_copy(index):
+        if ops and ops[-1][0] == "copy" and ops[-1][1] + ops[-1][2] == index:
+            ops[-1] = ("copy", ops[-1][1], ops[-1][2] + 1)
+        else:
+            ops.append(("copy", index, 1))
+
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(0)
+        limit = size * give_up_ratio
+
+        buf = b""
+        base = 0        # file offset of buf[0]
+        pos = 0         # window start in buf
+        literal_start = 0
+        eof = False
+        weak = None
+        a = b = 0
+        while True:
+            # need the window plus the byte that rolls into it
+            if len(buf) - pos <= block_size and not eof:
+                buf = buf[pos:] + f.read(_READ_SIZE)
+                base += pos
+                pos = 0
+                eof = f.tell() >= size
+            if len(buf) - pos < block_size:
+                break
+
+            if weak is None:
+                weak = zlib.adler32(buf[pos:pos + block_size])
+                a, b = weak & 0xFFFF, weak >> 16
+                # An edit that overwrites bytes leaves the following blocks
+                # where they were: try the next block before rolling through
+                # this one byte by byte
+                nxt = buf[pos + block_size:pos + 2 * block_size]
+                if len(nxt) == block_size and \
+                        _find_block(table, buf[pos:pos + block_size], weak) is None:
+                    match = _find_block(table, nxt, zlib.adler32(nxt))
+                    if match is not None:
+                        emit_literal(literal_start, base + pos + block_size)
+                        emit_copy(match)
+                        pos += 2 * block_size
+                        literal_start = base + pos
+                        weak = None
+                        continue
+
+            match = _find_block(table, buf[pos:pos + block_size], weak)
+            if match is not None:
+                emit_literal(literal_start, base + pos)
+                emit_copy(match)
+                pos += block_size
+                literal_start = base + pos
+                weak = None
+                continue
+
+            last = len(buf) - block_size - 1  # last window start with a byte to roll in
+            if pos > last:
+                break  # end of file
+            literal = literal_total + (base + pos - literal_start)
+            budget = int(limit - literal)
+            # also stop early once the part scanned so far is mostly new
+            if budget <= 0 or (base + pos > size * 0.1 and literal > give_up_ratio * (base + pos)):
+                return None
+            # roll to the next window whose weak checksum is known
+            stop = min(last, pos + budget)
+            while True:
+                out_byte, in_byte = buf[pos], buf[pos + block_size]
+                a = (a - out_byte + in_byte) % _ADLER_MOD
+                b = (b - block_size * out_byte + a - 1) % _ADLER_MOD
+                weak = (b << 16) | a
+                pos += 1
+                if weak in table or pos >= stop:
+                    break
+
+        # what is left is shorter than a block; it may be the old last block
+        rest = buf[pos:]
+        if tail is not None and len(rest) >= tail[1] and \
+                strong_checksum(rest[len(rest) - tail[1]:]) == tail[2]:
+            emit_literal(literal_start, size - tail[1])
+            emit_copy(tail[0])
+        else:
+            emit_literal(literal_start, size)
+
+    if literal_total > limit:
+        return None
+    return ops
+
+
+def delta_literal_bytes(ops):
+    return sum(op[2] for op in ops if op[0] == "data")
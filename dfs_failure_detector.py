@@ -0,0 +1,143 @@
+# dfs_failure_detector.py
+"""Failure detection for the master.
+
+PhiAccrualDetector keeps a window of heartbeat inter-arrival times for one
+node and turns "time since the last heartbeat" into a suspicion level phi
+(phi = 3 means a 1-in-1000 chance the node is merely late), so jittery
+nodes get more slack and steady nodes are caught faster than with a fixed
+timeout.
+
+HeartbeatScheduler keeps every node's phi deadline - the moment its phi
+will cross the threshold - in a heap, so the monitor only examines nodes
+that are actually due instead of scanning all of them.
+"""
+
+import heapq
+import math
+import threading
+from collections import deque
+from statistics import NormalDist
+
+
+class PhiAccrualDetector:
+    __slots__ = ("intervals", "total", "total_sq", "last", "min_std", "pause")
+
+    def __init__(self, now, expected_interval, window=100, min_std=0.2, pause=0.0):
+        self.intervals = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.last = now
+        self.min_std = min_std
+        # Extra slack added to the mean (e.g. tolerated GC pause)
+        self.pause = pause
+        # Seed with the expected rate so a fresh node has sensible statistics
+        self._add(expected_interval - expected_interval / 4)
+        self._add(expected_interval + expected_interval / 4)
+
+    def _add(self, interval):
+        if len(self.intervals) == self.intervals.maxlen:
+            old = self.intervals[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.intervals.append(interval)
+        self.total += interval
+        self.total_sq += interval * interval
+
+    def heartbeat(self, now):
+        interval = now - self.last
+        self.last = now
+        if interval > 0:
+            self._add(interval)
+
+    def _stats(self):
+        n = len(self.intervals)
+        mean = self.total / n
+        var = max(self.total_sq / n - mean * mean, 0.0)
+        return mean + self.pause, max(math.sqrt(var), self.min_std)
+
+    def phi(self, now):
+        mean, std = self._stats()
+        y = (now - self.last - mean) / std
+        p_later = 0.5 * math.erfc(y / math.sqrt(2))
+        return -math.log10(max(p_later, 1e-300))
+
+    def deadline(self, threshold):
+        """Time at which phi reaches threshold if no heartbeat arrives."""
+        mean, std = self._stats()
+        return self.last + mean + _z_for(threshold) * std
+
+
+_z_cache = {}
+
+
+def _z_for(threshold):
+    z = _z_cache.get(threshold)
+    if z is None:
+        z = _z_cache[threshold] = NormalDist().inv_cdf(1 - 10 ** -threshold)
+    return z
+
+
+class HeartbeatScheduler:
+    """
+    Phi detectors for all nodes plus a heap of their deadlines.
+
+    heartbeat() is O(log n); due() pops only nodes whose deadline passed.
+    Superseded heap entries are skipped lazily.
+    """
+
+    def __init__(self, expected_interval, threshold=8.0, min_std=0.2, pause=0.0, max_silence=None):
+        self.expected_interval = expected_interval
+        self.threshold = threshold
+        # Hard ceiling: a node silent this long is due whatever its phi says
+        self.max_silence = max_silence
+        self.min_std = min_std
+        self.pause = pause
+        self.detectors = {}   # node_id -> PhiAccrualDetector
+        self.deadlines = {}   # node_id -> current deadline
+        self.heap = []        # (deadline, node_id)
+        self.lock = threading.Lock()
+
+    def heartbeat(self, node_id, now):
+        with self.lock:
+            det = self.detectors.get(node_id)
+            if det is None:
+                det = self.detectors[node_id] = PhiAccrualDetector(
+                    now, self.expected_interval, min_std=self.min_std, pause=self.pause)
+            else:
+                det.heartbeat(now)
+            deadline = det.deadline(self.threshold)
+            if self.max_silence is not None:
+                deadline = min(deadline, now + self.max_silence)
+            self._schedule(node_id, deadline)
+
+    def _schedule(self, node_id, deadline):
+        self.deadlines[node_id] = deadline
+        heapq.heappush(self.heap, (deadline, node_id))
+
+    def remove(self, node_id):
+        with self.lock:
+            self.detectors.pop(node_id, None)
+            self.deadlines.pop(node_id, None)
+
+    def phi(self, node_id, now):
+        with self.lock:
+            det = self.detectors.get(node_id)
+            return det.phi(now) if det else float("inf")
+
+    def due(self, now):
+        """Pop and return node ids whose phi crossed the threshold by now."""
+        expired = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                deadline, node_id = heapq.heappop(self.heap)
+                if self.deadlines.get(node_id) != deadline:
+                    continue  # superseded by a later heartbeat
+                del self.deadlines[node_id]
+                expired.append(node_id)
+        return expired
+
+    def next_deadline(self):
+        with self.lock:
+            while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
@@ -0,0 +1,55 @@
+# dfs_hashring.py
+"""Consistent hashing of DFS file names onto master shards.
+
+The namespace is split across several master processes. Each shard is
+placed on the ring at VNODES pseudo-random points; a file belongs to the
+first shard point at or after the hash of its name. Adding a shard only
+moves roughly 1/N of the files, and every client, given the same shard list,
+computes the same owner without asking anyone.
+
+The shard list comes from DFS_MASTER_SHARDS ("host:port,host:port,...").
+When it is unset callers fall back to the single master at
+DFS_MASTER_HOST:DFS_MASTER_PORT. An entry may be a "primary|standby"
+group; the whole entry is hashed, so failover does not move files.
+"""
+
+import bisect
+import hashlib
+import os
+
+# Points per shard on the ring; more points even out the key distribution
+VNODES = 64
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def parse_shards(value):
+    """Split a "host:port,host:port" list; an empty value gives []."""
+    return [s.strip() for s in (value or "").split(",") if s.strip()]
+
+
+def shards_from_env():
+    return parse_shards(os.environ.get("DFS_MASTER_SHARDS"))
+
+
+class HashRing:
+    def __init__(self, shards, vnodes=VNODES):
+        if not shards:
+            raise ValueError("HashRing needs at least one shard")
+        self.shards = list(shards)
+        points = []
+        for shard in self.shards:
+            for i in range(vnodes):
+                points.append((_hash(f"{shard}#{i}"), shard))
+        points.sort()
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def shard_for(self, key):
+        """Shard address that owns key (a DFS file name)."""
+        if len(self.shards) == 1:
+            return self.shards[0]
+        i = bisect.bisect_left(self._keys, _hash(key))
+        return self._owners[i % len(self._owners)]
@@ -0,0 +1,180 @@
+# dfs_io_scheduler.py
+"""Disk I/O scheduling for storage nodes.
+
+Every disk read or write a node does on behalf of a request (one chunk of an
+upload, download, checksum scan...) runs in one of a fixed number of I/O
+slots. Requests that find all slots busy wait in one queue per class:
+
+- "read":        foreground downloads and checksum/signature scans
+- "write":       foreground uploads
+- "background":  anything a request marks as background (replication,
+                 scrubbing, bulk copies)
+
+When a slot frees up, the next waiter comes from the class that has used the
+least of its share so far (bytes divided by the class weight), so with the
+default weights a burst of uploads cannot take more than a third of the slots
+from waiting downloads, and background work only gets what is left over.
+Within a class waiters are served in arrival order.
+
+Each client may additionally be limited to a byte rate by a token bucket;
+a throttled client sleeps before queueing, so it never holds a slot while
+it waits for tokens.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dfs_metrics import Histogram
+
+CLASSES = ("read", "write", "background")
+DEFAULT_WEIGHTS = {"read": 4, "write": 2, "background": 1}
+
+# Client token buckets kept before idle (full) ones are dropped
+MAX_CLIENT_BUCKETS = 1024
+
+
+class TokenBucket:
+    """Byte-rate limit: rate bytes/s on average, bursts of up to burst bytes."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, n):
+        """Take n tokens, sleeping until the bucket can cover them. Returns seconds slept."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= n
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def idle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens >= self.burst
+
+
+class _Waiter:
+    __slots__ = ("cls", "nbytes", "granted")
+
+    def __init__(self, cls, nbytes):
+        self.cls = cls
+        self.nbytes = nbytes
+        self.granted = threading.Event()
+
+
+class IOScheduler:
+    """
+    Run at most `workers` disk operations at once, sharing them between
+    classes by weight. workers=0 disables scheduling (slot() only applies
+    the client rate limit).
+    """
+
+    def __init__(self, workers=4, weights=None, client_rate=0, client_burst=None):
+        self.workers = workers
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.busy = 0
+        self._queues = {cls: deque() for cls in CLASSES}
+        # Weighted bytes served per class; the class furthest behind goes next
+        self._pass = {cls: 0.0 for cls in CLASSES}
+        self._vtime = 0.0
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.wait = {cls: Histogram() for cls in CLASSES}
+        self.ops = {cls: 0 for cls in CLASSES}
+        self.bytes = {cls: 0 for cls in CLASSES}
+        self.throttled_s = 0.0
+
+    def _bucket(self, client):
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= MAX_CLIENT_BUCKETS:
+                    for key in [k for k, b in self._buckets.items() if b.idle()]:
+                        del self._buckets[key]
+                bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst)
+            return bucket
+
+    def _charge(self, cls, nbytes):
+        """Account a granted operation to its class. Caller holds _lock."""
+        start = max(self._pass[cls], self._vtime)
+        self._vtime = start
+        self._pass[cls] = start + nbytes / self.weights[cls]
+        self.ops[cls] += 1
+        self.bytes[cls] += nbytes
+
+    @contextmanager
+    def slot(self, cls, nbytes, client=None):
+        """
+        `with scheduler.slot("read", len(chunk), client_id): ...` - hold an
+        I/O slot for one disk operation of about nbytes bytes.
+        """
+        if client is not None and self.client_rate:
+            slept = self._bucket(client).consume(nbytes)
+            if slept:
+                with self._lock:
+                    self.throttled_s += slept
+        if not self.workers:
+            yield
+            return
+
+        t0 = time.perf_counter()
+        waiter = None
+        with self._lock:
+            if self.busy < self.workers and not any(self._queues.values()):
+                self.busy += 1
+                self._charge(cls, nbytes)
+            else:
+                waiter = _Waiter(cls, nbytes)
+                self._queues[cls].append(waiter)
+        if waiter is not None:
+            waiter.granted.wait()
+        waited = time.perf_counter() - t0
+        with self._lock:
+            self.wait[cls].observe(waited)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            waiting = [cls for cls in CLASSES if self._queues[cls]]
+            if not waiting:
+                self.busy -= 1
+                return
+            cls = min(waiting, key=lambda c: max(self._pass[c], self._vtime))
+            waiter = self._queues[cls].popleft()
+            # the slot passes straight to the waiter, so busy stays the same
+            self._charge(cls, waiter.nbytes)
+        waiter.granted.set()
+
+    def queued(self):
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "queued": {cls: len(q) for cls, q in self._queues.items()},
+                "ops": dict(self.ops),
+                "bytes": dict(self.bytes),
+                "wait": {cls: h.to_dict() for cls, h in self.wait.items()},
+                "throttled_s": round(self.throttled_s, 3),
+                "clients_limited": len(self._buckets),
+            }
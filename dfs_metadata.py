@@ -0,0 +1,129 @@
+# dfs_metadata.py
+"""Compact metadata tables for the master.
+
+With a plain dict of lists, every file costs its name, a dict entry, a
+list and one string per replica address (strings decoded from JSON are
+not shared), about 400 bytes for three replicas. FileTable keeps the name
+and the dict entry but packs the replica list into one int:
+
+    addrs     node index -> "host:port"          (each address once)
+    files     filename -> packed node indexes     (NODE_BITS bits per replica)
+    sets      packed node indexes -> file count   (distinct replica lists)
+
+A packed list of up to three replicas is a 32-byte int, however long the
+addresses are. The sets counter lets count_files() answer questions like
+"how many files are under-replicated" once per distinct replica list
+instead of once per file; the master's placement produces few of them.
+
+FileTable is a MutableMapping of filename -> list of addresses, so the
+master uses it like the dict it replaces.
+
+NodeInfo is the master's per-node record, with __slots__ instead of a dict.
+"""
+
+from collections.abc import MutableMapping
+
+# Bits per node index in a packed replica list (up to 2**NODE_BITS - 2 addresses)
+NODE_BITS = 20
+
+
+class NodeInfo:
+    __slots__ = ("addr", "last_heartbeat", "alive", "load", "disk", "bytes_in", "bytes_out",
+                 "in_rate", "out_rate", "failed_dirs", "fast_files", "domain_socket",
+                 "socket_uid")
+
+    def __init__(self, addr, last_heartbeat, alive=True, load=0):
+        self.addr = addr
+        self.last_heartbeat = last_heartbeat
+        self.alive = alive
+        self.load = load
+        self.disk = {}             # {"used": bytes, "free": bytes}
+        self.bytes_in = 0          # totals reported by the node
+        self.bytes_out = 0
+        self.in_rate = 0.0         # bytes/s between the last two heartbeats
+        self.out_rate = 0.0
+        self.failed_dirs = []      # storage directories the node lost
+        self.fast_files = None     # files on its fast tier; None until reported
+        self.domain_socket = None  # path for short-circuit reads on its host
+        self.socket_uid = None     # user id the node serves that socket as
+
+
+class FileTable(MutableMapping):
+    """filename -> replica addresses, stored compactly (see module docstring)."""
+
+    def __init__(self, files=None):
+        self.addrs = []
+        self._addr_index = {}
+        self._files = {}
+        self._sets = {}
+        if files:
+            self.update(files)
+
+    def _pack(self, addrs):
+        packed = 0
+        for addr_str in reversed(addrs):
+            index = self._addr_index.get(addr_str)
+            if index is None:
+                if len(self.addrs) >= (1 << NODE_BITS) - 1:
+                    raise OverflowError(f"More than {len(self.addrs)} node addresses")
+                index = self._addr_index[addr_str] = len(self.addrs)
+                self.addrs.append(addr_str)
+            # index + 1, so that a zero field ends the list
+            packed = (packed << NODE_BITS) | (index + 1)
+        return packed
+
+    def _unpack(self, packed):
+        addrs = []
+        mask = (1 << NODE_BITS) - 1
+        while packed:
+            addrs.append(self.addrs[(packed & mask) - 1])
+            packed >>= NODE_BITS
+        return addrs
+
+    def _release(self, packed):
+        count = self._sets[packed] - 1
+        if count:
+            self._sets[packed] = count
+        else:
+            del self._sets[packed]
+
+    def __getitem__(self, filename):
+        return self._unpack(self._files[filename])
+
+    def __setitem__(self, filename, addrs):
+        packed = self._pack(addrs)
+        old = self._files.get(filename)
+        self._files[filename] = packed
+        self._sets[packed] = self._sets.get(packed, 0) + 1
+        if old is not None:
+            self._release(old)
+
+    def __delitem__(self, filename):
+        self._release(self._files.pop(filename))
+
+    def __contains__(self, filename):
+        return filename in self._files
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def clear(self):
+        self.addrs.clear()
+        self._addr_index.clear()
+        self._files.clear()
+        self._sets.clear()
+
+    def replica_sets(self):
+        """(addresses, number of files) for every distinct replica list."""
+        return [(self._unpack(packed), count) for packed, count in self._sets.items()]
+
+    def count_files(self, predicate):
+        """Number of files whose replica address list satisfies predicate."""
+        return sum(count for packed, count in self._sets.items() if predicate(self._unpack(packed)))
+
+    def to_dict(self):
+        """Plain filename -> address list dict (snapshots, JSON)."""
+        return {name: self._unpack(packed) for name, packed in self._files.items()}
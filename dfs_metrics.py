@@ -0,0 +1,257 @@
+# dfs_metrics.py
+"""Request metrics for the master and storage nodes.
+
+Per message type we keep request count, bytes in/out, and histograms of
+handler duration and time spent waiting for the metadata lock, plus a gauge
+of active connections. Figures are gathered in a thread-local RequestStats
+while a request is handled and folded into the shared Metrics under one
+short lock acquisition when it ends, so it is cheap enough to leave on.
+
+Exposed as the STATS message (Metrics.snapshot) and, optionally, as a
+Prometheus text endpoint (start_http_server).
+
+The type comes from the client, so a server passes the message types it
+handles and everything else is counted under UNKNOWN_TYPE; otherwise each
+made-up type would get its own stats forever.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stats key for messages whose type the server does not handle
+UNKNOWN_TYPE = "UNKNOWN"
+
+_local = threading.local()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (seconds)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "buckets": self.counts[:],
+        }
+
+
+class RequestStats:
+    """Figures for the request being handled on the current thread."""
+
+    __slots__ = ("mtype", "start", "bytes_in", "bytes_out", "lock_wait")
+
+    def __init__(self):
+        self.mtype = None
+        self.start = time.perf_counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lock_wait = 0.0
+
+
+class TypeStats:
+    __slots__ = ("count", "bytes_in", "bytes_out", "duration", "lock_wait")
+
+    def __init__(self):
+        self.count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.duration = Histogram()
+        self.lock_wait = Histogram()
+
+
+def add_bytes_in(n):
+    req = getattr(_local, "req", None)
+    if req is not None:
+        req.bytes_in += n
+
+
+def add_bytes_out(n):
+    req = getattr(_local, "req", None)
+    if req is not None:
+        req.bytes_out += n
+
+
+def set_type(mtype):
+    req = getattr(_local, "req", None)
+    if req is not None:
+        req.mtype = mtype
+
+
+def _label(value):
+    """value as a quoted Prometheus label value, with backslashes, quotes and newlines escaped."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{text}"'
+
+
+class Metrics:
+    def __init__(self, role, types=None):
+        self.role = role
+        # message types counted under their own name (all, if None)
+        self.known_types = None if types is None else frozenset(types)
+        self.started = time.time()
+        self.active = 0
+        self.bytes_in = 0   # totals across all message types
+        self.bytes_out = 0
+        self.types = {}
+        self.gauges = {}  # name -> zero-arg callable, sampled on snapshot
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """Start accounting for a request handled on this thread."""
+        req = RequestStats()
+        _local.req = req
+        with self._lock:
+            self.active += 1
+        return req
+
+    def end(self, req):
+        duration = time.perf_counter() - req.start
+        _local.req = None
+        with self._lock:
+            self.active -= 1
+            self.bytes_in += req.bytes_in
+            self.bytes_out += req.bytes_out
+            mtype = req.mtype
+            if mtype is None:
+                return
+            if not isinstance(mtype, str) or (self.known_types is not None and mtype not in self.known_types):
+                mtype = UNKNOWN_TYPE
+            stats = self.types.get(mtype)
+            if stats is None:
+                stats = self.types[mtype] = TypeStats()
+            stats.count += 1
+            stats.bytes_in += req.bytes_in
+            stats.bytes_out += req.bytes_out
+            stats.duration.observe(duration)
+            stats.lock_wait.observe(req.lock_wait)
+
+    @contextmanager
+    def locked(self, lock):
+        """`with metrics.locked(lock):` - acquire lock, recording the wait."""
+        t0 = time.perf_counter()
+        lock.acquire()
+        req = getattr(_local, "req", None)
+        if req is not None:
+            req.lock_wait += time.perf_counter() - t0
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def snapshot(self):
+        with self._lock:
+            requests = {
+                mtype: {
+                    "count": s.count,
+                    "bytes_in": s.bytes_in,
+                    "bytes_out": s.bytes_out,
+                    "handler": s.duration.to_dict(),
+                    "lock_wait": s.lock_wait.to_dict(),
+                }
+                for mtype, s in self.types.items()
+            }
+            active = self.active
+        snap = {
+            "role": self.role,
+            "uptime_s": time.time() - self.started,
+            "active_connections": active,
+            "requests": requests,
+        }
+        for name, fn in self.gauges.items():
+            try:
+                snap[name] = fn()
+            except Exception:
+                pass
+        return snap
+
+    def prometheus_text(self):
+        snap = self.snapshot()
+        role = _label(self.role)
+        lines = [
+            "# TYPE dfs_active_connections gauge",
+            f'dfs_active_connections{{role={role}}} {snap["active_connections"]}',
+            "# TYPE dfs_uptime_seconds gauge",
+            f'dfs_uptime_seconds{{role={role}}} {snap["uptime_s"]:.3f}',
+        ]
+        for name in self.gauges:
+            if isinstance(snap.get(name), (int, float)):
+                lines.append(f"# TYPE dfs_{name} gauge")
+                lines.append(f'dfs_{name}{{role={role}}} {snap[name]}')
+
+        with self._lock:
+            items = sorted(self.types.items())
+            for metric, attr in (("requests_total", "count"),
+                                 ("bytes_in_total", "bytes_in"),
+                                 ("bytes_out_total", "bytes_out")):
+                lines.append(f"# TYPE dfs_{metric} counter")
+                for mtype, s in items:
+                    lines.append(f'dfs_{metric}{{role={role},type={_label(mtype)}}} {getattr(s, attr)}')
+            for metric, attr in (("handler_seconds", "duration"), ("lock_wait_seconds", "lock_wait")):
+                lines.append(f"# TYPE dfs_{metric} histogram")
+                for mtype, s in items:
+                    hist = getattr(s, attr)
+                    labels = f'role={role},type={_label(mtype)}'
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS + ("+Inf",), hist.counts):
+                        cumulative += n
+                        lines.append(f'dfs_{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"dfs_{metric}_sum{{{labels}}} {hist.total:.6f}")
+                    lines.append(f"dfs_{metric}_count{{{labels}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(metrics, port, host="0.0.0.0"):
+    """Serve metrics.prometheus_text() at http://host:port/metrics in a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,135 @@
+# dfs_tiering.py
+"""Hot/cold storage tiering for storage nodes.
+
+AccessTracker counts reads per file with exponential decay: a read counts
+1 right away, 1/2 after one half-life, 1/4 after two, and so on, so the
+score reflects both how often and how recently a file was read. Instead
+of a count plus a timestamp it keeps one float per file,
+
+    key = log2(sum over reads of 2 ** (read_time / half_life))
+
+from which the score at any time is 2 ** (key - now / half_life), and a new
+read is a log-sum-exp update of the key. Nothing has to be decayed in the
+background.
+
+plan_moves() decides which files should move between the fast tier (a
+small SSD directory) and the capacity tier from those scores.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+
+class AccessTracker:
+    """Decaying per-file read counters (see module docstring)."""
+
+    def __init__(self, half_life):
+        self.half_life = half_life
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, now=None, weight=1.0):
+        point = (time.time() if now is None else now) / self.half_life + math.log2(weight)
+        with self._lock:
+            key = self._keys.get(name)
+            if key is None:
+                self._keys[name] = point
+            else:
+                # log2(2 ** key + 2 ** point) without overflowing
+                self._keys[name] = max(key, point) + math.log2(1 + 2 ** -abs(key - point))
+
+    def score(self, name, now=None):
+        with self._lock:
+            key = self._keys.get(name)
+        if key is None:
+            return 0.0
+        return 2 ** (key - (time.time() if now is None else now) / self.half_life)
+
+    def scores(self, now=None):
+        now = (time.time() if now is None else now) / self.half_life
+        with self._lock:
+            return {name: 2 ** (key - now) for name, key in self._keys.items()}
+
+    def forget(self, name):
+        with self._lock:
+            self._keys.pop(name, None)
+
+    def prune(self, min_score, now=None):
+        """Drop files whose score decayed below min_score; returns how many."""
+        floor = (time.time() if now is None else now) / self.half_life + math.log2(min_score)
+        with self._lock:
+            cold = [name for name, key in self._keys.items() if key < floor]
+            for name in cold:
+                del self._keys[name]
+        return len(cold)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def save(self, path):
+        with self._lock:
+            data = dict(self._keys)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"half_life": self.half_life, "keys": data}, f)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Restore counters saved by save(); missing or unreadable files are ignored."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # keys are in units of the half-life they were saved with
+        scale = data.get("half_life", self.half_life) / self.half_life
+        with self._lock:
+            for name, key in data.get("keys", {}).items():
+                self._keys[name] = key * scale
+
+
+def plan_moves(fast, capacity, scores, fast_bytes, promote_score, demote_score):
+    """
+    Decide tier moves. fast and capacity map file name -> size for the
+    files on each tier; scores maps name -> access score (missing: 0).
+
+    Returns (demote, promote): names to move to the capacity tier and to
+    the fast tier. Fast-tier files colder than demote_score are demoted;
+    capacity files at least promote_score hot are promoted, hottest first,
+    while they fit in fast_bytes, displacing fast-tier files that are
+    colder than they are. If the fast tier holds more than fast_bytes, its
+    coldest files are demoted until it fits.
+    """
+    demote = [n for n in fast if scores.get(n, 0.0) < demote_score]
+    cold = set(demote)
+    # coldest first, to make room for hotter files
+    resident = sorted((n for n in fast if n not in cold), key=lambda n: scores.get(n, 0.0))
+    used = sum(fast[n] for n in resident)
+    while used > fast_bytes:
+        victim = resident.pop(0)
+        demote.append(victim)
+        used -= fast[victim]
+    promote = []
+    candidates = sorted((n for n in capacity if scores.get(n, 0.0) >= promote_score),
+                        key=lambda n: scores[n], reverse=True)
+    for name in candidates:
+        size = capacity[name]
+        evict = []
+        free = fast_bytes - used
+        for victim in resident:
+            if free >= size or scores.get(victim, 0.0) >= scores[name]:
+                break
+            evict.append(victim)
+            free += fast[victim]
+        if free < size:
+            continue
+        for victim in evict:
+            resident.remove(victim)
+            demote.append(victim)
+            used -= fast[victim]
+        promote.append(name)
+        used += size
+    return demote, promote
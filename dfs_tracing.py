@@ -0,0 +1,223 @@
+# dfs_tracing.py
+"""Request tracing across client, master and storage nodes.
+
+A client operation (upload_file, download_file, ...) may start a trace:
+with probability SAMPLE_RATE it gets a trace id and a root span, and every
+request sent while it runs carries {"trace": {"id": ..., "parent": ...}}
+in its JSON header. The master and the nodes time their handling of such
+requests as child spans. Unsampled requests carry nothing and cost
+nothing beyond one context lookup.
+
+Finished spans go to an in-process ring buffer (the last BUFFER_SPANS),
+which masters and nodes return on TRACE_DUMP. Clients hand the spans of
+each finished trace to the functions in REPORTERS (dfs_client_lib sends
+them to the master, so a trace can be collected after the client exited).
+timeline() turns the spans of one trace into an indented text timeline.
+
+Span start times come from each process's clock, so across hosts the
+offsets are only as good as the clock sync.
+"""
+
+import functools
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SAMPLE_RATE = float(os.environ.get("DFS_TRACE_SAMPLE", 0.01))
+BUFFER_SPANS = 10000
+
+# Called with the list of span dicts of each finished trace started here
+REPORTERS = []
+
+_spans = deque(maxlen=BUFFER_SPANS)
+_current = ContextVar("dfs_trace_span", default=None)
+_root_of = ContextVar("dfs_trace_root", default=None)
+
+
+def new_id():
+    return os.urandom(8).hex()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "start", "duration", "attrs",
+                 "finished")
+
+    def __init__(self, trace_id, parent_id, name, service, attrs):
+        self.trace_id = trace_id
+        self.span_id = new_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.start = time.time()
+        self.duration = 0.0
+        self.attrs = attrs
+        # spans of this trace finished in this process (root spans only)
+        self.finished = [] if parent_id is None else None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+        }
+
+
+def _run(span, root=None):
+    token = _current.set(span)
+    t0 = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        span.attrs["error"] = repr(e)
+        raise
+    finally:
+        span.duration = time.perf_counter() - t0
+        _current.reset(token)
+        record = span.to_dict()
+        _spans.append(record)
+        if root is not None:
+            root.finished.append(record)
+            if span is root:
+                for report in REPORTERS:
+                    try:
+                        report(root.finished)
+                    except Exception:
+                        pass
+
+
+@contextmanager
+def trace(name, service="client", sample=None, **attrs):
+    """
+    Root span of a new trace, sampled with SAMPLE_RATE (or if sample is
+    true). Inside a running trace this is just a child span. Yields the
+    span, or None when not sampled.
+    """
+    if _current.get() is not None:
+        with span(name, service, **attrs) as s:
+            yield s
+        return
+    if not (random.random() < SAMPLE_RATE if sample is None else sample):
+        yield None
+        return
+    root = Span(new_id(), None, name, service, attrs)
+    token = _root_of.set(root)
+    try:
+        yield from _run(root, root)
+    finally:
+        _root_of.reset(token)
+
+
+@contextmanager
+def span(name, service="client", **attrs):
+    """Child span of the current one; yields None (and records nothing) outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    yield from _run(Span(parent.trace_id, parent.span_id, name, service, attrs), _root_of.get())
+
+
+@contextmanager
+def server_span(header, name, service):
+    """Span for handling a request whose header may carry a trace context."""
+    ctx = header.get("trace")
+    if not ctx:
+        yield None
+        return
+    yield from _run(Span(ctx["id"], ctx.get("parent"), name, service, {}))
+
+
+def traced(name, service="client"):
+    """Decorator: run the function under trace(name), a sampled root span."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with trace(name, service):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+
+def inject(header):
+    """Add the current trace context to an outgoing request header."""
+    s = _current.get()
+    if s is not None:
+        header["trace"] = {"id": s.trace_id, "parent": s.span_id}
+    return header
+
+
+def add(key, value):
+    """Add value to a numeric attribute of the current span, if any."""
+    s = _current.get()
+    if s is not None:
+        s.attrs[key] = round(s.attrs.get(key, 0) + value, 3)
+
+
+def annotate(**attrs):
+    """Set attributes of the current span, if any."""
+    s = _current.get()
+    if s is not None:
+        s.attrs.update(attrs)
+
+
+def record(spans):
+    """Store spans finished elsewhere (TRACE_REPORT)."""
+    _spans.extend(spans)
+
+
+def dump(trace_id=None):
+    """Buffered spans, all of them or those of one trace."""
+    spans = list(_spans)
+    if trace_id is not None:
+        spans = [s for s in spans if s["trace_id"] == trace_id]
+    return spans
+
+
+def summarize(spans):
+    """One entry per trace: id, name and duration of its root (if known), span count, start."""
+    traces = {}
+    for s in spans:
+        t = traces.setdefault(s["trace_id"], {"trace_id": s["trace_id"], "name": None, "duration_ms": None,
+                                              "spans": 0, "start": s["start"]})
+        t["spans"] += 1
+        t["start"] = min(t["start"], s["start"])
+        if s["parent_id"] is None:
+            t["name"] = s["name"]
+            t["duration_ms"] = s["duration_ms"]
+    return sorted(traces.values(), key=lambda t: t["start"])
+
+
+def timeline(spans):
+    """Text lines showing one trace's spans as a tree, with offsets from its start."""
+    if not spans:
+        return []
+    unique = {s["span_id"]: s for s in spans}
+    children = {}
+    for s in unique.values():
+        parent = s["parent_id"] if s["parent_id"] in unique else None
+        children.setdefault(parent, []).append(s)
+    for group in children.values():
+        group.sort(key=lambda s: s["start"])
+    t0 = min(s["start"] for s in unique.values())
+    lines = [f"{'offset ms':>10s} {'dur ms':>9s}  {'service':14s} span"]
+
+    def walk(parent, depth):
+        for s in children.get(parent, []):
+            attrs = " ".join(f"{k}={v}" for k, v in s["attrs"].items())
+            lines.append(f"{(s['start'] - t0) * 1000:10.1f} {s['duration_ms']:9.1f}  {s['service']:14s} "
+                         f"{'  ' * depth}{s['name']} {attrs}".rstrip())
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return lines
@@ -6,229 +6,853 @@ handles client requests for upload/download, locks, and node status.
 Configuration:
 - MASTER_HOST / MASTER_PORT: listening address
 - REPLICATION_FACTOR: number of replicas per file
-- HEARTBEAT_TIMEOUT: seconds after which a node is considered dead
+- HEARTBEAT_INTERVAL: how often nodes are expected to send heartbeats
+- PHI_THRESHOLD: phi-accrual suspicion level at which a node is marked dead
+- PHI_MIN_STD / PHI_ACCEPTABLE_PAUSE: floor on the heartbeat jitter estimate and extra tolerated delay
+- HEARTBEAT_TIMEOUT: seconds of silence after which a node is dead regardless of phi
+- STANDBY_OF: primary to follow as a hot standby (unset: run as primary)
+- FAILOVER_TIMEOUT: seconds a standby waits for a lost primary before taking over
+- DELETE_BATCH: files a node is told to delete per heartbeat
+
+Each setting can be overridden with the matching DFS_* environment variable
+(see CONFIG.md).
 """
 
+import os
+import queue
 import socket
 import threading
 import json
 import time
 
-MASTER_HOST = "127.0.0.1"
-MASTER_PORT = 5000
+import dfs_metrics
+import dfs_tracing
+from dfs_admission import AdmissionController
+from dfs_deletion import DeletionTracker
+from dfs_failure_detector import HeartbeatScheduler
+from dfs_metadata import FileTable, NodeInfo
 
-# Number of replicas per file
-REPLICATION_FACTOR = 2
-
-# Seconds without heartbeat to mark node dead
-HEARTBEAT_TIMEOUT = 10
+MASTER_HOST = os.environ.get("DFS_MASTER_HOST", "127.0.0.1")
+MASTER_PORT = int(os.environ.get("DFS_MASTER_PORT", 5000))
 
-# node_id -> {"addr": "host:port", "last_heartbeat": t, "alive": bool}
+# Number of replicas per file
+REPLICATION_FACTOR = int(os.environ.get("DFS_REPLICATION_FACTOR", 2))
+
+# Seconds between heartbeats that nodes are expected to keep
+HEARTBEAT_INTERVAL = float(os.environ.get("DFS_HEARTBEAT_INTERVAL", 3))
+
+# Phi-accrual threshold: a node is declared dead when the chance that its
+# next heartbeat is merely late drops below 10**-PHI_THRESHOLD
+PHI_THRESHOLD = float(os.environ.get("DFS_PHI_THRESHOLD", 8))
+
+# Floor on the interval standard deviation (seconds), so very steady nodes
+# are not declared dead after a few hundred ms of extra delay
+PHI_MIN_STD = float(os.environ.get("DFS_PHI_MIN_STD", 0.5))
+
+# Seconds of extra delay (GC, busy disk) tolerated on top of the mean interval
+PHI_ACCEPTABLE_PAUSE = float(os.environ.get("DFS_PHI_ACCEPTABLE_PAUSE", 1.0))
+
+# Upper bound on silence: seconds without heartbeat to mark node dead even
+# if its heartbeat history would tolerate a longer gap
+HEARTBEAT_TIMEOUT = float(os.environ.get("DFS_HEARTBEAT_TIMEOUT", 10))
+
+# Seconds between checks for changes pushed to SUBSCRIBE_STATUS clients
+STATUS_PUSH_INTERVAL = 1.0
+# The under-replicated count walks every replica set; it is recounted when
+# the set of alive nodes changes, otherwise at most every this many seconds
+UNDER_REPLICATED_INTERVAL = 10.0
+
+# Optional port for a Prometheus text endpoint at /metrics (off when unset)
+METRICS_PORT = int(os.environ["DFS_METRICS_PORT"]) if os.environ.get("DFS_METRICS_PORT") else None
+
+# Admission control (see dfs_admission): requests handled at once, client
+# requests allowed to wait, and the queue delay (ms) above which client
+# requests are answered "busy" instead of queued
+ADMISSION_WORKERS = int(os.environ.get("DFS_ADMISSION_WORKERS", 8))
+ADMISSION_QUEUE = int(os.environ.get("DFS_ADMISSION_QUEUE", 256))
+ADMISSION_TARGET_MS = float(os.environ.get("DFS_ADMISSION_TARGET_MS", 50))
+
+# Requests that skip admission control: long-lived streams and diagnostics
+UNADMITTED_TYPES = {"REPLICATE_SUBSCRIBE", "SUBSCRIBE_STATUS", "STATS", "TRACE_DUMP"}
+# Requests admitted ahead of client requests
+CONTROL_TYPES = {"HEARTBEAT", "REGISTER_NODE"}
+# Client requests admitted ahead of the others and never shed for overload:
+# they finish an upload or give back a lock
+FINISH_TYPES = {"UPLOAD_DONE", "LOCK_RELEASE"}
+# Every request the master handles; metrics count anything else as UNKNOWN
+MESSAGE_TYPES = UNADMITTED_TYPES | CONTROL_TYPES | FINISH_TYPES | {
+    "INVENTORY", "LOCK_REQUEST", "TRACE_REPORT", "LIST_FILES", "NODES_STATUS",
+    "UPLOAD_REQUEST", "DOWNLOAD_REQUEST", "FILE_INFO", "DELETE_REQUEST", "DELETE_DONE",
+}
+
+# Connections served at once. Connections beyond this get one "busy" reply
+# and are closed, unless they come from a node (heartbeat/registration).
+MAX_CONNECTIONS = int(os.environ.get("DFS_MAX_CONNECTIONS", 4096))
+# Excess connections waiting for that reply; more are closed right away
+OVERFLOW_BACKLOG = 1024
+
+# "host:port" of the primary to follow as a hot standby; unset runs as primary.
+# A standby keeps a copy of the metadata from the primary's mutation stream,
+# answers other requests with status "standby", and takes over once the
+# primary has been unreachable for FAILOVER_TIMEOUT seconds.
+STANDBY_OF = os.environ.get("DFS_STANDBY_OF") or None
+FAILOVER_TIMEOUT = float(os.environ.get("DFS_FAILOVER_TIMEOUT", 3))
+
+# Seconds between keep-alive messages on an idle replication stream
+REPLICATION_PING_INTERVAL = 1.0
+# Files per message when sending a standby the file table; each message's
+# files are read under the lock, the JSON is built outside it
+SNAPSHOT_CHUNK = 10000
+
+# Deleted files are removed from the metadata at once and their replicas
+# later: every heartbeat reply tells a node to delete up to this many of its
+# files (see dfs_deletion)
+DELETE_BATCH = int(os.environ.get("DFS_DELETE_BATCH", 1000))
+
+# Inventories only reclaim replicas this master placed and then lost track
+# of (see dfs_deletion); a file it knows nothing about is left alone.
+# Such orphan candidates are forgotten after this many seconds.
+ORPHAN_TTL = float(os.environ.get("DFS_ORPHAN_TTL", 86400))
+
+# recv_json peeks this many bytes at a time for the end of a header; large
+# headers (snapshots, bulk deletes, inventories) take one peek per chunk
+RECV_PEEK_BYTES = 64 * 1024
+
+# node_id -> NodeInfo (address, liveness, load, disk, tiers; see dfs_metadata)
 nodes = {}
 
-# filename -> ["host:port", "host:port", ...]
-file_table = {}
+# "host:port" -> node_id of the node last registered there (see add_node)
+node_ids = {}
+
+# filename -> ["host:port", "host:port", ...], stored compactly (see dfs_metadata)
+file_table = FileTable()
 
 # filename -> client_id (who currently holds the write lock)
 file_locks = {}
 
+# Replicas still to be deleted (tombstones) and replicas that may have been
+# left behind (orphan candidates), per node address
+deletions = DeletionTracker(ORPHAN_TTL)
+
 lock = threading.Lock()
 
+# "primary" or "standby"
+role = "primary"
+
+# Queues feeding connected standbys, and the sequence number of the last
+# mutation (both guarded by lock)
+replica_queues = []
+replication_seq = 0
+
+# Cluster view shared by all SUBSCRIBE_STATUS clients and the last
+# under-replicated count (see current_status; own lock)
+status_cache = {"at": None, "snap": None, "alive": None, "under_at": None, "under": 0}
+status_lock = threading.Lock()
+
+# Phi-accrual detectors and the heap of per-node deadlines (own lock)
+detector = HeartbeatScheduler(HEARTBEAT_INTERVAL, PHI_THRESHOLD, min_std=PHI_MIN_STD,
+                              pause=PHI_ACCEPTABLE_PAUSE, max_silence=HEARTBEAT_TIMEOUT)
+
+admission = AdmissionController(ADMISSION_WORKERS, {"client": ADMISSION_QUEUE},
+                                target_delay=ADMISSION_TARGET_MS / 1000)
+connection_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+overflow = queue.Queue(OVERFLOW_BACKLOG)
+
+metrics = dfs_metrics.Metrics("master", MESSAGE_TYPES)
+metrics.gauge("ha_role", lambda: role)
+metrics.gauge("files", lambda: len(file_table))
+metrics.gauge("nodes_alive", lambda: sum(1 for n in list(nodes.values()) if n.alive))
+metrics.gauge("admission", lambda: admission.stats())
+metrics.gauge("pending_deletes", deletions.pending_deletes)
+metrics.gauge("orphan_candidates", deletions.pending_candidates)
+
 
 def recv_json(conn):
-    data = conn.recv(4096).decode()
-    return json.loads(data)
+    """Read one newline-terminated JSON message from the socket."""
+    buf = bytearray()
+    while True:
+        peek = conn.recv(RECV_PEEK_BYTES, socket.MSG_PEEK)
+        if not peek:
+            raise ConnectionError("No data received")
+        end = peek.find(b"\n")
+        take = len(peek) if end < 0 else end + 1
+        data = conn.recv(take)
+        buf += data
+        if end >= 0 and len(data) == take:
+            break
+    dfs_metrics.add_bytes_in(len(buf))
+    return json.loads(buf)
 
 
 def send_json(conn, obj):
-    conn.sendall(json.dumps(obj).encode())
+    data = json.dumps(obj).encode() + b"\n"
+    conn.sendall(data)
+    dfs_metrics.add_bytes_out(len(data))
+
+
+def choose_nodes(prefer=()):
+    """
+    Pick nodes (by id) for replication: alive nodes at addresses in prefer
+    first, then nodes with all their disks working.
+    """
+    alive_nodes = [nid for nid in nodes if nodes[nid].alive]
+    alive_nodes.sort(key=lambda nid: (nodes[nid].addr not in prefer, bool(nodes[nid].failed_dirs)))
+    return alive_nodes[:REPLICATION_FACTOR]
 
 
-def choose_nodes():
-    """Pick nodes (by id) for replication."""
-    alive_nodes = [nid for nid in nodes if nodes[nid]["alive"]]
-    return alive_nodes[:REPLICATION_FACTOR]
+def add_node(node_id, addr_str, now):
+    """Record a (re-)registered node. Caller holds lock."""
+    nodes[node_id] = NodeInfo(addr_str, now)
+    node_ids[addr_str] = node_id
+
+
+def node_at(addr_str):
+    """(node_id, NodeInfo) of the node at addr_str, or (None, None). Caller holds lock."""
+    node_id = node_ids.get(addr_str)
+    return node_id, nodes.get(node_id)
+
+
+def status_snapshot():
+    """Cluster view pushed to SUBSCRIBE_STATUS clients. Caller holds lock and status_lock."""
+    node_list = []
+    alive_addrs = set()
+    for nid, info in nodes.items():
+        if info.alive:
+            alive_addrs.add(info.addr)
+        node_list.append({
+            "id": nid,
+            "address": info.addr,
+            "status": "ALIVE" if info.alive else "DEAD",
+            "load": info.load,
+            "disk_used": info.disk.get("used", 0),
+            "disk_free": info.disk.get("free", 0),
+            "in_rate": round(info.in_rate),
+            "out_rate": round(info.out_rate),
+            "failed_dirs": info.failed_dirs,
+        })
+    now = time.monotonic()
+    if (alive_addrs != status_cache["alive"] or status_cache["under_at"] is None
+            or now - status_cache["under_at"] >= UNDER_REPLICATED_INTERVAL):
+        # counted per replica set, not per file
+        status_cache["under"] = file_table.count_files(
+            lambda addrs: sum(1 for a in addrs if a in alive_addrs) < REPLICATION_FACTOR)
+        status_cache["alive"] = alive_addrs
+        status_cache["under_at"] = now
+    return {"nodes": node_list, "files": len(file_table), "under_replicated": status_cache["under"]}
+
+
+def current_status():
+    """
+    status_snapshot(), taken at most once per STATUS_PUSH_INTERVAL: every
+    SUBSCRIBE_STATUS client gets the same one, so more watchers do not mean
+    more time under the metadata lock.
+    """
+    with status_lock:
+        now = time.monotonic()
+        if status_cache["at"] is None or now - status_cache["at"] >= STATUS_PUSH_INTERVAL:
+            with metrics.locked(lock):
+                status_cache["snap"] = status_snapshot()
+            status_cache["at"] = now
+        return status_cache["snap"]
+
+
+def stream_status(conn):
+    """
+    Serve a SUBSCRIBE_STATUS client until it disconnects.
+
+    The first message carries every node; after that only nodes whose entry
+    changed are sent, along with the file counters, so idle clusters cost
+    almost nothing to watch.
+    """
+    last_nodes = {}
+    last_sent = 0.0
+    first = True
+    while True:
+        snap = current_status()
+        changed = [n for n in snap["nodes"] if last_nodes.get(n["id"]) != n]
+        now = time.time()
+        # Send changes right away; otherwise a small keep-alive every 10s
+        if first or changed or now - last_sent > 10:
+            msg = {
+                "type": "STATUS",
+                "full": first,
+                "time": now,
+                "nodes": changed,
+                "files": snap["files"],
+                "under_replicated": snap["under_replicated"],
+            }
+            try:
+                send_json(conn, msg)
+            except OSError:
+                return
+            last_nodes = {n["id"]: n for n in snap["nodes"]}
+            last_sent = now
+            first = False
+        time.sleep(STATUS_PUSH_INTERVAL)
+
+
+# ---------- Deletion ----------
+
+def delete_files(filenames):
+    """
+    Drop filenames from the metadata and leave a tombstone for each replica;
+    nodes delete them when told in a heartbeat reply. Returns the names that
+    were not found. Caller holds lock.
+    """
+    deleted, missing = deletions.delete(file_table, filenames)
+    for filename, addrs in deleted:
+        replicate({"op": "delete", "filename": filename, "nodes": addrs})
+    return missing
+
+
+# ---------- Standby replication ----------
+
+def replicate(entry):
+    """Queue a metadata mutation for every connected standby. Caller holds lock."""
+    global replication_seq
+    replication_seq += 1
+    entry["seq"] = replication_seq
+    for q in replica_queues:
+        q.put(entry)
+
+
+def serve_replica(conn):
+    """
+    Feed one standby (REPLICATE_SUBSCRIBE) until it disconnects: a snapshot
+    of the metadata first, then every mutation in the order it was applied.
+
+    The snapshot is a "snapshot" message with everything but the files, then
+    the files SNAPSHOT_CHUNK at a time ("snapshot_files") and "snapshot_done".
+    Its queue is registered together with the first message, so every later
+    mutation reaches the standby after the snapshot. A chunk may catch a
+    file before or after such a mutation; replaying the mutations in order
+    leaves the standby's copy exactly like the primary's either way.
+    """
+    q = queue.Queue()
+    with metrics.locked(lock):
+        head = {
+            "op": "snapshot",
+            "seq": replication_seq,
+            "nodes": {nid: info.addr for nid, info in nodes.items()},
+            "files": {},
+            "locks": dict(file_locks),
+            "tombstones": {addr_str: list(pending) for addr_str, pending in deletions.tombstones.items()},
+        }
+        names = list(file_table)
+        replica_queues.append(q)
+    print("[MASTER] Standby connected")
+    try:
+        send_json(conn, head)
+        for i in range(0, len(names), SNAPSHOT_CHUNK):
+            with metrics.locked(lock):
+                files = {name: file_table[name] for name in names[i:i + SNAPSHOT_CHUNK] if name in file_table}
+            send_json(conn, {"op": "snapshot_files", "files": files})
+        del names
+        send_json(conn, {"op": "snapshot_done"})
+        while True:
+            try:
+                entry = q.get(timeout=REPLICATION_PING_INTERVAL)
+            except queue.Empty:
+                entry = {"op": "ping"}
+            send_json(conn, entry)
+    except OSError:
+        print("[MASTER] Standby disconnected")
+    finally:
+        with lock:
+            replica_queues.remove(q)
+
+
+def apply_replicated(entry):
+    """Apply one entry of the primary's replication stream. Caller holds lock."""
+    global replication_seq
+    op = entry["op"]
+    if op == "snapshot":
+        now = time.time()
+        nodes.clear()
+        node_ids.clear()
+        for nid, addr in entry["nodes"].items():
+            add_node(nid, addr, now)
+        file_table.clear()
+        file_table.update(entry["files"])
+        file_locks.clear()
+        file_locks.update(entry["locks"])
+        deletions.clear()
+        for addr_str, filenames in entry.get("tombstones", {}).items():
+            deletions.add_tombstones(addr_str, filenames, now)
+    elif op == "snapshot_files":
+        file_table.update(entry["files"])
+    elif op == "register":
+        add_node(entry["node_id"], entry["addr"], time.time())
+    elif op == "upload":
+        deletions.record_upload(file_table, entry["filename"], entry["nodes"])
+    elif op == "keep":
+        deletions.cancel_tombstones(entry["filename"], entry["nodes"])
+    elif op == "delete":
+        file_table.pop(entry["filename"], None)
+        for addr_str in entry.get("nodes", []):
+            deletions.add_tombstones(addr_str, [entry["filename"]])
+    elif op == "tombstone":
+        deletions.add_tombstones(entry["addr"], entry["filenames"])
+    elif op == "deleted":
+        deletions.ack(entry["addr"], entry["filenames"])
+    elif op == "lock":
+        file_locks[entry["filename"]] = entry["client_id"]
+    elif op == "unlock":
+        file_locks.pop(entry["filename"], None)
+    replication_seq = entry.get("seq", replication_seq)
+
+
+def follow_primary():
+    """
+    Standby main loop: mirror the primary's metadata and take over once it
+    has been unreachable for FAILOVER_TIMEOUT seconds.
+    """
+    host, port = STANDBY_OF.split(":")
+    last_contact = time.time()
+    synced = False  # between "snapshot" and "snapshot_done" the file table is partial
+    while True:
+        try:
+            with socket.create_connection((host, int(port)), timeout=FAILOVER_TIMEOUT) as s:
+                send_json(s, {"type": "REPLICATE_SUBSCRIBE"})
+                while True:
+                    # the primary pings every REPLICATION_PING_INTERVAL, so a
+                    # timeout here means it hung or the network broke
+                    entry = recv_json(s)
+                    last_contact = time.time()
+                    if entry.get("op") == "ping":
+                        continue
+                    if entry.get("status") == "standby":
+                        raise ConnectionError(f"{STANDBY_OF} is a standby itself")
+                    with metrics.locked(lock):
+                        apply_replicated(entry)
+                    if entry["op"] == "snapshot":
+                        synced = False
+                    elif entry["op"] == "snapshot_done":
+                        synced = True
+                        print(f"[MASTER] Standby of {STANDBY_OF}: {len(nodes)} nodes, "
+                              f"{len(file_table)} files at seq {replication_seq}")
+        except (OSError, ValueError) as e:
+            if time.time() - last_contact >= FAILOVER_TIMEOUT:
+                print(f"[MASTER] Primary {STANDBY_OF} lost ({e})")
+                if not synced:
+                    print("[MASTER] WARNING: taking over before the snapshot was complete; "
+                          "files not received yet are unknown to this master")
+                promote()
+                return
+            time.sleep(0.2)
+
+
+def promote():
+    """Become primary, treating every known node as freshly heard from."""
+    global role
+    now = time.time()
+    with lock:
+        for info in nodes.values():
+            info.last_heartbeat = now
+            info.alive = True
+        known_ids = list(nodes)
+        role = "primary"
+    for nid in known_ids:
+        detector.heartbeat(nid, now)
+    print(f"[MASTER] Promoted to primary with {len(known_ids)} nodes and {len(file_table)} files")
 
 
 def handle_client(conn, addr):
+    """
+    Serve one connection. Normally it carries a single request; senders that
+    set "keepalive" in a message (e.g. node heartbeats) may send further
+    requests on the same connection after reading the response.
+    """
     try:
-        msg = recv_json(conn)
-    except Exception:
+        while True:
+            req = metrics.begin()
+            try:
+                try:
+                    msg = recv_json(conn)
+                except Exception:
+                    return
+                req.start = time.perf_counter()  # don't count idle keep-alive time
+                mtype = msg.get("type")
+                dfs_metrics.set_type(mtype)
+                with dfs_tracing.server_span(msg, mtype, f"master:{MASTER_PORT}") as span:
+                    result = admit(conn, msg)
+                    if span is not None:
+                        span.set(lock_wait_ms=round(req.lock_wait * 1000, 3))
+                if result is STREAMING or not msg.get("keepalive"):
+                    return
+            finally:
+                metrics.end(req)
+    except OSError:
+        pass
+    finally:
         conn.close()
-        return
 
+
+# Returned by handle_message when the connection was handed to a long-lived stream
+STREAMING = object()
+
+
+def busy_reply(retry_after):
+    return {"status": "busy", "message": "Master overloaded, retry later", "retry_after": retry_after}
+
+
+def admit(conn, msg):
+    """Handle msg once admission control lets it in (see dfs_admission), or answer "busy"."""
+    mtype = msg.get("type")
+    if mtype in UNADMITTED_TYPES:
+        return handle_message(conn, msg)
+    cls = "control" if mtype in CONTROL_TYPES else "finish" if mtype in FINISH_TYPES else "client"
+    with admission.slot(cls) as retry_after:
+        if retry_after is None:
+            return handle_message(conn, msg)
+    dfs_tracing.annotate(shed=True)
+    send_json(conn, busy_reply(retry_after))
+
+
+def serve_connection(conn, addr):
+    try:
+        handle_client(conn, addr)
+    finally:
+        connection_slots.release()
+
+
+def peek_type(conn):
+    """Message type of the request waiting on conn, without consuming it (None if unknown)."""
+    data = conn.recv(4096, socket.MSG_PEEK)
+    try:
+        return json.loads(data.split(b"\n", 1)[0]).get("type")
+    except (ValueError, AttributeError):
+        return None
+
+
+def shed_overflow():
+    """
+    Answer connections accepted beyond MAX_CONNECTIONS. Nodes, upload
+    completions and lock releases are still served, on a thread of their
+    own; everyone else gets "busy" once.
+    """
+    while True:
+        conn, addr = overflow.get()
+        try:
+            conn.settimeout(0.5)
+            if peek_type(conn) in CONTROL_TYPES | FINISH_TYPES:
+                conn.settimeout(None)
+                threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+                continue
+            recv_json(conn)
+            send_json(conn, busy_reply(admission.max_retry_after))
+        except (OSError, ValueError):
+            pass
+        conn.close()
+
+
+def handle_message(conn, msg):
     mtype = msg.get("type")
 
+    if role == "standby" and mtype not in ("STATS", "TRACE_DUMP"):
+        # clients and nodes move on to the next master in their list
+        send_json(conn, {"status": "standby", "message": f"Standby of {STANDBY_OF}"})
+        return
+
+    if mtype == "REPLICATE_SUBSCRIBE":
+        serve_replica(conn)
+        return STREAMING
+
     # ---------- NODE side messages ----------
     if mtype == "REGISTER_NODE":
         node_id = msg["node_id"]
-        with lock:
-            nodes[node_id] = {
-                "addr": msg["addr"],
-                "last_heartbeat": time.time(),
-                "alive": True
-            }
+        with metrics.locked(lock):
+            add_node(node_id, msg["addr"], time.time())
+            replicate({"op": "register", "node_id": node_id, "addr": msg["addr"]})
+        detector.heartbeat(node_id, time.time())
         print(f"[MASTER] Node registered: {node_id} @ {msg['addr']}")
         send_json(conn, {"status": "ok"})
-        conn.close()
         return
 
     if mtype == "HEARTBEAT":
         nid = msg["node_id"]
-        with lock:
-            if nid in nodes:
-                nodes[nid]["last_heartbeat"] = time.time()
-                nodes[nid]["alive"] = True
-        send_json(conn, {"status": "ok"})
-        conn.close()
+        now = time.time()
+        with metrics.locked(lock):
+            info = nodes.get(nid)
+            if info is not None:
+                elapsed = now - info.last_heartbeat
+                bytes_in, bytes_out = msg.get("bytes_in", 0), msg.get("bytes_out", 0)
+                if elapsed > 0 and bytes_in >= info.bytes_in:
+                    info.in_rate = (bytes_in - info.bytes_in) / elapsed
+                if elapsed > 0 and bytes_out >= info.bytes_out:
+                    info.out_rate = (bytes_out - info.bytes_out) / elapsed
+                info.bytes_in, info.bytes_out = bytes_in, bytes_out
+                info.last_heartbeat = now
+                if not info.alive:
+                    print(f"[MASTER] Node {nid} is back")
+                info.alive = True
+                info.load = msg.get("load", 0)
+                info.disk = msg.get("disk", {})
+                failed = msg.get("failed_dirs", [])
+                if failed != info.failed_dirs:
+                    print(f"[MASTER] Node {nid} reports failed storage directories: {failed} "
+                          f"(of {msg.get('dirs', '?')})")
+                info.failed_dirs = failed
+                info.domain_socket = msg.get("domain_socket")
+                info.socket_uid = msg.get("socket_uid")
+                if "fast_files" in msg:  # only sent when it changed
+                    info.fast_files = set(msg["fast_files"])
+                # replicas the node deleted since its last heartbeat; the
+                # reply names the next ones (the same again until acknowledged)
+                if msg.get("deleted"):
+                    deletions.ack(info.addr, msg["deleted"])
+                    replicate({"op": "deleted", "addr": info.addr, "filenames": msg["deleted"]})
+                batch = deletions.batch(info.addr, DELETE_BATCH)
+        if info is None:
+            # e.g. the master restarted; the node will register again
+            send_json(conn, {"status": "unknown", "message": f"Node {nid} is not registered"})
+            return
+        detector.heartbeat(nid, now)
+        resp = {"status": "ok"}
+        if batch:
+            resp["delete"] = batch
+        send_json(conn, resp)
+        return
+
+    if mtype == "INVENTORY":
+        # files a node has held for a while, compared with the metadata:
+        # replicas this master placed there and no longer records (an upload
+        # never finished, a newer version went elsewhere) are deleted like
+        # any other replica; files it never placed there are only counted
+        nid = msg["node_id"]
+        with metrics.locked(lock):
+            info = nodes.get(nid)
+            if info is None:
+                send_json(conn, {"status": "unknown", "message": f"Node {nid} is not registered"})
+                return
+            orphans, unknown = deletions.reclaim(info.addr, msg.get("files", []), file_table, file_locks)
+            if orphans:
+                replicate({"op": "tombstone", "addr": info.addr, "filenames": orphans})
+        if orphans:
+            print(f"[MASTER] Node {nid} holds {len(orphans)} orphaned files; scheduled for deletion")
+        if unknown:
+            print(f"[MASTER] Node {nid} holds {unknown} files this master has no record of; left in place")
+        send_json(conn, {"status": "ok", "orphans": len(orphans), "unknown": unknown})
         return
 
     # ---------- LOCK management (from clients) ----------
     if mtype == "LOCK_REQUEST":
         filename = msg["filename"]
         client_id = msg.get("client_id")
-        with lock:
+        with metrics.locked(lock):
             owner = file_locks.get(filename)
             if owner is None or owner == client_id:
                 # grant lock
                 file_locks[filename] = client_id
+                replicate({"op": "lock", "filename": filename, "client_id": client_id})
                 send_json(conn, {"status": "ok", "message": "Lock granted"})
             else:
                 send_json(conn, {
                     "status": "locked",
                     "message": f"File '{filename}' is currently locked by another client."
                 })
-        conn.close()
         return
 
     if mtype == "LOCK_RELEASE":
         filename = msg["filename"]
         client_id = msg.get("client_id")
-        with lock:
+        with metrics.locked(lock):
             owner = file_locks.get(filename)
             if owner == client_id:
                 del file_locks[filename]
+                replicate({"op": "unlock", "filename": filename})
         send_json(conn, {"status": "ok"})
-        conn.close()
         return
 
+    if mtype == "STATS":
+        send_json(conn, {"status": "ok", "metrics": metrics.snapshot()})
+        return
+
+    if mtype == "TRACE_DUMP":
+        send_json(conn, {"status": "ok", "spans": dfs_tracing.dump(msg.get("trace_id"))})
+        return
+
+    if mtype == "TRACE_REPORT":
+        # client-side spans of a finished trace, kept here for TRACE_DUMP
+        dfs_tracing.record(msg.get("spans", []))
+        send_json(conn, {"status": "ok"})
+        return
+
+    if mtype == "SUBSCRIBE_STATUS":
+        stream_status(conn)
+        return STREAMING
+
     # ---------- CLIENT side messages ----------
     if mtype == "LIST_FILES":
-        with lock:
-            send_json(conn, {"files": list(file_table.keys())})
+        with metrics.locked(lock):
+            files = list(file_table)
+        # encode and send outside the lock, heartbeats must not wait for slow clients
+        send_json(conn, {"files": files})
 
     elif mtype == "NODES_STATUS":
         resp = []
-        with lock:
+        with metrics.locked(lock):
             for nid, info in nodes.items():
                 resp.append({
                     "id": nid,
-                    "address": info["addr"],
-                    "status": "ALIVE" if info["alive"] else "DEAD"
+                    "address": info.addr,
+                    "status": "ALIVE" if info.alive else "DEAD",
+                    "load": info.load,
+                    "failed_dirs": info.failed_dirs,
                 })
         send_json(conn, {"nodes": resp})
 
     elif mtype == "UPLOAD_REQUEST":
         filename = msg["filename"]
-        with lock:
-            chosen_ids = choose_nodes()
-            chosen_addrs = [nodes[n]["addr"] for n in chosen_ids]
+        with metrics.locked(lock):
+            # a new version goes to the nodes holding the current one, so
+            # they can build it from a delta and no stale copies remain
+            chosen_ids = choose_nodes(prefer=file_table.get(filename, ()))
+            chosen_addrs = [nodes[n].addr for n in chosen_ids]
+            # a deleted earlier version must not take the new one with it
+            if deletions.upload_requested(file_table, filename, chosen_addrs):
+                replicate({"op": "keep", "filename": filename, "nodes": chosen_addrs})
         send_json(conn, {"nodes": chosen_addrs})
 
     elif mtype == "UPLOAD_DONE":
         filename = msg["filename"]
         node_addrs = msg["nodes"]  # list of "host:port"
-        with lock:
-            file_table[filename] = node_addrs
+        with metrics.locked(lock):
+            deletions.record_upload(file_table, filename, node_addrs)
+            replicate({"op": "upload", "filename": filename, "nodes": node_addrs})
         send_json(conn, {"status": "ok"})
 
     elif mtype == "DOWNLOAD_REQUEST":
         filename = msg["filename"]
-        with lock:
+        with metrics.locked(lock):
             if filename not in file_table:
                 send_json(conn, {"status": "error", "message": "File not found"})
-                conn.close()
                 return
-            addr_list = file_table[filename][:]
+            addr_list = file_table[filename]
 
             # Filter only addresses whose nodes are alive (if possible)
-            alive_addrs = []
+            alive = []
+            sockets = {}
+            socket_uids = {}
             for addr_str in addr_list:
-                for nid, info in nodes.items():
-                    if info["addr"] == addr_str and info["alive"]:
-                        alive_addrs.append(addr_str)
-                        break
+                _, info = node_at(addr_str)
+                if info is not None and info.alive:
+                    alive.append((filename not in (info.fast_files or ()), info.load, addr_str))
+                    if info.domain_socket:
+                        sockets[addr_str] = info.domain_socket
+                        socket_uids[addr_str] = info.socket_uid
+
+        # Replicas on a fast tier first, then least loaded; clients still
+        # make the final choice from their own latency measurements.
+        alive.sort(key=lambda item: item[:2])
+        alive_addrs = [addr_str for _, _, addr_str in alive]
+        fast_addrs = [addr_str for slow, _, addr_str in alive if not slow]
 
         if not alive_addrs:
             send_json(conn, {"status": "error", "message": "No alive replicas"})
         else:
-            send_json(conn, {"status": "ok", "nodes": alive_addrs})
+            send_json(conn, {"status": "ok", "nodes": alive_addrs, "fast": fast_addrs,
+                             "sockets": sockets, "socket_uids": socket_uids})
     elif mtype == "FILE_INFO":
         filename = msg["filename"]
-        with lock:
+        with metrics.locked(lock):
             if filename not in file_table:
                 send_json(conn, {"status": "error", "message": "File not found"})
-                conn.close()
                 return
 
-            addr_list = file_table[filename][:]
+            addr_list = file_table[filename]
 
             replicas = []
             for addr_str in addr_list:
-                is_alive = False
-                node_name = None
-
-                for nid, info in nodes.items():
-                    if info["addr"] == addr_str:
-                        node_name = nid
-                        is_alive = info["alive"]
-                        break
-
+                node_name, info = node_at(addr_str)
+                tier = None
+                if info is not None and info.fast_files is not None:
+                    tier = "fast" if filename in info.fast_files else "capacity"
                 replicas.append({
                     "node_id": node_name,
                     "address": addr_str,
-                    "alive": is_alive
+                    "alive": info is not None and info.alive,
+                    "tier": tier,
                 })
 
         send_json(conn, {"status": "ok", "replicas": replicas})
-        conn.close()
         return
 
 
+    elif mtype == "DELETE_REQUEST":
+        # one file ("filename") or a batch of them ("filenames"); the
+        # replicas are deleted in the background (see dfs_deletion)
+        filenames = msg["filenames"] if "filenames" in msg else [msg["filename"]]
+        with metrics.locked(lock):
+            missing = delete_files(filenames)
+        if "filenames" in msg:
+            send_json(conn, {"status": "ok", "deleted": len(filenames) - len(missing), "missing": missing})
+        elif missing:
+            send_json(conn, {"status": "error", "message": "File not found"})
+        else:
+            send_json(conn, {"status": "ok", "message": f"Deleted {msg['filename']}"})
+
     elif mtype == "DELETE_DONE":
-        filename = msg["filename"]
-        with lock:
-            if filename in file_table:
-                del file_table[filename]
+        # older clients, which delete on the alive nodes themselves first;
+        # tombstones still clean up replicas on nodes that were down
+        with metrics.locked(lock):
+            delete_files([msg["filename"]])
         send_json(conn, {"status": "ok"})
 
-    conn.close()
-
 
 def heartbeat_monitor():
+    """
+    Mark nodes DEAD once their phi crosses PHI_THRESHOLD.
+
+    Sleeps until the earliest node deadline and then only examines the
+    nodes that are due, so the cost does not grow with cluster size.
+    """
     while True:
-        time.sleep(2)
-        now = time.time()
+        next_deadline = detector.next_deadline()
+        delay = 1.0 if next_deadline is None else next_deadline - time.time()
+        time.sleep(min(max(delay, 0.01), 1.0))
+        due = detector.due(time.time())
+        if not due:
+            continue
         with lock:
-            for nid in nodes:
-                if now - nodes[nid]["last_heartbeat"] > HEARTBEAT_TIMEOUT:
-                    if nodes[nid]["alive"]:
-                        nodes[nid]["alive"] = False
-                        print(f"[MASTER] Node {nid} is DEAD")
+            for nid in due:
+                info = nodes.get(nid)
+                # skip nodes whose heartbeat raced in after they became due
+                if info is None or nid in detector.deadlines or not info.alive:
+                    continue
+                info.alive = False
+                print(f"[MASTER] Node {nid} is DEAD (silent {time.time() - info.last_heartbeat:.1f}s)")
 
 
 def start_master():
+    global role
     threading.Thread(target=heartbeat_monitor, daemon=True).start()
+    if STANDBY_OF:
+        role = "standby"
+        threading.Thread(target=follow_primary, daemon=True).start()
+    if METRICS_PORT:
+        dfs_metrics.start_http_server(metrics, METRICS_PORT)
+        print(f"[MASTER] Metrics at http://0.0.0.0:{METRICS_PORT}/metrics")
 
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if os.name != "nt":
+        # allow quick restarts; on Windows this flag would allow port stealing
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     server.bind((MASTER_HOST, MASTER_PORT))
     server.listen()
 
-    print(f"[MASTER] Running on {MASTER_HOST}:{MASTER_PORT}")
+    print(f"[MASTER] Running on {MASTER_HOST}:{MASTER_PORT} as {role}")
 
+    threading.Thread(target=shed_overflow, daemon=True).start()
     while True:
         conn, addr = server.accept()
-        threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+        if connection_slots.acquire(blocking=False):
+            threading.Thread(target=serve_connection, args=(conn, addr), daemon=True).start()
+            continue
+        try:
+            overflow.put_nowait((conn, addr))
+        except queue.Full:
+            conn.close()
 
 
 if __name__ == "__main__":
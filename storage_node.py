@@ -1,28 +1,172 @@
 # storage_node.py
+import gzip
+import hashlib
 import socket
 import threading
 import json
 import time
 import os
+import shutil
+import stat
+import struct
 import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import dfs_delta
+import dfs_metrics
+import dfs_tracing
+from dfs_hashring import HashRing, shards_from_env
+from dfs_io_scheduler import IOScheduler
+from dfs_tiering import AccessTracker, plan_moves
+
+MASTER_HOST = os.environ.get("DFS_MASTER_HOST", "127.0.0.1")
+MASTER_PORT = int(os.environ.get("DFS_MASTER_PORT", 5000))
+# Metadata shards; the node registers and heartbeats with every one of them.
+# A "primary|standby" entry is one shard with failover between its masters.
+MASTER_SHARDS = shards_from_env()
+HEARTBEAT_INTERVAL = float(os.environ.get("DFS_HEARTBEAT_INTERVAL", 3))  # seconds
+
+# Optional port for a Prometheus text endpoint at /metrics (off when unset)
+METRICS_PORT = int(os.environ["DFS_METRICS_PORT"]) if os.environ.get("DFS_METRICS_PORT") else None
+
+# Disk operations run at once (0: unlimited), and how waiting ones are shared
+# between foreground reads, foreground writes and background traffic
+IO_WORKERS = int(os.environ.get("DFS_IO_WORKERS", 4))
+IO_WEIGHTS = {"read": 4, "write": 2, "background": 1}
+
+# Per-client disk bandwidth limit in bytes/s (0: unlimited); clients are
+# told apart by the "client_id" in their requests, else by IP address
+CLIENT_BANDWIDTH = float(os.environ.get("DFS_CLIENT_BANDWIDTH", 0))
+
+# Seconds between health probes of the storage directories
+DISK_CHECK_INTERVAL = HEARTBEAT_INTERVAL
+# Seconds between scans adding up the bytes the node stores, reported in
+# heartbeats (free space is looked up for every heartbeat)
+DISK_USAGE_INTERVAL = float(os.environ.get("DFS_DISK_USAGE_INTERVAL", 60))
+
+# New files go to the least busy directory among those with at most this many
+# bytes less free space than the emptiest one
+PLACEMENT_FREE_SLACK = 10 * 1024 ** 3
+
+# Hot/cold tiering, for nodes with a fast-tier (SSD) directory: seconds
+# between tiering passes, half-life of the per-file read counters, the
+# decayed read counts at which a file is promoted to / below which it is
+# demoted from the fast tier, and the fast tier's size (0: 90% of its disk)
+TIER_INTERVAL = float(os.environ.get("DFS_TIER_INTERVAL", 30))
+TIER_HALF_LIFE = float(os.environ.get("DFS_TIER_HALF_LIFE", 3600))
+PROMOTE_SCORE = 4.0
+DEMOTE_SCORE = 1.0
+FAST_TIER_BYTES = int(os.environ.get("DFS_FAST_TIER_BYTES", 0))
+# gzip files demoted to the capacity tier; they are decompressed on their
+# next read
+TIER_COMPRESS = os.environ.get("DFS_TIER_COMPRESS", "0") == "1"
+COMPRESSED_SUFFIX = ".dfsz"
+# Files being moved between tiers, and the saved read counters
+MOVE_SUFFIX = ".dfsmove"
+ACCESS_FILE = ".dfs_access"
+
+# Unix domain socket for short-circuit reads: clients on the same host get
+# an open file descriptor (OPEN_FILE) and read the file straight from disk.
+# "{port}" is replaced by the node's port and "{uid}" by its user id; empty
+# turns it off. The socket's directory must belong to the node's user and be
+# closed to everyone else (it is created with mode 0700), and only processes
+# of that user or root are served. Needs SO_PEERCRED (Linux).
+DOMAIN_SOCKET = os.environ.get("DFS_DOMAIN_SOCKET",
+                               os.path.join(tempfile.gettempdir(), "dfs-{uid}", "node_{port}.sock"))
+
+# Uploads are written to <name> + PARTIAL_SUFFIX and renamed into place once
+# every byte has arrived, so readers never see a truncated file
+PARTIAL_SUFFIX = ".dfspart"
+# Partial files nobody has written to for this many seconds belong to
+# abandoned uploads and are removed (0 keeps them); checked every
+# PARTIAL_CHECK_INTERVAL seconds
+PARTIAL_EXPIRY = float(os.environ.get("DFS_PARTIAL_EXPIRY", 86400))
+PARTIAL_CHECK_INTERVAL = 3600
+# Delta uploads rebuild a file into <name>.<random hex> + DELTA_SUFFIX, one
+# per upload, so they never share a file with a resumable upload or another
+# delta; they can't be resumed and are removed when the node starts
+DELTA_SUFFIX = ".dfsdelta"
+
+# Connections served at once (TCP and domain socket together), one handler
+# thread each, idle pooled ones included; any more are answered "busy" and
+# closed, and the client tries another replica
+MAX_CONNECTIONS = int(os.environ.get("DFS_NODE_MAX_CONNECTIONS", 1024))
+
+# Range size for BLOCK_CHECKSUMS (clients verify data before resuming)
+CHECKSUM_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Inventory: every INVENTORY_INTERVAL seconds (0: never) the node lists the
+# files it has held for at least INVENTORY_GRACE seconds to the master shard
+# owning them, INVENTORY_BATCH names per message, and deletes those the
+# master placed here and no longer records (orphans)
+INVENTORY_INTERVAL = float(os.environ.get("DFS_INVENTORY_INTERVAL", 600))
+INVENTORY_GRACE = float(os.environ.get("DFS_INVENTORY_GRACE", 3600))
+INVENTORY_BATCH = 10000
+
+# recv_json peeks this many bytes at a time for the end of a header; large
+# headers (snapshots, bulk deletes, inventories) take one peek per chunk
+RECV_PEEK_BYTES = 64 * 1024
+
+# Seconds an upload is remembered, so a delete the master sent before the
+# upload does not remove the new version
+COMMIT_MEMORY = 60
+
+# Every request a node handles; metrics count anything else as UNKNOWN
+MESSAGE_TYPES = {"UPLOAD_FILE", "DOWNLOAD_FILE", "DELETE_FILE", "BLOCK_CHECKSUMS", "GET_SIGNATURES",
+                 "DELTA_UPLOAD", "OPEN_FILE", "STATS", "TRACE_DUMP"}
 
-MASTER_HOST = "127.0.0.1"
-MASTER_PORT = 5000
-HEARTBEAT_INTERVAL = 3  # seconds
 
 def send_json(conn, obj):
-    data = json.dumps(obj).encode()
+    data = json.dumps(obj).encode() + b"\n"
     conn.sendall(data)
+    dfs_metrics.add_bytes_out(len(data))
+
+
+def peer_uid(conn):
+    """User id of the process at the other end of a Unix domain socket."""
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
 
 def recv_json(conn):
-    data = conn.recv(4096).decode()
-    if not data:
-        raise ConnectionError("No data received")
-    return json.loads(data)
+    """Read one newline-terminated JSON header.
+
+    Only the header bytes are consumed, so any file data the peer sent right
+    behind it stays on the socket for the caller to read.
+    """
+    buf = bytearray()
+    while True:
+        peek = conn.recv(RECV_PEEK_BYTES, socket.MSG_PEEK)
+        if not peek:
+            raise ConnectionError("No data received")
+        end = peek.find(b"\n")
+        take = len(peek) if end < 0 else end + 1
+        data = conn.recv(take)
+        buf += data
+        if end >= 0 and len(data) == take:
+            break
+    dfs_metrics.add_bytes_in(len(buf))
+    return json.loads(buf)
+
+def remove_quietly(path):
+    """Remove path if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
-def send_to_master(msg):
+
+def master_addrs():
+    return list(MASTER_SHARDS) or [f"{MASTER_HOST}:{MASTER_PORT}"]
+
+def parse_addr(addr_str):
+    host, port_str = addr_str.split(":")
+    return host, int(port_str)
+
+def send_to_master(msg, addr_str):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((MASTER_HOST, MASTER_PORT))
+        s.connect(parse_addr(addr_str))
         send_json(s, msg)
         try:
             resp = recv_json(s)
@@ -31,155 +175,1033 @@ def send_to_master(msg):
     return resp
 
 class StorageNode:
-    def __init__(self, node_id, host, port, storage_dir):
+    def __init__(self, node_id, host, port, storage_dir, metrics_port=METRICS_PORT, fast_dir=None):
+        """
+        storage_dir is one directory or a list of them, typically one per
+        disk (JBOD). New files go to the least busy healthy directory with
+        plenty of free space; a directory that fails its health probe is
+        taken out of service and reported to the master, and the node keeps
+        serving from the others.
+
+        fast_dir, if given, is a fast-tier directory (SSD) next to them (the
+        capacity tier): files that are read often are moved there in the
+        background and moved back once they cool down (see dfs_tiering).
+        """
         self.node_id = node_id
         self.host = host
         self.port = port
-        self.storage_dir = storage_dir
+        dirs = [storage_dir] if isinstance(storage_dir, str) else storage_dir
+        # normalized, so os.path.dirname() of a stored file maps back to its directory
+        self.capacity_dirs = [os.path.normpath(d) for d in dirs]
+        self.fast_dir = os.path.normpath(fast_dir) if fast_dir else None
+        self.storage_dirs = ([self.fast_dir] if self.fast_dir else []) + self.capacity_dirs
+        self.storage_dir = self.capacity_dirs[0]
+        self.metrics_port = metrics_port
+        self.domain_socket = None  # path, once listening
+        self.failed_dirs = set()
+        self.dirs_lock = threading.Lock()
+        self.placed = 0
+        self.used_bytes = 0  # see scan_used
+
+        # Its active connection count is also reported to the master in
+        # heartbeats so it can steer reads towards less busy replicas.
+        self.metrics = dfs_metrics.Metrics("node", MESSAGE_TYPES)
 
-        os.makedirs(self.storage_dir, exist_ok=True)
+        # One scheduler per directory, so transfers to different disks run
+        # in parallel; client bandwidth limits apply to the node as a whole
+        self.io = {d: IOScheduler(IO_WORKERS, IO_WEIGHTS) for d in self.storage_dirs}
+        self.client_limits = IOScheduler(0, client_rate=CLIENT_BANDWIDTH)
+        self.connection_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+        self.metrics.gauge("io", lambda: {d: sched.stats() for d, sched in self.io.items()})
+        self.metrics.gauge("io_queued", lambda: sum(sched.queued() for sched in self.io.values()))
+        self.metrics.gauge("io_throttled_s", lambda: round(self.client_limits.throttled_s, 3))
+        self.metrics.gauge("failed_dirs", lambda: sorted(self.failed_dirs))
+
+        # Tiering: uploads and deletes of a file wait while it is being
+        # moved; fast_version changes whenever the fast tier's file set does
+        self.access = AccessTracker(TIER_HALF_LIFE)
+        self.tier_cond = threading.Condition()
+        self.moving = set()
+        self.fast_version = 0
+        self.tier_counts = {"promoted": 0, "demoted": 0, "decompressed": 0, "moved_bytes": 0}
+        # filename -> time.monotonic() of its last upload (guarded by tier_cond)
+        self.committed = {}
+        if self.fast_dir:
+            self.metrics.gauge("tiers", self.tier_stats)
+
+        for d in self.storage_dirs:
+            try:
+                os.makedirs(d, exist_ok=True)
+                for name in os.listdir(d):
+                    if name.endswith((MOVE_SUFFIX, DELTA_SUFFIX)):
+                        os.remove(os.path.join(d, name))  # left by an interrupted move or delta
+            except OSError as e:
+                self.mark_failed(d, e)
+        if self.fast_dir:
+            self.access.load(os.path.join(self.storage_dir, ACCESS_FILE))
 
     # ---------- Master communication ----------
 
-    def register_with_master(self):
+    def register_with_master(self, master_addr):
+        """Register with one master; returns its status ("ok", "standby", ...)."""
         addr_str = f"{self.host}:{self.port}"
         msg = {
             "type": "REGISTER_NODE",
             "node_id": self.node_id,
             "addr": addr_str,
         }
-        resp = send_to_master(msg)
-        print(f"[NODE {self.node_id}] Registered with master: {resp}")
+        try:
+            resp = send_to_master(msg, master_addr)
+        except OSError as e:
+            # heartbeats get "unknown" once this master is up and we retry then
+            resp = {"status": "error", "message": str(e)}
+        if resp.get("status") != "standby":
+            print(f"[NODE {self.node_id}] Registered with master {master_addr}: {resp}")
+        return resp.get("status")
+
+    def disk_usage(self):
+        """
+        Bytes stored by this node (as of the last scan_used) and bytes still
+        free on its healthy disks.
+        """
+        free = 0
+        devices = set()
+        for d in self.healthy_dirs():
+            try:
+                # directories on the same filesystem share its free space
+                dev = os.stat(d).st_dev
+                if dev not in devices:
+                    devices.add(dev)
+                    free += shutil.disk_usage(d).free
+            except OSError as e:
+                self.mark_failed(d, e)
+        return {"used": self.used_bytes, "free": free}
+
+    def scan_used(self):
+        """Add up the size of every file in the healthy storage directories."""
+        used = 0
+        for d in self.healthy_dirs():
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file():
+                                used += entry.stat().st_size
+                        except FileNotFoundError:
+                            pass  # e.g. an upload's partial file, renamed as it completed
+            except OSError as e:
+                self.mark_failed(d, e)
+        self.used_bytes = used
 
-    def heartbeat_loop(self):
+    def usage_loop(self):
+        """Rescan the stored bytes every DISK_USAGE_INTERVAL, for all heartbeat threads."""
         while True:
+            self.scan_used()
+            time.sleep(DISK_USAGE_INTERVAL)
+
+    # ---------- Storage directories ----------
+
+    def healthy_dirs(self):
+        with self.dirs_lock:
+            return [d for d in self.storage_dirs if d not in self.failed_dirs]
+
+    def mark_failed(self, directory, error):
+        with self.dirs_lock:
+            if directory in self.failed_dirs:
+                return
+            self.failed_dirs.add(directory)
+        print(f"[NODE {self.node_id}] Storage directory {directory} failed ({error}); "
+              f"files on it are unavailable")
+
+    def check_dirs(self):
+        """Write, read back and remove a probe file in every healthy directory."""
+        for d in self.healthy_dirs():
+            probe = os.path.join(d, ".dfs_probe")
             try:
-                msg = {"type": "HEARTBEAT", "node_id": self.node_id}
-                _ = send_to_master(msg)
+                with open(probe, "wb") as f:
+                    f.write(b"probe")
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(probe, "rb") as f:
+                    if f.read() != b"probe":
+                        raise OSError("probe file read back wrong data")
+                os.remove(probe)
+            except OSError as e:
+                self.mark_failed(d, e)
+
+    def disk_check_loop(self):
+        while True:
+            time.sleep(DISK_CHECK_INTERVAL)
+            self.check_dirs()
+
+    def find(self, filename):
+        """Path of filename in a healthy directory (decompressing it if needed), or None."""
+        for _ in range(3):
+            dirs = self.healthy_dirs()
+            for d in dirs:
+                path = os.path.join(d, filename)
+                if os.path.exists(path):
+                    return path
+            for d in dirs:
+                packed = os.path.join(d, filename + COMPRESSED_SUFFIX)
+                if os.path.exists(packed):
+                    if self.move(filename, packed, d, io_class="read"):
+                        with self.dirs_lock:
+                            self.tier_counts["decompressed"] += 1
+                    break
+            else:
+                return None
+        return None
+
+    def least_busy(self, dirs):
+        """Of dirs, the one with the least disk I/O among those with plenty of free space."""
+        free = {d: shutil.disk_usage(d).free for d in dirs}
+        most = max(free.values())
+        candidates = [d for d in dirs if free[d] >= most - PLACEMENT_FREE_SLACK]
+        with self.dirs_lock:
+            # rotate ties so concurrent uploads spread over equally idle disks
+            self.placed += 1
+            start = self.placed % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        return min(candidates, key=lambda d: self.io[d].busy + self.io[d].queued())
+
+    def place(self, filename):
+        """
+        Directory for a new copy of filename: where it (or its partial
+        upload) already is, else a healthy capacity-tier directory with
+        plenty of free space and the least disk I/O in progress.
+        """
+        dirs = self.healthy_dirs()
+        if not dirs:
+            raise OSError("No healthy storage directory")
+        for d in dirs:
+            for name in (filename, filename + PARTIAL_SUFFIX, filename + COMPRESSED_SUFFIX):
+                if os.path.exists(os.path.join(d, name)):
+                    return d
+        return self.least_busy([d for d in dirs if d != self.fast_dir] or dirs)
+
+    def commit(self, part_path, dest_path):
+        """Rename a finished upload into place and drop any other copy of the file."""
+        filename = os.path.basename(dest_path)
+        with self.tier_cond:
+            self.tier_cond.wait_for(lambda: filename not in self.moving)
+            os.replace(part_path, dest_path)
+            self.committed[filename] = time.monotonic()
+            # e.g. the file was moved to another tier while this upload ran
+            for d in self.healthy_dirs():
+                for stale in (os.path.join(d, filename), os.path.join(d, filename + COMPRESSED_SUFFIX)):
+                    if stale != dest_path and os.path.exists(stale):
+                        os.remove(stale)
+                        if d == self.fast_dir:
+                            self.fast_version += 1
+
+    # ---------- Tiering ----------
+
+    def move(self, filename, src, dst_dir, compress=False, io_class="background"):
+        """
+        Move a stored file (src, gzipped if it ends in COMPRESSED_SUFFIX) to
+        dst_dir, compressing it on the way if asked. Uploads and deletes of
+        the file wait until it is done. Returns False if src went away or
+        the move failed.
+        """
+        dst = os.path.join(dst_dir, filename + (COMPRESSED_SUFFIX if compress else ""))
+        tmp = dst + MOVE_SUFFIX
+        with self.tier_cond:
+            self.tier_cond.wait_for(lambda: filename not in self.moving)
+            if not os.path.exists(src):
+                return False
+            self.moving.add(filename)
+        header = {"background": io_class == "background"}
+        moved = 0
+        try:
+            src_open = gzip.open if src.endswith(COMPRESSED_SUFFIX) else open
+            dst_open = gzip.open if compress else open
+            with src_open(src, "rb") as fin, dst_open(tmp, "wb") as fout:
+                while True:
+                    with self.io_slot(header, io_class, 65536, src):
+                        chunk = fin.read(65536)
+                    if not chunk:
+                        break
+                    with self.io_slot(header, io_class, len(chunk), tmp):
+                        fout.write(chunk)
+                    moved += len(chunk)
+            with self.tier_cond:
+                os.replace(tmp, dst)
+                try:
+                    os.remove(src)
+                except OSError:
+                    os.remove(dst)  # e.g. src is open on Windows; it stays where it was
+                    raise
+                if self.fast_dir in (dst_dir, os.path.dirname(src)):
+                    self.fast_version += 1
+        except OSError as e:
+            print(f"[NODE {self.node_id}] Moving {filename} to {dst_dir} failed: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        finally:
+            with self.tier_cond:
+                self.moving.discard(filename)
+                self.tier_cond.notify_all()
+        with self.dirs_lock:
+            self.tier_counts["moved_bytes"] += moved
+        return True
+
+    def stored_files(self, directory):
+        """(name, size, path) of each stored file in directory, compressed ones under their real name."""
+        files = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                name = entry.name
+                if name.startswith(".dfs_") or name.endswith((PARTIAL_SUFFIX, MOVE_SUFFIX, DELTA_SUFFIX)) \
+                        or not entry.is_file():
+                    continue
+                if name.endswith(COMPRESSED_SUFFIX):
+                    name = name[:-len(COMPRESSED_SUFFIX)]
+                try:
+                    files.append((name, entry.stat().st_size, entry.path))
+                except FileNotFoundError:
+                    pass  # deleted or moved since the directory was listed
+        return files
+
+    def fast_files(self):
+        if not self.fast_dir or self.fast_dir in self.failed_dirs:
+            return []
+        try:
+            return sorted(name for name, _, _ in self.stored_files(self.fast_dir))
+        except OSError:
+            return []
+
+    def rebalance_tiers(self):
+        """One tiering pass: demote cold files from the fast tier, promote hot ones to it."""
+        dirs = self.healthy_dirs()
+        capacity_dirs = [d for d in dirs if d != self.fast_dir]
+        if self.fast_dir not in dirs or not capacity_dirs:
+            return
+        fast, capacity, paths = {}, {}, {}
+        for d in dirs:
+            for name, size, path in self.stored_files(d):
+                (fast if d == self.fast_dir else capacity)[name] = size
+                paths[name] = path
+        if FAST_TIER_BYTES:
+            fast_bytes = FAST_TIER_BYTES
+        else:
+            fast_bytes = int((sum(fast.values()) + shutil.disk_usage(self.fast_dir).free) * 0.9)
+        demote, promote = plan_moves(fast, capacity, self.access.scores(), fast_bytes,
+                                     PROMOTE_SCORE, DEMOTE_SCORE)
+        # demote first to make room
+        for name in demote:
+            if self.move(name, paths[name], self.least_busy(capacity_dirs), compress=TIER_COMPRESS):
+                with self.dirs_lock:
+                    self.tier_counts["demoted"] += 1
+        for name in promote:
+            if self.move(name, paths[name], self.fast_dir):
+                with self.dirs_lock:
+                    self.tier_counts["promoted"] += 1
+        if demote or promote:
+            print(f"[NODE {self.node_id}] Tiering: promoted {len(promote)}, demoted {len(demote)} file(s)")
+        self.access.prune(DEMOTE_SCORE / 100)
+        self.access.save(os.path.join(self.storage_dir, ACCESS_FILE))
+
+    def tier_loop(self):
+        while True:
+            time.sleep(TIER_INTERVAL)
+            try:
+                self.rebalance_tiers()
+            except OSError as e:
+                print(f"[NODE {self.node_id}] Tiering pass failed: {e}")
+
+    def tier_stats(self):
+        fast = self.fast_files()
+        with self.dirs_lock:
+            return dict(self.tier_counts, fast_files=len(fast), tracked_files=len(self.access))
+
+    def heartbeat_loop(self, group):
+        """
+        Send heartbeats (with load and disk stats) to one master shard over
+        one persistent connection, reconnecting when it breaks. If the shard
+        has standbys ("primary|standby"), move to the next master whenever
+        the current one is unreachable or answers "standby".
+        """
+        masters = group.split("|")
+        current = 0
+        # fast_version the current master last got fast_files for
+        sent_version = None
+        # deletes done since the last heartbeat the master answered
+        acks = []
+        for i, master_addr in enumerate(masters):
+            if self.register_with_master(master_addr) == "ok":
+                current = i
+                break
+        sock = None
+        while True:
+            master_addr = masters[current]
+            try:
+                if sock is None:
+                    sock = socket.create_connection(parse_addr(master_addr),
+                                                    timeout=max(HEARTBEAT_INTERVAL * 2, 5))
+                msg = {
+                    "type": "HEARTBEAT",
+                    "node_id": self.node_id,
+                    "keepalive": True,
+                    "load": self.metrics.active,
+                    "disk": self.disk_usage(),
+                    "dirs": len(self.storage_dirs),
+                    "failed_dirs": sorted(self.failed_dirs),
+                    "domain_socket": self.domain_socket,
+                    "socket_uid": os.geteuid() if self.domain_socket else None,
+                    "bytes_in": self.metrics.bytes_in,
+                    "bytes_out": self.metrics.bytes_out,
+                }
+                version = self.fast_version
+                if self.fast_dir and version != sent_version:
+                    # only when it changed, so the master can prefer fast-tier replicas
+                    msg["fast_files"] = self.fast_files()
+                if acks:
+                    msg["deleted"] = acks
+                sent_at = time.monotonic()
+                send_json(sock, msg)
+                resp = recv_json(sock)
+                if resp.get("status") == "standby":
+                    raise ConnectionError("master is a standby")
+                if resp.get("status") == "busy":
+                    # overloaded master; the heartbeat was not recorded, so resend it soon
+                    time.sleep(resp.get("retry_after", 0.1))
+                    continue
+                if resp.get("status") == "unknown":
+                    # master restarted and lost us; register again
+                    self.register_with_master(master_addr)
+                    sent_version = None
+                else:
+                    sent_version = version
+                    acks = self.delete_batch(resp.get("delete", []), sent_at)
             except Exception as e:
-                print(f"[NODE {self.node_id}] Heartbeat failed: {e}")
+                sent_version = None
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                if len(masters) > 1:
+                    current = (current + 1) % len(masters)
+                    print(f"[NODE {self.node_id}] Heartbeat to {master_addr} failed ({e}), "
+                          f"trying {masters[current]}")
+                    time.sleep(min(HEARTBEAT_INTERVAL, 0.5))
+                    continue
+                print(f"[NODE {self.node_id}] Heartbeat to {master_addr} failed: {e}")
             time.sleep(HEARTBEAT_INTERVAL)
 
+    def delete_batch(self, filenames, since):
+        """
+        Delete files a master listed in its reply to a heartbeat sent at since
+        (time.monotonic()). Returns the names to acknowledge in the next one:
+        those deleted or not here, and those uploaded again after since (the
+        master has cancelled their delete by then).
+        """
+        done = []
+        deleted = 0
+        for filename in filenames:
+            with self.tier_cond:
+                uploaded = self.committed.get(filename, float("-inf"))
+            if uploaded < since and filename == os.path.basename(filename):
+                try:
+                    result = self.delete_local(filename, partial=False, wait=False)
+                except OSError as e:
+                    print(f"[NODE {self.node_id}] Could not delete {filename}: {e}")
+                    continue
+                if result is None:
+                    continue  # being moved between tiers; it comes again next heartbeat
+                deleted += result
+            done.append(filename)
+        with self.tier_cond:
+            old = time.monotonic() - COMMIT_MEMORY
+            for filename in [f for f, t in self.committed.items() if t < old]:
+                del self.committed[filename]
+        if deleted:
+            print(f"[NODE {self.node_id}] Deleted {deleted} files for the master")
+        return done
+
+    def expire_partials(self):
+        """Remove partial files older than PARTIAL_EXPIRY. Returns how many were removed."""
+        cutoff = time.time() - PARTIAL_EXPIRY
+        removed = 0
+        for d in self.healthy_dirs():
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if not entry.name.endswith(PARTIAL_SUFFIX):
+                            continue
+                        try:
+                            if entry.stat().st_mtime < cutoff:
+                                os.remove(entry.path)
+                                removed += 1
+                        except FileNotFoundError:
+                            pass  # committed or resumed and finished meanwhile
+            except OSError as e:
+                self.mark_failed(d, e)
+        return removed
+
+    def partial_expiry_loop(self):
+        while True:
+            time.sleep(PARTIAL_CHECK_INTERVAL)
+            removed = self.expire_partials()
+            if removed:
+                print(f"[NODE {self.node_id}] Removed {removed} abandoned partial uploads")
+
+    def inventory_loop(self):
+        while True:
+            time.sleep(INVENTORY_INTERVAL)
+            try:
+                self.send_inventory()
+            except Exception as e:
+                print(f"[NODE {self.node_id}] Inventory failed: {e}")
+
+    def send_inventory(self):
+        """
+        List the files held for at least INVENTORY_GRACE seconds to the
+        master shards owning them; the master schedules those it placed here
+        and no longer records for deletion (delivered with heartbeats).
+        Returns the number of such orphans.
+        """
+        ring = HashRing(master_addrs())
+        cutoff = time.time() - INVENTORY_GRACE
+        by_shard = {}
+        for d in self.healthy_dirs():
+            try:
+                for name, _, path in self.stored_files(d):
+                    try:
+                        if os.stat(path).st_mtime > cutoff:
+                            continue  # e.g. its upload is not registered yet
+                    except FileNotFoundError:
+                        continue
+                    by_shard.setdefault(ring.shard_for(name), []).append(name)
+            except OSError as e:
+                self.mark_failed(d, e)
+        orphans = unknown = 0
+        for group, names in by_shard.items():
+            for i in range(0, len(names), INVENTORY_BATCH):
+                msg = {"type": "INVENTORY", "node_id": self.node_id, "files": names[i:i + INVENTORY_BATCH]}
+                resp = {"status": "unreachable"}
+                for master_addr in group.split("|"):
+                    try:
+                        resp = send_to_master(msg, master_addr)
+                    except OSError:
+                        continue
+                    if resp.get("status") != "standby":
+                        break
+                if resp.get("status") != "ok":
+                    raise ConnectionError(f"master shard {group} answered {resp}")
+                orphans += resp.get("orphans", 0)
+                unknown += resp.get("unknown", 0)
+        if orphans:
+            print(f"[NODE {self.node_id}] Inventory: {orphans} orphaned files scheduled for deletion")
+        if unknown:
+            print(f"[NODE {self.node_id}] Inventory: {unknown} files unknown to the master, kept")
+        return orphans
+
     # ---------- File operations ----------
 
+    @contextmanager
+    def io_slot(self, header, default_class, nbytes, path):
+        """I/O slot on path's disk for one disk operation of a request (see dfs_io_scheduler)."""
+        io_class = "background" if header.get("background") else default_class
+        start = time.perf_counter()
+        with self.client_limits.slot(io_class, nbytes, header.get("client_id")):
+            with self.io[os.path.dirname(path)].slot(io_class, nbytes):
+                dfs_tracing.add("io_wait_ms", (time.perf_counter() - start) * 1000)
+                yield
+
+    def read_blocks(self, header, path, block_size, length=None):
+        """Yield path in blocks of block_size (up to length bytes), one I/O slot per block."""
+        with open(path, "rb") as f:
+            pos = 0
+            while length is None or pos < length:
+                want = block_size if length is None else min(block_size, length - pos)
+                with self.io_slot(header, "read", want, path):
+                    data = f.read(want)
+                if not data:
+                    break
+                pos += len(data)
+                yield data
+
     def handle_upload(self, conn, header):
+        """
+        Receive a file into a partial file and commit it by renaming.
+
+        With "offset" the client continues an interrupted upload: the
+        partial file is cut back to offset (which must not be past its end)
+        and the rest is appended. An incomplete upload leaves the partial
+        file behind for the next attempt.
+        """
         filename = os.path.basename(header["filename"])
-        dest_path = os.path.join(self.storage_dir, filename)
+        try:
+            dest_path = os.path.join(self.place(filename), filename)
+        except OSError as e:
+            send_json(conn, {"status": "error", "message": str(e)})
+            return
+        part_path = dest_path + PARTIAL_SUFFIX
+
+        filesize = header.get("size")
+        offset = int(header.get("offset", 0))
+        have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset < 0 or offset > have or (filesize is not None and offset > filesize):
+            send_json(conn, {"status": "error",
+                             "message": f"Cannot resume at {offset}, {have} bytes stored"})
+            return
 
         # Acknowledge header so client can start sending file
-        send_json(conn, {"status": "ready"})
+        send_json(conn, {"status": "ready", "offset": offset})
 
         # Receive file bytes until we've read 'size' bytes
-        filesize = header.get("size")
-        if filesize is None:
-            # fallback: read until connection closes (not ideal but okay)
-            with open(dest_path, "wb") as f:
+        received = 0
+        with open(part_path, "r+b" if offset else "wb") as f:
+            f.seek(offset)
+            f.truncate()
+            if filesize is None:
+                # fallback: read until connection closes (not ideal but okay)
                 while True:
-                    chunk = conn.recv(4096)
+                    chunk = conn.recv(65536)
                     if not chunk:
                         break
-                    f.write(chunk)
-        else:
-            remaining = filesize
-            with open(dest_path, "wb") as f:
+                    with self.io_slot(header, "write", len(chunk), part_path):
+                        f.write(chunk)
+                    received += len(chunk)
+                filesize = offset + received
+            else:
+                remaining = filesize - offset
                 while remaining > 0:
-                    chunk = conn.recv(min(4096, remaining))
+                    chunk = conn.recv(min(65536, remaining))
                     if not chunk:
                         break
-                    f.write(chunk)
+                    with self.io_slot(header, "write", len(chunk), part_path):
+                        f.write(chunk)
                     remaining -= len(chunk)
+                    received += len(chunk)
+        dfs_metrics.add_bytes_in(received)
+
+        if offset + received < filesize:
+            print(f"[NODE {self.node_id}] Upload of {filename} interrupted at "
+                  f"{offset + received}/{filesize} bytes; partial file kept")
+            return
+        self.commit(part_path, dest_path)
+        send_json(conn, {"status": "ok", "size": filesize})
 
         print(f"[NODE {self.node_id}] Stored file {filename} at {dest_path}")
 
+    def handle_checksums(self, conn, header):
+        """
+        BLOCK_CHECKSUMS: SHA-256 of each CHECKSUM_BLOCK_SIZE range of a file
+        (the partial upload if "partial" is set), up to "length" bytes.
+        Clients compare them with their own copy to find how much of an
+        interrupted transfer can be kept.
+        """
+        filename = os.path.basename(header["filename"])
+        path = self.find(filename + PARTIAL_SUFFIX if header.get("partial") else filename)
+        if path is None:
+            send_json(conn, {"status": "ok", "size": 0, "length": 0,
+                             "block_size": CHECKSUM_BLOCK_SIZE, "blocks": []})
+            return
+        size = os.path.getsize(path)
+        length = min(size, int(header.get("length", size)))
+        blocks = [hashlib.sha256(data).hexdigest()
+                  for data in self.read_blocks(header, path, CHECKSUM_BLOCK_SIZE, length)]
+        send_json(conn, {"status": "ok", "size": size, "length": length,
+                         "block_size": CHECKSUM_BLOCK_SIZE, "blocks": blocks})
+
+    def handle_signatures(self, conn, header):
+        """GET_SIGNATURES: rolling/strong checksums per block of the stored file (see dfs_delta)."""
+        filename = os.path.basename(header["filename"])
+        path = self.find(filename)
+        block_size = int(header.get("block_size", dfs_delta.DELTA_BLOCK_SIZE))
+        if path is None:
+            send_json(conn, {"status": "error", "message": "File not found"})
+            return
+        if block_size <= 0:
+            send_json(conn, {"status": "error", "message": f"Invalid block size {block_size}"})
+            return
+        size = os.path.getsize(path)
+        signatures = dfs_delta.block_signatures(self.read_blocks(header, path, block_size))
+        send_json(conn, {"status": "ok", "size": size, "block_size": block_size,
+                         "signatures": signatures})
+
+    def handle_delta_upload(self, conn, header):
+        """
+        DELTA_UPLOAD: build a new version of a stored file from blocks of the
+        current one plus literal data, then swap it in like a normal upload.
+
+        After the "ready" reply the client sends one JSON instruction per
+        line: {"op": "copy", "block": i, "count": n} copies n blocks of the
+        current file starting at block i, {"op": "data", "length": n} is
+        followed by n raw bytes, and {"op": "end"} finishes. The result must
+        have the "size" and "sha256" given in the header, otherwise it is
+        discarded and the current file stays as it was.
+        """
+        filename = os.path.basename(header["filename"])
+        dest_path = self.find(filename)
+        block_size = int(header["block_size"])
+        filesize = int(header["size"])
+
+        if dest_path is None:
+            send_json(conn, {"status": "error", "message": "File not found"})
+            return
+        # rebuilt next to the current version, on the same disk
+        part_path = f"{dest_path}.{uuid.uuid4().hex}{DELTA_SUFFIX}"
+        send_json(conn, {"status": "ready"})
+
+        digest = hashlib.sha256()
+        received = 0
+        written = 0
+        try:
+            with open(dest_path, "rb") as base, open(part_path, "wb") as out:
+                while True:
+                    op = recv_json(conn)
+                    kind = op.get("op")
+                    if kind == "end":
+                        break
+                    if kind == "copy":
+                        base.seek(int(op["block"]) * block_size)
+                        remaining = int(op["count"]) * block_size
+                        while remaining > 0:
+                            with self.io_slot(header, "write", min(65536, remaining), dest_path):
+                                chunk = base.read(min(65536, remaining))
+                                out.write(chunk)
+                            if not chunk:
+                                break
+                            digest.update(chunk)
+                            written += len(chunk)
+                            remaining -= len(chunk)
+                    elif kind == "data":
+                        remaining = int(op["length"])
+                        while remaining > 0:
+                            chunk = conn.recv(min(65536, remaining))
+                            if not chunk:
+                                raise ConnectionError("Connection closed mid-delta")
+                            with self.io_slot(header, "write", len(chunk), dest_path):
+                                out.write(chunk)
+                            digest.update(chunk)
+                            received += len(chunk)
+                            written += len(chunk)
+                            remaining -= len(chunk)
+                    else:
+                        raise ValueError(f"Unknown delta op {kind!r}")
+        except Exception as e:
+            print(f"[NODE {self.node_id}] Delta upload of {filename} failed: {e}")
+            remove_quietly(part_path)
+            raise  # the connection is mid-message; drop it
+        finally:
+            dfs_metrics.add_bytes_in(received)
+
+        if written != filesize or digest.hexdigest() != header.get("sha256"):
+            remove_quietly(part_path)
+            send_json(conn, {"status": "error",
+                             "message": f"Rebuilt {filename} does not match (size {written}/{filesize})"})
+            return
+        try:
+            self.commit(part_path, dest_path)
+        except OSError:
+            remove_quietly(part_path)
+            raise
+        send_json(conn, {"status": "ok", "size": filesize})
+
+        print(f"[NODE {self.node_id}] Stored file {filename} from delta "
+              f"({received} of {filesize} bytes sent)")
+
     def handle_download(self, conn, header):
         filename = os.path.basename(header["filename"])
-        src_path = os.path.join(self.storage_dir, filename)
+        src_path = self.find(filename)
 
-        if not os.path.exists(src_path):
+        if src_path is None:
             send_json(conn, {"status": "error", "message": "File not found"})
             return
 
         filesize = os.path.getsize(src_path)
+        # Clients resuming a transfer (e.g. after failing over from another
+        # replica) ask for the file starting at a byte offset; random-access
+        # readers (DFSFile) also give the number of bytes they want.
+        offset = min(max(int(header.get("offset", 0)), 0), filesize)
+        length = filesize - offset
+        if header.get("length") is not None:
+            length = min(max(int(header["length"]), 0), length)
+
+        if self.fast_dir and offset == 0:
+            # reads continuing at an offset belong to one already counted
+            self.access.record(filename)
+
         # Send header with file size
-        send_json(conn, {"status": "ok", "size": filesize})
+        send_json(conn, {"status": "ok", "size": filesize, "offset": offset, "length": length})
 
         # Send file bytes
-        with open(src_path, "rb") as f:
-            while True:
-                chunk = f.read(4096)
-                if not chunk:
-                    break
-                conn.sendall(chunk)
+        sent = 0
+        try:
+            with open(src_path, "rb") as f:
+                f.seek(offset)
+                while sent < length:
+                    with self.io_slot(header, "read", min(65536, length - sent), src_path):
+                        chunk = f.read(min(65536, length - sent))
+                    if not chunk:
+                        break
+                    conn.sendall(chunk)
+                    sent += len(chunk)
+        finally:
+            dfs_metrics.add_bytes_out(sent)
+
+        if header.get("length") is None:  # ranged reads are too frequent to log
+            print(f"[NODE {self.node_id}] Sent file {filename} (size {filesize} bytes)")
 
-        print(f"[NODE {self.node_id}] Sent file {filename} (size {filesize} bytes)")
+    def delete_local(self, filename, partial=True, wait=True):
+        """
+        Remove every copy of filename (and its unfinished upload, if partial).
+        Returns whether there was a copy, or None without waiting if the file
+        is being moved between tiers.
+        """
+        deleted = False
+        with self.tier_cond:
+            if filename in self.moving and not wait:
+                return None
+            self.tier_cond.wait_for(lambda: filename not in self.moving)
+            for d in self.healthy_dirs():
+                path = os.path.join(d, filename)
+                if partial and os.path.exists(path + PARTIAL_SUFFIX):
+                    os.remove(path + PARTIAL_SUFFIX)
+                for name in (path, path + COMPRESSED_SUFFIX):
+                    if os.path.exists(name):
+                        os.remove(name)
+                        deleted = True
+                        if d == self.fast_dir:
+                            self.fast_version += 1
+        self.access.forget(filename)
+        return deleted
 
     def handle_delete(self, conn, header):
         filename = os.path.basename(header["filename"])
-        path = os.path.join(self.storage_dir, filename)
-
-        if os.path.exists(path):
-            os.remove(path)
+        if self.delete_local(filename):
             send_json(conn, {"status": "ok", "message": "Deleted"})
             print(f"[NODE {self.node_id}] Deleted file {filename}")
         else:
             send_json(conn, {"status": "error", "message": "File not found"})
 
+    def handle_open(self, conn, header):
+        """
+        OPEN_FILE (Unix domain socket only): send the client an open,
+        read-only file descriptor for a stored file along with the reply, so
+        it reads the file itself instead of having it copied through a
+        socket. The reply carries the node's address for the client to check
+        it reached the replica it meant.
+
+        The client then reads without the I/O scheduler, so the open takes an
+        I/O slot charged with the whole file: it waits its turn like any
+        read, and its bytes count against the read class's fair share. While
+        requests are queued for the disk the node declines, and the client
+        reads through TCP, one slot per block. Nodes with per-client
+        bandwidth limits always decline.
+        """
+        filename = os.path.basename(header["filename"])
+        if CLIENT_BANDWIDTH:
+            send_json(conn, {"status": "error", "message": "Short-circuit reads are off (bandwidth limits)"})
+            return
+        path = self.find(filename)
+        if path is None:
+            send_json(conn, {"status": "error", "message": "File not found"})
+            return
+        if self.io[os.path.dirname(path)].queued():
+            send_json(conn, {"status": "error", "message": "Disk busy"})
+            return
+        if self.fast_dir:
+            self.access.record(filename)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            with self.io_slot(header, "read", size, path):
+                reply = {"status": "ok", "size": size, "addr": f"{self.host}:{self.port}"}
+                socket.send_fds(conn, [json.dumps(reply).encode() + b"\n"], [f.fileno()])
+
+    # ---------- Monitoring ----------
+
+    def handle_stats(self, conn, header):
+        send_json(conn, {"status": "ok", "node_id": self.node_id, "metrics": self.metrics.snapshot()})
+
     # ---------- Server loop ----------
 
-    def handle_connection(self, conn, addr):
+    def handle_connection(self, conn, addr, local=False):
+        """
+        Serve one connection. A request whose header sets "keepalive" (pooled
+        clients) may be followed by further requests on the same connection.
+        local is set for connections on the Unix domain socket.
+        """
         try:
-            header = recv_json(conn)
-            mtype = header.get("type")
-
-            if mtype == "UPLOAD_FILE":
-                self.handle_upload(conn, header)
-            elif mtype == "DOWNLOAD_FILE":
-                self.handle_download(conn, header)
-            elif mtype == "DELETE_FILE":
-                self.handle_delete(conn, header)
-            else:
-                print(f"[NODE {self.node_id}] Unknown message type from client: {mtype}")
+            while True:
+                # wait for the next request before counting the connection
+                # as active, so idle pooled connections don't look like load
+                try:
+                    if not conn.recv(1, socket.MSG_PEEK):
+                        return
+                except OSError:
+                    return
+                req = self.metrics.begin()
+                try:
+                    header = recv_json(conn)
+                    # clients without an id share their IP's bandwidth limit
+                    header.setdefault("client_id", addr[0])
+                    mtype = header.get("type")
+                    dfs_metrics.set_type(mtype)
+
+                    with dfs_tracing.server_span(header, mtype, f"node:{self.node_id}") as span:
+                        if mtype == "UPLOAD_FILE":
+                            self.handle_upload(conn, header)
+                        elif mtype == "DOWNLOAD_FILE":
+                            self.handle_download(conn, header)
+                        elif mtype == "DELETE_FILE":
+                            self.handle_delete(conn, header)
+                        elif mtype == "BLOCK_CHECKSUMS":
+                            self.handle_checksums(conn, header)
+                        elif mtype == "GET_SIGNATURES":
+                            self.handle_signatures(conn, header)
+                        elif mtype == "DELTA_UPLOAD":
+                            self.handle_delta_upload(conn, header)
+                        elif mtype == "OPEN_FILE" and local:
+                            self.handle_open(conn, header)
+                        elif mtype == "STATS":
+                            self.handle_stats(conn, header)
+                        elif mtype == "TRACE_DUMP":
+                            send_json(conn, {"status": "ok", "spans": dfs_tracing.dump(header.get("trace_id"))})
+                        else:
+                            print(f"[NODE {self.node_id}] Unknown message type from client: {mtype}")
+                            return
+                        if span is not None:
+                            span.set(bytes_in=req.bytes_in, bytes_out=req.bytes_out)
+                    if not header.get("keepalive"):
+                        return
+                finally:
+                    self.metrics.end(req)
         except Exception as e:
             print(f"[NODE {self.node_id}] Error handling connection from {addr}: {e}")
+            if isinstance(e, OSError) and not isinstance(e, (ConnectionError, socket.timeout)):
+                # maybe a failing disk: probe now rather than at the next check
+                self.check_dirs()
         finally:
             conn.close()
 
-    def start_server(self):
-        # Register and start heartbeat thread
-        self.register_with_master()
-        threading.Thread(target=self.heartbeat_loop, daemon=True).start()
+    def serve(self, conn, addr, local=False):
+        """Handle conn on a thread of its own, or answer "busy" if MAX_CONNECTIONS are being served."""
+        if not self.connection_slots.acquire(blocking=False):
+            try:
+                conn.settimeout(0.5)
+                send_json(conn, {"status": "busy", "message": f"Node {self.node_id} is serving "
+                                                              f"{MAX_CONNECTIONS} connections"})
+            except OSError:
+                pass
+            conn.close()
+            return
+
+        def run():
+            try:
+                self.handle_connection(conn, addr, local)
+            finally:
+                self.connection_slots.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def start_domain_socket(self, path):
+        """Listen for short-circuit clients on this host at path (see handle_open)."""
+        uid = os.geteuid()
+        try:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            st = os.lstat(directory)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != uid or st.st_mode & 0o077:
+                raise OSError(f"{directory} is not a directory only uid {uid} can use")
+            if os.path.exists(path):
+                os.remove(path)  # left by an earlier run on this port
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            server.listen()
+        except OSError as e:
+            print(f"[NODE {self.node_id}] Short-circuit reads disabled: {e}")
+            return
+        self.domain_socket = path
+        print(f"[NODE {self.node_id}] Short-circuit reads on {path}")
+
+        def accept_loop():
+            while True:
+                conn, _ = server.accept()
+                try:
+                    peer = peer_uid(conn)
+                except OSError:
+                    peer = None
+                if peer not in (uid, 0):
+                    print(f"[NODE {self.node_id}] Refused short-circuit connection from uid {peer}")
+                    conn.close()
+                    continue
+                self.serve(conn, ("local",), local=True)
 
-        # Start TCP server for client uploads/downloads
+        threading.Thread(target=accept_loop, daemon=True).start()
+
+    def start_server(self):
+        # Start TCP server for client uploads/downloads (before registering,
+        # so the master never hands out an address that isn't listening yet)
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if os.name != "nt":
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server.bind((self.host, self.port))
         server.listen()
-        print(f"[NODE {self.node_id}] Listening on {self.host}:{self.port}, storage={self.storage_dir}")
+        print(f"[NODE {self.node_id}] Listening on {self.host}:{self.port}, "
+              f"storage={','.join(self.capacity_dirs)}"
+              + (f", fast tier={self.fast_dir}" if self.fast_dir else ""))
+
+        if self.metrics_port:
+            try:
+                dfs_metrics.start_http_server(self.metrics, self.metrics_port)
+                print(f"[NODE {self.node_id}] Metrics at http://0.0.0.0:{self.metrics_port}/metrics")
+            except OSError as e:
+                print(f"[NODE {self.node_id}] Metrics endpoint disabled: {e}")
+
+        if DOMAIN_SOCKET and hasattr(socket, "AF_UNIX") and hasattr(socket, "send_fds") \
+                and hasattr(socket, "SO_PEERCRED"):
+            self.start_domain_socket(DOMAIN_SOCKET.format(port=self.port, uid=os.geteuid()))
+
+        threading.Thread(target=self.disk_check_loop, daemon=True).start()
+        threading.Thread(target=self.usage_loop, daemon=True).start()
+        if self.fast_dir:
+            threading.Thread(target=self.tier_loop, daemon=True).start()
+        if INVENTORY_INTERVAL:
+            threading.Thread(target=self.inventory_loop, daemon=True).start()
+        if PARTIAL_EXPIRY:
+            threading.Thread(target=self.partial_expiry_loop, daemon=True).start()
+
+        # Register with every master shard and start one heartbeat thread each
+        for group in master_addrs():
+            threading.Thread(target=self.heartbeat_loop, args=(group,), daemon=True).start()
 
         while True:
             conn, addr = server.accept()
-            threading.Thread(target=self.handle_connection, args=(conn, addr), daemon=True).start()
+            # replies are a small header followed by data; without this the
+            # data waits for the client's delayed ACK of the header (~40 ms)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.serve(conn, addr)
 
 
 if __name__ == "__main__":
     """
     Usage:
-        python storage_node.py <node_id> <port>
+        python storage_node.py <node_id> <port> [storage_dir[,storage_dir...]] [fast_dir]
 
     Example:
         python storage_node.py node1 6001
-        python storage_node.py node2 6002
+        python storage_node.py node2 6002 /data/dfs/node2
+        python storage_node.py node3 6003 /mnt/disk1/dfs,/mnt/disk2/dfs,/mnt/disk3/dfs
+        python storage_node.py node4 6004 /mnt/disk1/dfs /mnt/ssd/dfs
     """
     if len(sys.argv) < 3:
-        print("Usage: python storage_node.py <node_id> <port>")
+        print("Usage: python storage_node.py <node_id> <port> [storage_dir[,storage_dir...]] [fast_dir]")
         sys.exit(1)
 
     node_id = sys.argv[1]
     port = int(sys.argv[2])
+    storage_dir = sys.argv[3].split(",") if len(sys.argv) > 3 else f"storage_{node_id}"
+    fast_dir = sys.argv[4] if len(sys.argv) > 4 else None
 
     node = StorageNode(
         node_id=node_id,
         host="127.0.0.1",
         port=port,
-        storage_dir=f"storage_{node_id}",
+        storage_dir=storage_dir,
+        fast_dir=fast_dir,
     )
     node.start_server()
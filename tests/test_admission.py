@@ -0,0 +1,121 @@
+import threading
+import time
+
+from dfs_admission import AdmissionController
+
+
+def hold(admission, cls):
+    """Take a slot and keep it until the returned release() is called."""
+    ctx = admission.slot(cls)
+    assert ctx.__enter__() is None
+    return lambda: ctx.__exit__(None, None, None)
+
+
+def queue_up(admission, cls, order, done=None):
+    """
+    Wait for a slot of cls in a thread; appends cls to order once admitted
+    and keeps the slot until done (an Event) is set, if given.
+    """
+    def run():
+        with admission.slot(cls) as retry_after:
+            assert retry_after is None
+            order.append(cls)
+            if done is not None:
+                done.wait(5)
+
+    before = admission.stats()["queued"][cls]
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while admission.stats()["queued"][cls] == before:
+        assert time.time() < deadline, f"{cls} request never queued"
+        time.sleep(0.001)
+    return thread
+
+
+def test_zero_workers_admits_everything():
+    admission = AdmissionController(workers=0)
+    releases = [hold(admission, "client") for _ in range(100)]
+    assert admission.stats()["busy"] == 0
+    for release in releases:
+        release()
+
+
+def test_slots_are_limited_and_handed_on():
+    admission = AdmissionController(workers=2, control_reserve=0, target_delay=10)
+    first = hold(admission, "client")
+    second = hold(admission, "client")
+    order = []
+    waiting = queue_up(admission, "client", order)
+    assert admission.stats()["busy"] == 2
+    first()
+    waiting.join(5)
+    assert order == ["client"]
+    second()
+    assert admission.stats()["busy"] == 0
+
+
+def test_control_requests_use_the_reserve():
+    admission = AdmissionController(workers=1, control_reserve=1, target_delay=10)
+    client = hold(admission, "client")
+    control = hold(admission, "control")
+    assert admission.stats()["busy"] == 2
+    order = []
+    waiting = queue_up(admission, "finish", order)
+    # the reserve slot going free does not admit a non-control request
+    control()
+    assert admission.stats()["queued"]["finish"] == 1
+    client()
+    waiting.join(5)
+    assert order == ["finish"]
+
+
+def test_queued_requests_run_highest_class_first():
+    admission = AdmissionController(workers=1, control_reserve=0, target_delay=10)
+    release = hold(admission, "client")
+    order = []
+    threads = [queue_up(admission, cls, order) for cls in ("client", "finish", "control")]
+    release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["control", "finish", "client"]
+
+
+def test_full_queue_sheds_its_own_class_only():
+    admission = AdmissionController(workers=1, queue_limits={"client": 1}, control_reserve=0, target_delay=10)
+    release = hold(admission, "client")
+    order = []
+    threads = [queue_up(admission, "client", order)]
+    with admission.slot("client") as retry_after:
+        assert retry_after is not None and retry_after > 0
+    threads.append(queue_up(admission, "finish", order))
+    assert admission.stats()["shed"] == {"control": 0, "finish": 0, "client": 1}
+    release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["finish", "client"]
+
+
+def test_standing_queue_sheds_client_but_not_finish_requests():
+    admission = AdmissionController(workers=1, control_reserve=0, target_delay=0.001, interval=0.01)
+    release = hold(admission, "client")
+    order = []
+    done = threading.Event()
+    waiting = queue_up(admission, "client", order, done)
+    time.sleep(0.02)
+    release()
+    while not order:
+        time.sleep(0.001)
+    # that request waited well past target_delay; once interval has gone by, clients are shed
+    time.sleep(0.02)
+    with admission.slot("client") as retry_after:
+        assert retry_after is not None
+    finishing = queue_up(admission, "finish", order)
+    done.set()
+    waiting.join(5)
+    finishing.join(5)
+    assert order == ["client", "finish"]
+    stats = admission.stats()
+    assert stats["shed"]["client"] == 1 and stats["shed"]["finish"] == 0
+    assert stats["admitted"] == {"control": 0, "finish": 1, "client": 2}
+    assert stats["wait"]["client"]["count"] == 2
@@ -0,0 +1,132 @@
+from dfs_deletion import DeletionTracker
+from dfs_metadata import FileTable
+
+A, B, C = "10.0.0.1:9001", "10.0.0.2:9001", "10.0.0.3:9001"
+
+
+def test_delete_tombstones_every_replica():
+    tracker = DeletionTracker()
+    table = FileTable({"a": [A, B], "b": [B]})
+    deleted, missing = tracker.delete(table, ["a", "b", "nope"], now=1)
+    assert deleted == [("a", [A, B]), ("b", [B])]
+    assert missing == ["nope"]
+    assert len(table) == 0
+    assert tracker.batch(A, 10) == ["a"]
+    assert tracker.batch(B, 10) == ["a", "b"]
+    assert tracker.pending_deletes() == 3
+
+
+def test_batches_are_oldest_first_and_repeat_until_acknowledged():
+    tracker = DeletionTracker()
+    tracker.add_tombstones(A, [f"f{i}" for i in range(5)], now=1)
+    assert tracker.batch(A, 2) == ["f0", "f1"]
+    assert tracker.batch(A, 2) == ["f0", "f1"]
+    tracker.ack(A, ["f0", "f1"])
+    assert tracker.batch(A, 2) == ["f2", "f3"]
+
+
+def test_ack_removes_exactly_the_acknowledged_names():
+    tracker = DeletionTracker()
+    tracker.add_tombstones(A, ["a", "b", "c"], now=1)
+    tracker.add_tombstones(B, ["a"], now=1)
+    tracker.ack(A, ["a", "c", "never-tombstoned"])
+    assert tracker.batch(A, 10) == ["b"]
+    assert tracker.batch(B, 10) == ["a"]
+    tracker.ack(A, ["b"])
+    assert A not in tracker.tombstones
+    tracker.ack(C, ["a"])  # nothing pending there
+    assert tracker.pending_deletes() == 1
+
+
+def test_node_down_during_delete_gets_the_tombstone_when_back():
+    tracker = DeletionTracker()
+    table = FileTable({"a": [A, B]})
+    tracker.delete(table, ["a"], now=1)
+    # B heartbeats, deletes and acknowledges; A is down the whole time
+    tracker.ack(B, tracker.batch(B, 10))
+    assert tracker.batch(B, 10) == []
+    # A's tombstone waits for as long as it takes
+    assert tracker.batch(A, 10) == ["a"]
+    tracker.ack(A, ["a"])
+    assert tracker.pending_deletes() == 0
+
+
+def test_reupload_cancels_a_pending_tombstone():
+    tracker = DeletionTracker()
+    table = FileTable({"a": [A, B]})
+    tracker.delete(table, ["a"], now=1)
+    assert tracker.upload_requested(table, "a", [A, C], now=2)
+    assert not tracker.has_tombstone(A, "a")
+    assert tracker.has_tombstone(B, "a")
+    assert not tracker.upload_requested(table, "a", [A, C], now=2)
+    # the upload may go to B after all: UPLOAD_DONE cancels there too
+    tracker.record_upload(table, "a", [B, C], now=3)
+    assert tracker.pending_deletes() == 0
+    assert table["a"] == [B, C]
+
+
+def test_inventory_reclaims_an_interrupted_upload():
+    tracker = DeletionTracker()
+    table = FileTable()
+    tracker.upload_requested(table, "a", [A, B], now=1)
+    # the client wrote "a" to both nodes and died before UPLOAD_DONE
+    assert tracker.reclaim(A, ["a"], table, now=2) == (["a"], 0)
+    assert tracker.batch(A, 10) == ["a"]
+    # reclaimed once; it is a tombstone now, not counted again
+    assert tracker.reclaim(A, ["a"], table, now=3) == ([], 0)
+
+
+def test_inventory_reclaims_replicas_a_new_version_moved_away_from():
+    tracker = DeletionTracker()
+    table = FileTable()
+    tracker.upload_requested(table, "a", [A, B], now=1)
+    tracker.record_upload(table, "a", [A, B], now=1)
+    assert tracker.pending_candidates() == 0
+    tracker.upload_requested(table, "a", [B, C], now=2)
+    tracker.record_upload(table, "a", [B, C], now=2)
+    assert tracker.reclaim(A, ["a"], table, now=3) == (["a"], 0)
+    assert tracker.reclaim(B, ["a"], table, now=3) == ([], 0)
+    assert tracker.reclaim(C, ["a"], table, now=3) == ([], 0)
+
+
+def test_inventory_never_reclaims_a_file_this_master_did_not_place():
+    # e.g. a master restarted without a standby: empty metadata
+    tracker = DeletionTracker()
+    assert tracker.reclaim(A, ["a", "b"], FileTable(), now=1) == ([], 2)
+    # files it knows, but not on this node, and never sent there
+    table = FileTable({"a": [B, C]})
+    tracker.upload_requested(table, "b", [B], now=1)
+    assert tracker.reclaim(A, ["a", "b"], table, now=2) == ([], 2)
+    assert tracker.pending_deletes() == 0
+
+
+def test_inventory_skips_locked_files():
+    tracker = DeletionTracker()
+    table = FileTable()
+    tracker.upload_requested(table, "a", [A], now=1)
+    assert tracker.reclaim(A, ["a"], table, locked={"a": "client"}, now=2) == ([], 1)
+    assert tracker.reclaim(A, ["a"], table, locked={}, now=3) == (["a"], 0)
+
+
+def test_candidates_expire_after_the_ttl():
+    tracker = DeletionTracker(orphan_ttl=100)
+    table = FileTable()
+    tracker.upload_requested(table, "old", [A], now=0)
+    tracker.upload_requested(table, "new", [A], now=50)
+    assert tracker.reclaim(A, ["old", "new"], table, now=120) == (["new"], 1)
+    assert tracker.pending_candidates() == 0
+    tracker.upload_requested(table, "x", [B], now=0)
+    tracker.expire_candidates(B, now=100)
+    assert B not in tracker.candidates
+
+
+def test_upload_done_clears_the_candidates_it_lists():
+    tracker = DeletionTracker()
+    table = FileTable()
+    tracker.upload_requested(table, "a", [A, B], now=1)
+    assert tracker.pending_candidates() == 2
+    # the client only got the file to B: A stays a candidate
+    tracker.record_upload(table, "a", [B], now=2)
+    assert list(tracker.candidates) == [A]
+    assert tracker.reclaim(B, ["a"], table, now=3) == ([], 0)
+    assert tracker.reclaim(A, ["a"], table, now=3) == (["a"], 0)
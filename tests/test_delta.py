@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from dfs_delta import block_signatures, compute_delta, delta_literal_bytes, file_signatures
+
+BLOCK = 64
+
+
+def blocks(data, block_size=BLOCK):
+    return [data[i:i + block_size] for i in range(0, len(data), block_size)]
+
+
+def apply_delta(base, new, ops, block_size=BLOCK):
+    """What a node builds from its copy (base) and the ops; literal data comes from new."""
+    out = bytearray()
+    for kind, start, count in ops:
+        if kind == "copy":
+            out += base[start * block_size:(start + count) * block_size]
+        else:
+            out += new[start:start + count]
+    return bytes(out)
+
+
+def delta(tmp_path, base, new, block_size=BLOCK, give_up_ratio=1.0):
+    path = tmp_path / "new.bin"
+    path.write_bytes(new)
+    sigs = block_signatures(blocks(base, block_size))
+    return compute_delta(str(path), sigs, len(base), block_size=block_size, give_up_ratio=give_up_ratio)
+
+
+def edit(rng, data):
+    """data with a few random inserts, deletes and overwrites."""
+    data = bytearray(data)
+    for _ in range(rng.randint(1, 5)):
+        pos = rng.randint(0, len(data))
+        kind = rng.choice(("insert", "delete", "overwrite"))
+        n = rng.randint(1, 3 * BLOCK)
+        if kind == "insert":
+            data[pos:pos] = rng.randbytes(n)
+        elif kind == "delete":
+            del data[pos:pos + n]
+        else:
+            data[pos:pos + n] = rng.randbytes(min(n, len(data) - pos))
+    return bytes(data)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_edits_round_trip(tmp_path, seed):
+    rng = random.Random(seed)
+    base = rng.randbytes(rng.randint(0, 40 * BLOCK))
+    new = edit(rng, base)
+    ops = delta(tmp_path, base, new)
+    assert ops is not None
+    assert apply_delta(base, new, ops) == new
+
+
+def test_unchanged_file_is_all_copies(tmp_path):
+    base = random.Random(1).randbytes(20 * BLOCK + 17)  # short last block
+    ops = delta(tmp_path, base, base)
+    assert delta_literal_bytes(ops) == 0
+    assert ops == [("copy", 0, 21)]
+
+
+def test_shifted_data_is_found_by_rolling(tmp_path):
+    rng = random.Random(2)
+    base = rng.randbytes(30 * BLOCK)
+    new = b"x" + base[:10 * BLOCK] + b"yz" + base[10 * BLOCK:]
+    ops = delta(tmp_path, base, new)
+    assert apply_delta(base, new, ops) == new
+    assert delta_literal_bytes(ops) == 3
+
+
+def test_tail_block_is_copied_after_an_edit(tmp_path):
+    rng = random.Random(3)
+    base = rng.randbytes(10 * BLOCK + 5)
+    new = base[:BLOCK] + b"changed" + base[BLOCK:]
+    ops = delta(tmp_path, base, new)
+    assert apply_delta(base, new, ops) == new
+    assert ops[-1] == ("copy", 1, 10)  # up to and including the 5-byte tail
+
+
+def test_appended_data_is_literal(tmp_path):
+    rng = random.Random(4)
+    base = rng.randbytes(8 * BLOCK)
+    new = base + rng.randbytes(100)
+    ops = delta(tmp_path, base, new)
+    assert ops == [("copy", 0, 8), ("data", 8 * BLOCK, 100)]
+
+
+def test_gives_up_on_mostly_new_data(tmp_path):
+    rng = random.Random(5)
+    base = rng.randbytes(40 * BLOCK)
+    assert delta(tmp_path, base, rng.randbytes(40 * BLOCK), give_up_ratio=0.5) is None
+
+
+def test_file_signatures_match_block_signatures(tmp_path):
+    data = random.Random(6).randbytes(5 * BLOCK + 9)
+    path = tmp_path / "f.bin"
+    path.write_bytes(data)
+    assert file_signatures(str(path), BLOCK) == block_signatures(blocks(data))
@@ -0,0 +1,191 @@
+import io
+
+import pytest
+
+import dfs_client_lib as dfs
+
+DATA = b"".join(b"line %04d of the test file\n" % i for i in range(200))  # 5400 bytes
+
+
+class FakeNode:
+    """A replica answering ranged DOWNLOAD_FILE requests like storage_node's handle_download."""
+
+    def __init__(self, data):
+        self.data = data
+        self.down = False
+        self.requests = []  # (offset, length)
+
+
+class FakeSocket:
+    def __init__(self, node):
+        self.node = node
+        self.payload = b""
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    """Two replicas of DATA behind fake DOWNLOAD_REQUEST / DOWNLOAD_FILE round trips."""
+    replicas = {"n1:9001": FakeNode(DATA), "n2:9001": FakeNode(DATA)}
+
+    def create_connection(addr, timeout=None):
+        node = replicas[f"{addr[0]}:{addr[1]}"]
+        if node.down:
+            raise ConnectionRefusedError("node down")
+        return FakeSocket(node)
+
+    def send_json(sock, msg):
+        node = sock.node
+        size = len(node.data)
+        offset = min(msg["offset"], size)
+        length = min(msg["length"], size - offset)
+        node.requests.append((msg["offset"], msg["length"]))
+        sock.payload = node.data[offset:offset + length]
+        sock.info = {"status": "ok", "size": size, "offset": offset, "length": length}
+
+    def recv_exact(sock, n):
+        assert n == len(sock.payload)
+        return sock.payload
+
+    monkeypatch.setattr(dfs, "send_to_master",
+                        lambda msg: {"status": "ok", "nodes": list(replicas)})
+    monkeypatch.setattr(dfs, "order_replicas", lambda addrs, preferred=(): list(addrs))
+    monkeypatch.setattr(dfs, "SHORT_CIRCUIT_READS", False)
+    monkeypatch.setattr(dfs.socket, "create_connection", create_connection)
+    monkeypatch.setattr(dfs, "send_json", send_json)
+    monkeypatch.setattr(dfs, "recv_json", lambda sock: sock.info)
+    monkeypatch.setattr(dfs, "_recv_exact", recv_exact)
+    monkeypatch.setattr(dfs, "READAHEAD_MIN", 16)
+    monkeypatch.setattr(dfs, "READAHEAD_MAX", 64)
+    monkeypatch.setattr(dfs, "_replica_stats", {})
+    return replicas
+
+
+def requests(nodes):
+    """Ranges fetched since the last call, from any replica."""
+    fetched = []
+    for node in nodes.values():
+        fetched += node.requests
+        node.requests.clear()
+    return fetched
+
+
+def test_open_learns_the_size(nodes):
+    with dfs.open_file("dir/data.txt") as f:
+        assert f.name == "data.txt"
+        assert f.size == len(DATA)
+        assert f.local is None
+    assert requests(nodes) == [(0, 0)]
+
+
+def test_seek_set_cur_end_and_past_eof(nodes):
+    f = dfs.DFSFile("data.txt")
+    assert f.seek(100) == 100
+    assert f.read(5) == DATA[100:105]
+    assert f.seek(-10, io.SEEK_CUR) == 95
+    assert f.read(10) == DATA[95:105]
+    assert f.seek(-27, io.SEEK_END) == len(DATA) - 27
+    assert f.read(100) == DATA[-27:]
+    assert f.read(10) == b""
+    assert f.seek(len(DATA) + 50) == len(DATA) + 50  # past EOF is allowed
+    assert f.read(10) == b""
+    assert f.read() == b""
+    assert f.tell() == len(DATA) + 50
+    with pytest.raises(ValueError):
+        f.seek(-1)
+    with pytest.raises(ValueError):
+        f.seek(0, 7)
+    f.close()
+
+
+def test_read_all_readinto_and_pread(nodes):
+    f = dfs.DFSFile("data.txt")
+    f.seek(5000)
+    assert f.read(-1) == DATA[5000:]
+    assert f.tell() == len(DATA)
+
+    f.seek(10)
+    buf = bytearray(20)
+    assert f.readinto(buf) == 20
+    assert bytes(buf) == DATA[10:30]
+    assert f.tell() == 30
+
+    assert f.pread(15, 1000) == DATA[1000:1015]
+    assert f.pread(100, len(DATA) - 5) == DATA[-5:]
+    assert f.pread(10, len(DATA) + 1) == b""
+    assert f.tell() == 30  # pread doesn't move the position
+    with pytest.raises(ValueError):
+        f.pread(1, -1)
+    f.close()
+    with pytest.raises(ValueError):
+        f.read(1)
+
+
+def test_sequential_reads_reuse_the_readahead_buffer(nodes):
+    f = dfs.DFSFile("data.txt")
+    requests(nodes)
+    assert f.read(10) == DATA[0:10]
+    assert requests(nodes) == [(0, 10)]  # first read: no read-ahead yet
+    assert f.read(10) == DATA[10:20]
+    assert requests(nodes) == [(10, 10 + 16)]  # sequential: READAHEAD_MIN more
+    assert f.read(10) == DATA[20:30]
+    assert f.read(6) == DATA[30:36]
+    assert requests(nodes) == []  # served from the buffer
+    assert f.read(10) == DATA[36:46]
+    assert requests(nodes) == [(36, 10 + 32)]  # read-ahead doubled
+    f.seek(3000)
+    assert f.read(10) == DATA[3000:3010]
+    assert requests(nodes) == [(3000, 10)]  # a jump resets read-ahead
+    f.close()
+
+
+def test_pread_leaves_the_readahead_buffer_alone(nodes):
+    f = dfs.DFSFile("data.txt")
+    f.read(10)
+    f.read(10)  # buffer now holds [10, 36)
+    requests(nodes)
+    assert f.pread(10, 4000) == DATA[4000:4010]
+    assert requests(nodes) == [(4000, 10)]
+    assert f.read(16) == DATA[20:36]
+    assert requests(nodes) == []
+    assert f.pread(5, 12) == DATA[12:17]  # and uses it when it can
+    assert requests(nodes) == []
+    f.close()
+
+
+def test_works_inside_a_buffered_reader(nodes):
+    raw = dfs.DFSFile("data.txt")
+    with io.BufferedReader(raw, buffer_size=256) as f:
+        assert f.readline() == b"line 0000 of the test file\n"
+        f.seek(27 * 150)
+        assert f.readline() == b"line 0150 of the test file\n"
+        assert f.read(4) == b"line"
+        assert f.tell() == 27 * 151 + 4
+        f.seek(-27, io.SEEK_END)
+        assert f.read() == b"line 0199 of the test file\n"
+    with io.TextIOWrapper(io.BufferedReader(dfs.DFSFile("data.txt"))) as text:
+        assert sum(1 for _ in text) == 200
+    assert raw.closed
+
+
+def test_reads_fail_over_to_the_next_replica(nodes):
+    f = dfs.DFSFile("data.txt")
+    assert f.read(10) == DATA[:10]
+    nodes["n1:9001"].down = True
+    f._disconnect()  # the kept-alive connection broke
+    f.seek(2000)
+    assert f.read(10) == DATA[2000:2010]
+    assert nodes["n2:9001"].requests == [(2000, 10)]
+    nodes["n2:9001"].down = True
+    f._disconnect()
+    with pytest.raises(OSError, match="failed on all replicas"):
+        f.read(10)
+    f.close()
+
+
+def test_missing_file(monkeypatch):
+    monkeypatch.setattr(dfs, "send_to_master", lambda msg: {"status": "error", "message": "File not found"})
+    with pytest.raises(FileNotFoundError, match="File not found"):
+        dfs.open_file("nope")
@@ -0,0 +1,98 @@
+import math
+import random
+
+import pytest
+
+from dfs_failure_detector import HeartbeatScheduler, PhiAccrualDetector
+
+
+def beat(det, start, intervals):
+    now = start
+    for interval in intervals:
+        now += interval
+        det.heartbeat(now)
+    return now
+
+
+def test_fresh_detector_uses_expected_interval():
+    det = PhiAccrualDetector(100.0, 3.0, min_std=0.2)
+    assert det.phi(100.0 + 3.0) < 1
+    assert det.phi(100.0 + 10.0) > 8
+
+
+def test_phi_grows_with_silence():
+    det = PhiAccrualDetector(0.0, 1.0)
+    last = beat(det, 0.0, [1.0] * 50)
+    values = [det.phi(last + dt) for dt in (0.5, 1.0, 1.5, 2.0, 3.0)]
+    assert values == sorted(values)
+
+
+def test_deadline_is_where_phi_reaches_threshold():
+    rng = random.Random(1)
+    det = PhiAccrualDetector(0.0, 1.0, min_std=0.05)
+    last = beat(det, 0.0, [rng.uniform(0.8, 1.2) for _ in range(200)])
+    for threshold in (1.0, 3.0, 8.0):
+        deadline = det.deadline(threshold)
+        assert deadline > last
+        assert det.phi(deadline) == pytest.approx(threshold, rel=1e-3)
+
+
+def test_jittery_node_gets_more_slack():
+    rng = random.Random(2)
+    steady = PhiAccrualDetector(0.0, 1.0, min_std=0.01)
+    jittery = PhiAccrualDetector(0.0, 1.0, min_std=0.01)
+    s_last = beat(steady, 0.0, [1.0 + rng.uniform(-0.01, 0.01) for _ in range(100)])
+    j_last = beat(jittery, 0.0, [1.0 + rng.uniform(-0.5, 0.5) for _ in range(100)])
+    assert jittery.deadline(8.0) - j_last > steady.deadline(8.0) - s_last
+
+
+def test_pause_moves_deadline():
+    plain = PhiAccrualDetector(0.0, 1.0)
+    paused = PhiAccrualDetector(0.0, 1.0, pause=2.0)
+    assert paused.deadline(8.0) == pytest.approx(plain.deadline(8.0) + 2.0)
+
+
+def test_window_keeps_running_sums_in_step():
+    rng = random.Random(3)
+    det = PhiAccrualDetector(0.0, 1.0, window=10)
+    beat(det, 0.0, [rng.uniform(0.1, 5.0) for _ in range(1000)])
+    assert len(det.intervals) == 10
+    assert det.total == pytest.approx(sum(det.intervals))
+    assert det.total_sq == pytest.approx(sum(x * x for x in det.intervals))
+
+
+def test_non_positive_intervals_are_ignored():
+    det = PhiAccrualDetector(5.0, 1.0)
+    det.heartbeat(5.0)
+    det.heartbeat(4.0)
+    assert len(det.intervals) == 2  # only the two seeded ones
+    assert det.last == 4.0
+
+
+def test_scheduler_due_only_returns_expired_nodes():
+    sched = HeartbeatScheduler(1.0, threshold=8.0)
+    sched.heartbeat("a", 0.0)
+    sched.heartbeat("b", 0.0)
+    deadline = sched.next_deadline()
+    assert sched.due(deadline - 0.01) == []
+    # "b" heartbeats again, so only "a" expires at the old deadline
+    sched.heartbeat("b", deadline - 0.01)
+    assert sched.due(deadline) == ["a"]
+    assert sched.due(deadline) == []
+    assert sched.next_deadline() > deadline
+
+
+def test_scheduler_max_silence_caps_deadline():
+    sched = HeartbeatScheduler(1.0, threshold=8.0, pause=100.0, max_silence=5.0)
+    sched.heartbeat("a", 10.0)
+    assert sched.next_deadline() == pytest.approx(15.0)
+    assert sched.due(15.0) == ["a"]
+
+
+def test_scheduler_remove_forgets_node():
+    sched = HeartbeatScheduler(1.0)
+    sched.heartbeat("a", 0.0)
+    sched.remove("a")
+    assert sched.next_deadline() is None
+    assert sched.due(math.inf) == []
+    assert sched.phi("a", 1.0) == float("inf")
@@ -0,0 +1,136 @@
+import pytest
+
+import dfs_client_lib as dfs
+from dfs_hashring import HashRing, parse_shards, shards_from_env
+
+KEYS = [f"file-{i}.bin" for i in range(20000)]
+
+
+def owners(ring):
+    return {key: ring.shard_for(key) for key in KEYS}
+
+
+def test_owners_are_deterministic_for_a_fixed_membership():
+    shards = ["10.0.0.1:5000", "10.0.0.2:5000", "10.0.0.3:5000"]
+    first = owners(HashRing(shards))
+    assert owners(HashRing(shards)) == first
+    assert owners(HashRing(list(reversed(shards)))) == first  # list order doesn't matter
+    assert set(first.values()) == set(shards)
+
+
+def test_keys_are_spread_over_the_shards():
+    shards = [f"10.0.0.{i}:5000" for i in range(1, 5)]
+    counts = {}
+    for shard in owners(HashRing(shards)).values():
+        counts[shard] = counts.get(shard, 0) + 1
+    for count in counts.values():
+        assert 0.5 < count / (len(KEYS) / len(shards)) < 1.5
+
+
+def test_adding_a_shard_moves_about_one_in_n_keys_onto_it():
+    shards = [f"10.0.0.{i}:5000" for i in range(1, 5)]
+    before = owners(HashRing(shards))
+    after = owners(HashRing(shards + ["10.0.0.5:5000"]))
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert {after[key] for key in moved} == {"10.0.0.5:5000"}
+    assert 0.5 < len(moved) / (len(KEYS) / 5) < 1.5
+
+
+def test_removing_a_shard_moves_only_its_keys():
+    shards = [f"10.0.0.{i}:5000" for i in range(1, 5)]
+    before = owners(HashRing(shards))
+    after = owners(HashRing(shards[:-1]))
+    for key in KEYS:
+        if before[key] != shards[-1]:
+            assert after[key] == before[key]
+
+
+def test_single_shard_and_empty_ring():
+    assert HashRing(["m:5000"]).shard_for("anything") == "m:5000"
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_parse_shards_keeps_primary_standby_groups_whole(monkeypatch):
+    assert parse_shards("") == []
+    assert parse_shards(None) == []
+    assert parse_shards(" a:5000|b:5000 , c:5000,, ") == ["a:5000|b:5000", "c:5000"]
+    monkeypatch.setenv("DFS_MASTER_SHARDS", "a:5000|b:5000,c:5000|d:5000")
+    shards = shards_from_env()
+    assert shards == ["a:5000|b:5000", "c:5000|d:5000"]
+    # the group is hashed as a whole, so its owners don't depend on which master is primary
+    assert set(owners(HashRing(shards)).values()) == set(shards)
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    """Three shards, the first with a standby; records where send_to_master_at sends."""
+    shards = ["a:5000|b:5000", "c:5000", "d:5000"]
+    sent = []
+
+    def send_to_master_at(group, message):
+        sent.append((group, message["type"]))
+        return {"status": "ok", "files": [f"{group}/{n}" for n in range(2)]}
+
+    monkeypatch.setattr(dfs, "MASTER_SHARDS", shards)
+    monkeypatch.setattr(dfs, "send_to_master_at", send_to_master_at)
+    monkeypatch.setattr(dfs, "_ring", None)
+    return shards, sent
+
+
+def test_file_requests_go_to_the_owning_shard(cluster):
+    shards, sent = cluster
+    ring = HashRing(shards)
+    for name in KEYS[:200]:
+        dfs.send_to_master({"type": "FILE_INFO", "filename": name})
+    assert sent == [(ring.shard_for(name), "FILE_INFO") for name in KEYS[:200]]
+    assert {group for group, _ in sent} == set(shards)
+
+
+def test_list_files_asks_every_shard_and_other_requests_the_first(cluster):
+    shards, sent = cluster
+    resp = dfs.send_to_master({"type": "LIST_FILES"})
+    assert sent == [(shard, "LIST_FILES") for shard in shards]
+    assert resp["files"] == sorted(f"{s}/{n}" for s in shards for n in range(2))
+    sent.clear()
+    dfs.send_to_master({"type": "NODES_STATUS"})
+    assert sent == [(shards[0], "NODES_STATUS")]
+
+
+def test_ring_follows_the_shard_list(cluster, monkeypatch):
+    shards, sent = cluster
+    monkeypatch.setattr(dfs, "MASTER_SHARDS", [])
+    monkeypatch.setattr(dfs, "MASTER_HOST", "m")
+    monkeypatch.setattr(dfs, "MASTER_PORT", 5000)
+    dfs.send_to_master({"type": "FILE_INFO", "filename": "x"})
+    assert sent == [("m:5000", "FILE_INFO")]
+
+
+def test_group_fails_over_to_the_standby_and_remembers_it(monkeypatch):
+    asked = []
+    answers = {"a:5000": OSError("connection refused"), "b:5000": {"status": "ok"}}
+
+    def request_master(addr_str, message):
+        asked.append(addr_str)
+        answer = answers[addr_str]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(dfs, "_request_master", request_master)
+    monkeypatch.setattr(dfs, "_active_master", {})
+    monkeypatch.setattr(dfs, "MASTER_FAILOVER_WAIT", 0)
+    assert dfs.send_to_master_at("a:5000|b:5000", {"type": "LIST_FILES"}) == {"status": "ok"}
+    assert asked == ["a:5000", "b:5000"]
+    assert dfs.master_candidates("a:5000|b:5000") == ["b:5000", "a:5000"]
+
+    # b stepped down again and a came back as primary
+    asked.clear()
+    answers.update({"a:5000": {"status": "ok"}, "b:5000": {"status": "standby"}})
+    dfs.send_to_master_at("a:5000|b:5000", {"type": "LIST_FILES"})
+    assert asked == ["b:5000", "a:5000"]
+    assert dfs.master_candidates("a:5000|b:5000") == ["a:5000", "b:5000"]
+
+    answers["a:5000"] = OSError("connection refused")
+    with pytest.raises(ConnectionError, match="No primary master"):
+        dfs.send_to_master_at("a:5000|b:5000", {"type": "LIST_FILES"})
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+
+import pytest
+
+import dfs_client_lib as dfs
+
+A, B = "10.0.0.1:9001", "10.0.0.2:9001"
+
+
+class Replica:
+    """
+    Stub for _read_from_node: streams `chunks` after `first_byte` seconds
+    (and once `gate` is set), or raises `error` instead; sets `opens` when
+    called. Like the real read, it marks the attempt started with its first
+    bytes, and a cancelled attempt's next receive fails.
+    """
+
+    def __init__(self, name, chunks=4, first_byte=0.0, between=0.0, gate=None, opens=None, error=None,
+                 fail_after=None):
+        self.chunks = [f"{name}{i}".encode() for i in range(chunks)]
+        self.first_byte = first_byte
+        self.between = between
+        self.gate = gate
+        self.opens = opens
+        self.error = error
+        self.fail_after = fail_after
+        self.called_at = None
+        self.attempt = None
+
+    def read(self, attempt):
+        self.called_at = time.monotonic()
+        self.attempt = attempt
+        if self.opens is not None:
+            self.opens.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        deadline = time.monotonic() + self.first_byte
+        while time.monotonic() < deadline:
+            if attempt.cancelled:
+                raise ConnectionError("Read cancelled")
+            time.sleep(0.001)
+        if self.error is not None:
+            raise self.error
+        for i, chunk in enumerate(self.chunks):
+            if attempt.cancelled:
+                raise ConnectionError("Read cancelled")
+            if i == self.fail_after:
+                raise ConnectionError("Connection closed mid-transfer")
+            attempt.started.set()
+            attempt.append(chunk)
+            time.sleep(self.between)
+        return len(self.chunks)
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    """Replica stubs by address; hedge delay 50 ms."""
+    stubs = {}
+
+    def read_from_node(addr_str, dfs_name, offset, chunks, attempt=None):
+        assert chunks is attempt  # attempts are the sink the read appends to
+        try:
+            return stubs[addr_str].read(attempt)
+        finally:
+            attempt.started.set()
+
+    monkeypatch.setattr(dfs, "_read_from_node", read_from_node)
+    monkeypatch.setattr(dfs, "hedge_delay", lambda: 0.05)
+    return stubs
+
+
+def hedged_read(replicas):
+    sink = []
+    start = time.monotonic()
+    winner = dfs._hedged_read([A, B], "f", sink)
+    return winner, sink, start
+
+
+def test_no_hedge_when_the_first_replica_starts_in_time(replicas):
+    replicas[A] = Replica("a", first_byte=0.005)
+    replicas[B] = Replica("b")
+    winner, sink, _ = hedged_read(replicas)
+    assert winner == A
+    assert sink == replicas[A].chunks
+    assert replicas[B].called_at is None
+
+
+def test_hedge_fires_only_after_the_delay(replicas):
+    replicas[A] = Replica("a", first_byte=1.0)
+    replicas[B] = Replica("b")
+    winner, sink, start = hedged_read(replicas)
+    assert replicas[B].called_at - start >= 0.05
+    assert winner == B
+
+
+def test_first_to_deliver_wins_and_the_other_is_cancelled(replicas):
+    replicas[A] = Replica("a", first_byte=1.0)
+    replicas[B] = Replica("b", between=0.005)
+    winner, sink, _ = hedged_read(replicas)
+    assert winner == B
+    assert sink == replicas[B].chunks
+    assert replicas[A].attempt.cancelled
+    assert not replicas[B].attempt.cancelled
+    assert replicas[B].attempt.race.winner is replicas[B].attempt
+
+
+def test_sink_never_mixes_bytes_from_two_replicas(replicas):
+    for _ in range(20):
+        # A is held back until the hedge goes out, then both stream at once
+        go = threading.Event()
+        replicas[A] = Replica("a", chunks=50, gate=go)
+        replicas[B] = Replica("b", chunks=50, opens=go)
+        winner, sink, _ = hedged_read(replicas)
+        assert sink == replicas[winner].chunks
+        assert replicas[B if winner == A else A].attempt.cancelled
+
+
+def test_primary_failing_before_the_delay_hedges_at_once(replicas, monkeypatch):
+    monkeypatch.setattr(dfs, "hedge_delay", lambda: 5.0)
+    replicas[A] = Replica("a", error=ConnectionRefusedError("refused"))
+    replicas[B] = Replica("b")
+    winner, sink, start = hedged_read(replicas)
+    assert winner == B
+    assert sink == replicas[B].chunks
+    assert time.monotonic() - start < 1.0
+
+
+def test_hedge_failing_falls_back_to_the_slow_primary(replicas):
+    replicas[A] = Replica("a", first_byte=0.2)
+    replicas[B] = Replica("b", error=FileNotFoundError("File not found"))
+    winner, sink, _ = hedged_read(replicas)
+    assert winner == A
+    assert sink == replicas[A].chunks
+
+
+def test_both_replicas_failing_raises_with_both_errors(replicas):
+    replicas[A] = Replica("a", first_byte=0.1, error=ConnectionError("stalled"))
+    replicas[B] = Replica("b", error=FileNotFoundError("File not found"))
+    with pytest.raises(ConnectionError) as info:
+        hedged_read(replicas)
+    assert f"{A}: stalled" in str(info.value)
+    assert f"{B}: File not found" in str(info.value)
+
+
+def test_winner_failing_mid_transfer_keeps_what_arrived(replicas):
+    replicas[A] = Replica("a", chunks=5, fail_after=3)
+    replicas[B] = Replica("b")
+    sink = []
+    with pytest.raises(ConnectionError, match="mid-transfer"):
+        dfs._hedged_read([A, B], "f", sink)
+    assert sink == replicas[A].chunks[:3]  # the caller resumes from here
+    assert replicas[B].called_at is None
+
+
+def test_hedge_delay_follows_the_first_byte_percentile(monkeypatch):
+    samples = deque(maxlen=512)
+    monkeypatch.setattr(dfs, "_first_byte_samples", samples)
+    samples.extend([0.001] * (dfs.HEDGE_MIN_SAMPLES - 1))
+    assert dfs.hedge_delay() == dfs.HEDGE_DEFAULT_DELAY
+    samples.clear()
+    samples.extend(i / 1000 for i in range(1, 101))
+    assert dfs.hedge_delay() == pytest.approx(dfs.HEDGE_PERCENTILE / 1000 + 0.001)
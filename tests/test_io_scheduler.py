@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+
+import dfs_io_scheduler
+from dfs_io_scheduler import IOScheduler, TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.sleep: sleeping just moves the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(dfs_io_scheduler.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(dfs_io_scheduler.time, "sleep", fake.sleep)
+    return fake
+
+
+def hold(scheduler, cls="read", nbytes=1):
+    """Take a slot and keep it until the returned release() is called."""
+    ctx = scheduler.slot(cls, nbytes)
+    ctx.__enter__()
+    return lambda: ctx.__exit__(None, None, None)
+
+
+def queue_up(scheduler, cls, order, label=None, nbytes=1):
+    """Wait for a slot in a thread; appends label (default cls) to order once granted."""
+    def run():
+        with scheduler.slot(cls, nbytes):
+            order.append(cls if label is None else label)
+
+    before = scheduler.queued()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while scheduler.queued() == before:
+        assert time.time() < deadline, f"{cls} operation never queued"
+        time.sleep(0.001)
+    return thread
+
+
+def test_zero_workers_never_queues():
+    scheduler = IOScheduler(workers=0)
+    releases = [hold(scheduler) for _ in range(50)]
+    assert scheduler.stats()["busy"] == 0
+    for release in releases:
+        release()
+
+
+def test_classes_share_contended_slots_by_weight():
+    scheduler = IOScheduler(workers=1)  # read 4, write 2, background 1
+    release = hold(scheduler, "background")
+    order = []
+    threads = []
+    for cls, count in (("background", 3), ("write", 6), ("read", 12)):
+        threads += [queue_up(scheduler, cls, order) for _ in range(count)]
+    release()
+    for thread in threads:
+        thread.join(5)
+    # every stretch of 7 grants is close to 4:2:1, whatever the arrival order
+    weights = {"read": 4, "write": 2, "background": 1}
+    for n in range(7, len(order) + 1, 7):
+        for cls, weight in weights.items():
+            assert abs(order[:n].count(cls) - weight * n // 7) <= 1, (n, order)
+
+
+def test_fifo_within_a_class():
+    scheduler = IOScheduler(workers=1)
+    release = hold(scheduler, "write")
+    order = []
+    threads = [queue_up(scheduler, "write", order, label=i) for i in range(6)]
+    release()
+    for thread in threads:
+        thread.join(5)
+    assert order == list(range(6))
+
+
+def test_bytes_not_operations_are_shared():
+    scheduler = IOScheduler(workers=1, weights={"read": 1, "write": 1})
+    release = hold(scheduler, "write")
+    order = []
+    threads = [queue_up(scheduler, "write", order, nbytes=4096) for _ in range(2)]
+    threads += [queue_up(scheduler, "read", order, nbytes=1024) for _ in range(8)]
+    release()
+    for thread in threads:
+        thread.join(5)
+    # one 4 KiB write costs as much of the share as four 1 KiB reads
+    assert order[:6].count("write") == 1
+
+
+def test_slot_is_released_when_the_operation_raises():
+    scheduler = IOScheduler(workers=1)
+    with pytest.raises(OSError):
+        with scheduler.slot("read", 1):
+            raise OSError("disk gone")
+    assert scheduler.stats()["busy"] == 0
+
+    release = hold(scheduler, "read")
+    order = []
+    waiting = queue_up(scheduler, "read", order)
+
+    def failing():
+        try:
+            with scheduler.slot("write", 1):
+                raise ValueError("bad request")
+        except ValueError:
+            order.append("failed")
+
+    failing_thread = threading.Thread(target=failing, daemon=True)
+    failing_thread.start()
+    while scheduler.queued() < 2:
+        time.sleep(0.001)
+    release()
+    waiting.join(5)
+    failing_thread.join(5)
+    assert sorted(order) == ["failed", "read"]
+    assert scheduler.stats()["busy"] == 0
+
+
+def test_token_bucket_lets_a_client_under_its_rate_through(clock):
+    bucket = TokenBucket(rate=1000, burst=1000)
+    assert bucket.consume(600) == 0
+    clock.now += 0.5  # 500 more tokens, capped at the burst
+    assert bucket.consume(900) == 0
+    assert clock.slept == []
+
+
+def test_token_bucket_delays_a_client_over_its_rate(clock):
+    bucket = TokenBucket(rate=1000, burst=1000)
+    assert bucket.consume(1000) == 0
+    assert bucket.consume(250) == pytest.approx(0.25)
+    assert bucket.consume(500) == pytest.approx(0.5)
+    assert clock.slept == [pytest.approx(0.25), pytest.approx(0.5)]
+    assert not bucket.idle()
+    clock.now += 1
+    assert bucket.idle()
+
+
+def test_client_limit_is_per_client(clock):
+    scheduler = IOScheduler(workers=0, client_rate=1000)
+    with scheduler.slot("read", 1000, "a"):
+        pass
+    with scheduler.slot("read", 1000, "b"):
+        pass
+    assert clock.slept == []
+    with scheduler.slot("read", 500, "a"):
+        pass
+    assert clock.slept == [pytest.approx(0.5)]
+    assert scheduler.stats()["throttled_s"] == pytest.approx(0.5)
+    assert scheduler.stats()["clients_limited"] == 2
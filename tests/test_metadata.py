@@ -0,0 +1,101 @@
+import random
+from collections import Counter
+
+import pytest
+
+import dfs_metadata
+from dfs_metadata import FileTable, NodeInfo
+
+
+def check_sets(table, model):
+    """_sets and replica_sets agree with a plain dict of the same contents."""
+    expected = Counter(tuple(addrs) for addrs in model.values())
+    assert Counter({tuple(addrs): n for addrs, n in table.replica_sets()}) == expected
+    assert sum(table._sets.values()) == len(model)
+    assert all(n > 0 for n in table._sets.values())
+
+
+def test_replica_lists_round_trip_in_order():
+    table = FileTable()
+    lists = [["a:1"], ["b:2", "a:1"], ["a:1", "b:2", "c:3", "d:4", "e:5"], []]
+    for i, addrs in enumerate(lists):
+        table[f"f{i}"] = addrs
+    assert [table[f"f{i}"] for i in range(len(lists))] == lists
+    assert sorted(table.addrs) == ["a:1", "b:2", "c:3", "d:4", "e:5"]  # each address stored once
+    assert table.to_dict() == {f"f{i}": addrs for i, addrs in enumerate(lists)}
+
+
+def test_mapping_behaviour():
+    table = FileTable({"x": ["a:1"]})
+    assert "x" in table and "y" not in table
+    assert len(table) == 1 and list(table) == ["x"]
+    assert table.get("y") is None
+    assert table.pop("x") == ["a:1"]
+    with pytest.raises(KeyError):
+        table["x"]
+    with pytest.raises(KeyError):
+        del table["x"]
+
+
+def test_set_counts_follow_random_updates():
+    rng = random.Random(1)
+    addrs = [f"10.0.0.{i}:7000" for i in range(8)]
+    table, model = FileTable(), {}
+    for step in range(3000):
+        name = f"f{rng.randrange(300)}"
+        if rng.random() < 0.25:
+            table.pop(name, None)
+            model.pop(name, None)
+        else:
+            replicas = rng.sample(addrs, rng.randint(1, 3))
+            table[name] = replicas
+            model[name] = replicas
+        if step % 500 == 0:
+            check_sets(table, model)
+    check_sets(table, model)
+    assert table.to_dict() == model
+
+
+def test_replacing_and_deleting_releases_sets():
+    table = FileTable()
+    table["f"] = ["a:1", "b:2"]
+    table["g"] = ["a:1", "b:2"]
+    assert table.replica_sets() == [(["a:1", "b:2"], 2)]
+    table["f"] = ["b:2", "a:1"]  # same nodes, other order: another list
+    assert sorted(table.replica_sets()) == [(["a:1", "b:2"], 1), (["b:2", "a:1"], 1)]
+    del table["g"]
+    table["f"] = ["b:2", "a:1"]  # unchanged
+    assert table.replica_sets() == [(["b:2", "a:1"], 1)]
+    del table["f"]
+    assert table._sets == {}
+
+
+def test_count_files_counts_per_file():
+    table = FileTable()
+    for i in range(10):
+        table[f"f{i}"] = ["a:1", "b:2"] if i < 7 else ["c:3"]
+    assert table.count_files(lambda addrs: "a:1" in addrs) == 7
+    assert table.count_files(lambda addrs: len(addrs) < 2) == 3
+
+
+def test_clear():
+    table = FileTable({"f": ["a:1"]})
+    table.clear()
+    assert len(table) == 0 and table.addrs == [] and table.replica_sets() == []
+    table["g"] = ["b:2"]
+    assert table["g"] == ["b:2"]
+
+
+def test_too_many_addresses(monkeypatch):
+    monkeypatch.setattr(dfs_metadata, "NODE_BITS", 2)  # room for 3 addresses
+    table = FileTable()
+    table["f"] = ["a:1", "b:2", "c:3"]
+    assert table["f"] == ["a:1", "b:2", "c:3"]
+    with pytest.raises(OverflowError):
+        table["g"] = ["d:4"]
+
+
+def test_node_info_has_no_instance_dict():
+    info = NodeInfo("a:1", 0.0)
+    assert not hasattr(info, "__dict__")
+    assert info.alive and info.fast_files is None and info.socket_uid is None
@@ -0,0 +1,132 @@
+import random
+import time
+from collections import Counter
+
+import pytest
+
+import dfs_client_lib as dfs
+from dfs_client_lib import ReplicaStats
+
+A, B, C, D = "10.0.0.1:9001", "10.0.0.2:9001", "10.0.0.3:9001", "10.0.0.4:9001"
+ROUNDS = 3000
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    """Fresh replica stats and a seeded RNG for order_replicas."""
+    table = {}
+    monkeypatch.setattr(dfs, "_replica_stats", table)
+    monkeypatch.setattr(dfs, "random", random.Random(1234))
+    return table
+
+
+def measure(addr_str, latency, throughput=None, times=1):
+    stats = dfs._stats_for(addr_str)
+    for _ in range(times):
+        stats.record(latency=latency, throughput=throughput)
+    return stats
+
+
+def first_choices(addrs, rounds=ROUNDS, **kwargs):
+    return Counter(dfs.order_replicas(addrs, **kwargs)[0] for _ in range(rounds))
+
+
+def test_order_is_a_permutation_best_first_after_the_pick():
+    measure(A, 0.010)
+    measure(B, 0.020)
+    measure(C, 0.030)
+    measure(D, 0.500)
+    for _ in range(100):
+        order = dfs.order_replicas([D, C, B, A])
+        assert sorted(order) == sorted([A, B, C, D])
+        rest = order[1:]
+        assert rest == sorted(rest, key=lambda a: dfs._replica_stats[a].score())
+    assert dfs.order_replicas([]) == []
+    assert dfs.order_replicas([A]) == [A]
+
+
+def test_seeded_choices_are_reproducible(monkeypatch):
+    measure(A, 0.01)
+    measure(B, 0.01)
+    measure(C, 0.01)
+    orders = []
+    for _ in range(2):
+        monkeypatch.setattr(dfs, "random", random.Random(7))
+        orders.append([dfs.order_replicas([A, B, C]) for _ in range(50)])
+    assert orders[0] == orders[1]
+
+
+def test_much_slower_replica_is_chosen_less_often():
+    measure(A, 0.010)
+    measure(B, 0.012)
+    measure(C, 0.500)
+    counts = first_choices([A, B, C])
+    # the better of two random replicas: the worst one never wins a pair
+    assert counts[C] == 0
+    # but similar replicas share the load instead of one taking it all
+    assert 0.3 < counts[A] / ROUNDS < 0.7
+    assert all(dfs.order_replicas([A, B, C])[-1] == C for _ in range(100))
+
+
+def test_load_spreads_evenly_over_equal_replicas():
+    for addr in (A, B, C, D):
+        measure(addr, 0.01)
+    counts = first_choices([A, B, C, D])
+    for addr in (A, B, C, D):
+        assert 0.15 < counts[addr] / ROUNDS < 0.35
+
+
+def test_unknown_replicas_are_still_explored():
+    measure(A, 0.010)
+    measure(B, 0.010)
+    counts = first_choices([A, B, C])  # C has never been read from
+    assert C not in dfs._replica_stats
+    # unmeasured scores 0, so it wins every pair it is drawn into (2 of 3)
+    assert 0.55 < counts[C] / ROUNDS < 0.78
+
+
+def test_inflight_reads_count_against_a_replica():
+    measure(A, 0.010).inflight = 3
+    measure(B, 0.010)
+    assert dfs._replica_stats[A].score() == pytest.approx(4 * dfs._replica_stats[B].score())
+    assert first_choices([A, B])[B] == ROUNDS
+
+
+def test_latency_ewma_decays_towards_recent_samples():
+    stats = measure(A, 1.0)
+    assert stats.latency == 1.0
+    stats.record(latency=0.0)
+    assert stats.latency == pytest.approx(1 - dfs.EWMA_ALPHA)
+    measure(A, 0.0, times=20)
+    assert stats.latency < 0.001
+    stats.record(throughput=1e6)
+    stats.record(throughput=2e6)
+    assert stats.throughput == pytest.approx(1e6 + dfs.EWMA_ALPHA * 1e6)
+
+
+def test_slow_replica_is_chosen_again_once_it_recovers():
+    measure(A, 0.010)
+    measure(B, 0.500)
+    measure(C, 0.010)
+    assert first_choices([A, B, C])[B] == 0
+    measure(B, 0.005, times=30)  # the old samples have decayed away
+    assert 0.55 < first_choices([A, B, C])[B] / ROUNDS < 0.78
+
+
+def test_failure_penalty_expires():
+    measure(A, 0.010)
+    measure(B, 0.010).failed_at = time.time()
+    assert first_choices([A, B])[B] == 0
+    dfs._replica_stats[B].failed_at = time.time() - dfs.FAILURE_PENALTY - 1
+    assert first_choices([A, B])[B] > 0
+
+
+def test_preferred_replicas_go_first():
+    measure(A, 0.010)
+    measure(B, 0.500)
+    measure(C, 0.020)
+    for _ in range(100):
+        order = dfs.order_replicas([A, B, C], preferred={B})
+        assert order[0] == B
+        assert sorted(order[1:]) == [A, C]
+    assert ReplicaStats().score() == 0.0
@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+
+import pytest
+
+import master_server as ms
+from dfs_deletion import DeletionTracker
+from dfs_metadata import FileTable
+
+
+class FakeConn:
+    """Collects the JSON messages sent to it; raises OSError once closed, like a dropped standby."""
+
+    def __init__(self):
+        self.messages = []
+        self.closed = threading.Event()
+
+    def sendall(self, data):
+        if self.closed.is_set():
+            raise OSError("standby disconnected")
+        for line in data.decode().splitlines():
+            self.messages.append(json.loads(line))
+
+    def sent_seq(self, seq):
+        return any(m.get("seq") == seq for m in list(self.messages))
+
+    def ops(self):
+        return [m.get("op", m.get("status")) for m in self.messages]
+
+
+@pytest.fixture
+def master(monkeypatch):
+    """An empty primary (module state of master_server, restored afterwards)."""
+    monkeypatch.setattr(ms, "nodes", {})
+    monkeypatch.setattr(ms, "node_ids", {})
+    monkeypatch.setattr(ms, "file_table", FileTable())
+    monkeypatch.setattr(ms, "file_locks", {})
+    monkeypatch.setattr(ms, "deletions", DeletionTracker())
+    monkeypatch.setattr(ms, "replica_queues", [])
+    monkeypatch.setattr(ms, "replication_seq", 0)
+    monkeypatch.setattr(ms, "role", "primary")
+    monkeypatch.setattr(ms, "SNAPSHOT_CHUNK", 2)
+    monkeypatch.setattr(ms, "REPLICATION_PING_INTERVAL", 0.01)
+    return ms
+
+
+def request(msg):
+    conn = FakeConn()
+    ms.handle_message(conn, msg)
+    return conn.messages[-1] if conn.messages else None
+
+
+def state():
+    return {
+        "nodes": {nid: info.addr for nid, info in ms.nodes.items()},
+        "node_ids": dict(ms.node_ids),
+        "files": {name: list(addrs) for name, addrs in ms.file_table.items()},
+        "locks": dict(ms.file_locks),
+        "tombstones": {addr: list(names) for addr, names in ms.deletions.tombstones.items()},
+        "seq": ms.replication_seq,
+    }
+
+
+def wait_for(predicate):
+    deadline = time.time() + 5
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.005)
+
+
+def test_standby_replays_snapshot_and_mutations_to_the_primary_state(master, monkeypatch):
+    a, b, c = "127.0.0.1:7001", "127.0.0.1:7002", "127.0.0.1:7003"
+    for i, addr in enumerate((a, b, c), 1):
+        request({"type": "REGISTER_NODE", "node_id": f"node{i}", "addr": addr})
+    for k in range(5):
+        request({"type": "UPLOAD_DONE", "filename": f"f{k}", "nodes": [a, b]})
+    request({"type": "LOCK_REQUEST", "filename": "f0", "client_id": "c1"})
+    request({"type": "DELETE_REQUEST", "filenames": ["f1", "f2"]})
+
+    standby = FakeConn()
+    thread = threading.Thread(target=ms.serve_replica, args=(standby,), daemon=True)
+    thread.start()
+    wait_for(lambda: "snapshot_done" in standby.ops())
+
+    # mutations after the snapshot reach the standby through the stream
+    request({"type": "UPLOAD_DONE", "filename": "f3", "nodes": [b, c]})
+    request({"type": "UPLOAD_DONE", "filename": "new", "nodes": [c]})
+    request({"type": "LOCK_RELEASE", "filename": "f0", "client_id": "c1"})
+    request({"type": "LOCK_REQUEST", "filename": "new", "client_id": "c2"})
+    request({"type": "DELETE_REQUEST", "filename": "f4"})
+    assert request({"type": "HEARTBEAT", "node_id": "node1", "deleted": ["f1"]})["delete"] == ["f2", "f4"]
+    request({"type": "REGISTER_NODE", "node_id": "node4", "addr": "127.0.0.1:7004"})
+    upload = request({"type": "UPLOAD_REQUEST", "filename": "f1"})
+    assert upload["nodes"]
+    primary = state()
+    wait_for(lambda: standby.sent_seq(primary["seq"]))
+    standby.closed.set()
+    thread.join(5)
+    assert not ms.replica_queues
+
+    # a fresh standby applies everything it was sent
+    for name in ("nodes", "node_ids", "file_locks"):
+        monkeypatch.setattr(ms, name, {})
+    monkeypatch.setattr(ms, "file_table", FileTable())
+    monkeypatch.setattr(ms, "deletions", DeletionTracker())
+    monkeypatch.setattr(ms, "replication_seq", 0)
+    for message in standby.messages:
+        ms.apply_replicated(message)
+    assert state() == primary
+    assert standby.ops()[0] == "snapshot"
+    assert standby.ops().count("snapshot_files") == 2  # 3 files, 2 per chunk
+
+
+def test_snapshot_reflects_mutations_made_while_it_is_sent(master, monkeypatch):
+    addr = "127.0.0.1:7001"
+    request({"type": "REGISTER_NODE", "node_id": "node1", "addr": addr})
+    for k in range(6):
+        request({"type": "UPLOAD_DONE", "filename": f"f{k}", "nodes": [addr]})
+
+    standby = FakeConn()
+    sent = threading.Event()
+    original = standby.sendall
+
+    def sendall(data):
+        original(data)
+        # change the files between the head message and the chunks
+        if standby.ops() == ["snapshot"] and not sent.is_set():
+            sent.set()
+            request({"type": "DELETE_REQUEST", "filenames": ["f0", "f5"]})
+            request({"type": "UPLOAD_DONE", "filename": "f9", "nodes": [addr]})
+
+    standby.sendall = sendall
+    thread = threading.Thread(target=ms.serve_replica, args=(standby,), daemon=True)
+    thread.start()
+    wait_for(lambda: "snapshot_done" in standby.ops())
+    primary = state()
+    wait_for(lambda: standby.sent_seq(primary["seq"]))
+    standby.closed.set()
+    thread.join(5)
+
+    monkeypatch.setattr(ms, "nodes", {})
+    monkeypatch.setattr(ms, "node_ids", {})
+    monkeypatch.setattr(ms, "file_locks", {})
+    monkeypatch.setattr(ms, "file_table", FileTable())
+    monkeypatch.setattr(ms, "deletions", DeletionTracker())
+    for message in standby.messages:
+        ms.apply_replicated(message)
+    assert state() == primary
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+
+import pytest
+
+import dfs_client_lib as dfs
+from dfs_client_lib import TransferManager
+
+
+class FakeDFS:
+    """The parts of the client API sync_directory uses, over a dict of name -> bytes."""
+
+    def __init__(self):
+        self.files = {}
+        self.uploads = []   # (name, delta)
+        self.deleted = []
+        self.fail = {}      # name -> error message
+
+    def list_files(self):
+        return {"status": "ok", "files": sorted(self.files)}
+
+    def upload_file(self, path, resume=False, delta=None, lock_hold=None):
+        name = os.path.basename(path)
+        if name in self.fail:
+            return {"status": "error", "message": self.fail[name]}
+        with open(path, "rb") as f:
+            self.files[name] = f.read()
+        self.uploads.append((name, bool(delta)))
+        return {"status": "ok"}
+
+    def delete_files(self, filenames):
+        for name in filenames:
+            del self.files[name]
+        self.deleted += filenames
+        return {"status": "ok", "deleted": len(filenames), "missing": []}
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    fake = FakeDFS()
+    monkeypatch.setattr(dfs, "list_files", fake.list_files)
+    monkeypatch.setattr(dfs, "upload_file", fake.upload_file)
+    monkeypatch.setattr(dfs, "delete_files", fake.delete_files)
+    return fake
+
+
+def write(folder, name, data, mtime=None):
+    path = folder / name
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+    return path
+
+
+def sync(folder, **kwargs):
+    return dfs.sync_directory(str(folder), workers=2, **kwargs)
+
+
+def uploaded(remote):
+    names = sorted(name for name, _ in remote.uploads)
+    remote.uploads.clear()
+    return names
+
+
+def test_first_sync_uploads_everything_but_the_manifest_and_subfolders(tmp_path, remote):
+    for name in ("a", "b", "c"):
+        write(tmp_path, name, name.encode() * 100)
+    (tmp_path / "sub").mkdir()
+    write(tmp_path / "sub", "d", b"d")
+    resp = sync(tmp_path)
+    assert resp["status"] == "ok"
+    assert resp["uploaded"] == 3
+    assert uploaded(remote) == ["a", "b", "c"]
+    assert remote.files["a"] == b"a" * 100
+    assert (tmp_path / dfs.SYNC_MANIFEST).exists()
+
+
+def test_unchanged_files_are_skipped_without_being_read(tmp_path, remote, monkeypatch):
+    for name in ("a", "b"):
+        write(tmp_path, name, name.encode())
+    sync(tmp_path)
+    uploaded(remote)
+
+    def unexpected(path):
+        raise AssertionError(f"{path} was hashed")
+
+    monkeypatch.setattr(dfs, "_file_sha256", unexpected)
+    resp = sync(tmp_path)
+    assert resp["status"] == "ok"
+    assert (resp["uploaded"], resp["unchanged"]) == (0, 2)
+    assert uploaded(remote) == []
+
+
+def test_new_mtime_with_the_same_hash_is_not_uploaded_again(tmp_path, remote):
+    write(tmp_path, "a", b"same", mtime=1_000_000_000)
+    write(tmp_path, "b", b"old", mtime=1_000_000_000)
+    sync(tmp_path)
+    uploaded(remote)
+
+    write(tmp_path, "a", b"same", mtime=2_000_000_000)  # touched
+    write(tmp_path, "b", b"new", mtime=2_000_000_000)   # edited
+    resp = sync(tmp_path)
+    assert (resp["uploaded"], resp["rehashed"]) == (1, 1)
+    assert uploaded(remote) == ["b"]
+    assert remote.files["b"] == b"new"
+    # the new mtime is recorded, so the next sync doesn't even hash "a"
+    resp = sync(tmp_path)
+    assert (resp["uploaded"], resp["rehashed"], resp["unchanged"]) == (0, 0, 2)
+
+
+def test_file_missing_from_the_dfs_is_uploaded_again(tmp_path, remote):
+    write(tmp_path, "a", b"a")
+    sync(tmp_path)
+    uploaded(remote)
+    del remote.files["a"]  # deleted by another client
+    assert sync(tmp_path)["uploaded"] == 1
+    assert uploaded(remote) == ["a"]
+
+
+def test_large_changed_files_go_as_deltas(tmp_path, remote, monkeypatch):
+    monkeypatch.setattr(dfs, "SYNC_DELTA_MIN_BYTES", 10)
+    write(tmp_path, "big", b"x" * 20, mtime=1_000_000_000)
+    write(tmp_path, "small", b"x", mtime=1_000_000_000)
+    sync(tmp_path)
+    assert sorted(remote.uploads) == [("big", False), ("small", False)]  # new in the DFS
+    remote.uploads.clear()
+    write(tmp_path, "big", b"y" * 20, mtime=2_000_000_000)
+    write(tmp_path, "small", b"y", mtime=2_000_000_000)
+    sync(tmp_path)
+    assert sorted(remote.uploads) == [("big", True), ("small", False)]
+
+
+def test_delete_removes_only_synced_files_gone_locally(tmp_path, remote):
+    remote.files["someone-elses"] = b"keep"
+    for name in ("a", "b", "c"):
+        write(tmp_path, name, name.encode())
+    sync(tmp_path)
+    (tmp_path / "b").unlink()
+    (tmp_path / "c").unlink()
+
+    resp = sync(tmp_path)  # without delete=True nothing goes
+    assert resp["deleted"] == 0
+    assert sorted(remote.files) == ["a", "b", "c", "someone-elses"]
+
+    resp = sync(tmp_path, delete=True)
+    assert resp["status"] == "ok"
+    assert resp["deleted"] == 2
+    assert sorted(remote.deleted) == ["b", "c"]
+    assert sorted(remote.files) == ["a", "someone-elses"]
+    # forgotten by the manifest: nothing left to delete next time
+    assert sync(tmp_path, delete=True)["deleted"] == 0
+
+
+def test_failures_are_reported_per_file_and_retried(tmp_path, remote):
+    for name in ("a", "b", "c"):
+        write(tmp_path, name, name.encode())
+    remote.fail = {"b": "No alive storage nodes", "c": "Disk busy"}
+    resp = sync(tmp_path)
+    assert resp["status"] == "error"
+    assert resp["uploaded"] == 1
+    assert sorted(resp["failed"]) == [("b", "No alive storage nodes"), ("c", "Disk busy")]
+    assert "1 uploaded" in resp["message"] and "2 failed" in resp["message"]
+    uploaded(remote)
+
+    remote.fail = {}
+    resp = sync(tmp_path)
+    assert resp["status"] == "ok"
+    assert uploaded(remote) == ["b", "c"]
+
+
+def test_transfer_manager_counts_results_per_file():
+    progress = []
+    done = []
+    with TransferManager(workers=2, progress=progress.append) as tm:
+        tm.submit("ok", 100, lambda: {"status": "ok"}, on_done=done.append)
+        tm.submit("skipped", 50, lambda: {"status": "ok", "bytes": 0})
+        tm.submit("refused", 10, lambda: {"status": "error", "message": "Not found"})
+        tm.submit("raised", 10, lambda: 1 / 0)
+    stats = tm.stats()
+    assert (stats["files"], stats["done"], stats["failed"]) == (4, 4, 2)
+    assert (stats["bytes"], stats["bytes_done"]) == (170, 100)
+    assert sorted(tm.failed) == [("raised", "division by zero"), ("refused", "Not found")]
+    assert done == [{"status": "ok"}]
+    assert progress[-1]["done"] == 4  # the final report
+
+
+def test_transfer_manager_runs_at_most_workers_transfers_at_once():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def transfer():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.005)
+        with lock:
+            running -= 1
+        return {"status": "ok"}
+
+    with TransferManager(workers=3) as tm:
+        for i in range(30):
+            tm.submit(f"f{i}", 1, transfer)
+    assert peak <= 3
+    assert tm.stats()["done"] == 30
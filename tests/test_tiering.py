@@ -0,0 +1,87 @@
+import pytest
+
+from dfs_tiering import AccessTracker, plan_moves
+
+
+def test_score_halves_every_half_life():
+    tracker = AccessTracker(half_life=10)
+    tracker.record("a", now=100)
+    assert tracker.score("a", now=100) == pytest.approx(1.0)
+    assert tracker.score("a", now=110) == pytest.approx(0.5)
+    assert tracker.score("a", now=130) == pytest.approx(0.125)
+    assert tracker.score("missing", now=100) == 0.0
+
+
+def test_reads_add_up_with_their_own_decay():
+    tracker = AccessTracker(half_life=10)
+    tracker.record("a", now=0)
+    tracker.record("a", now=10)
+    tracker.record("a", now=10, weight=2.0)
+    assert tracker.score("a", now=10) == pytest.approx(0.5 + 1 + 2)
+    assert tracker.scores(now=20) == {"a": pytest.approx(3.5 / 2)}
+
+
+def test_large_timestamps_do_not_overflow():
+    tracker = AccessTracker(half_life=1)
+    for t in range(5):
+        tracker.record("a", now=1e9 + t)
+    assert tracker.score("a", now=1e9 + 4) == pytest.approx(1 + 1 / 2 + 1 / 4 + 1 / 8 + 1 / 16)
+
+
+def test_prune_and_forget():
+    tracker = AccessTracker(half_life=10)
+    tracker.record("old", now=0)
+    tracker.record("new", now=100)
+    tracker.record("gone", now=100)
+    tracker.forget("gone")
+    assert tracker.prune(0.01, now=100) == 1
+    assert len(tracker) == 1
+    assert tracker.score("new", now=100) == pytest.approx(1.0)
+
+
+def test_save_and_load_with_another_half_life(tmp_path):
+    path = str(tmp_path / "access.json")
+    saved = AccessTracker(half_life=10)
+    saved.record("a", now=1000)
+    saved.save(path)
+    loaded = AccessTracker(half_life=20)
+    loaded.load(path)
+    assert loaded.score("a", now=1000) == pytest.approx(1.0)
+    assert loaded.score("a", now=1020) == pytest.approx(0.5)
+    loaded.load(str(tmp_path / "missing.json"))  # ignored
+    assert len(loaded) == 1
+
+
+def test_cold_fast_files_are_demoted():
+    demote, promote = plan_moves({"hot": 10, "cold": 10}, {}, {"hot": 5, "cold": 0.5},
+                                 fast_bytes=100, promote_score=4, demote_score=1)
+    assert (demote, promote) == (["cold"], [])
+
+
+def test_hottest_capacity_files_are_promoted_while_they_fit():
+    capacity = {"a": 40, "b": 40, "c": 40, "lukewarm": 1, "huge": 500}
+    scores = {"a": 9, "b": 8, "c": 7, "lukewarm": 3, "huge": 10}
+    demote, promote = plan_moves({}, capacity, scores, fast_bytes=100, promote_score=4, demote_score=1)
+    assert demote == []
+    assert promote == ["a", "b"]
+
+
+def test_over_full_fast_tier_sheds_coldest_first():
+    fast = {"x": 50, "y": 50, "z": 50}
+    scores = {"x": 3, "y": 2, "z": 5}
+    demote, promote = plan_moves(fast, {}, scores, fast_bytes=100, promote_score=4, demote_score=1)
+    assert (demote, promote) == (["y"], [])
+
+
+def test_hotter_file_displaces_colder_resident_only():
+    fast = {"warm": 60, "hotter": 40}
+    capacity = {"new": 50}
+    scores = {"warm": 2, "hotter": 20, "new": 10}
+    demote, promote = plan_moves(fast, capacity, scores, fast_bytes=100, promote_score=4, demote_score=1)
+    assert (demote, promote) == (["warm"], ["new"])
+
+    scores["new"] = 1.5  # not hot enough to be promoted at all
+    assert plan_moves(fast, capacity, scores, 100, 4, 1) == ([], [])
+
+    scores.update(new=10, warm=15)  # every resident is hotter: nothing moves
+    assert plan_moves(fast, capacity, scores, 100, 4, 1) == ([], [])
@@ -0,0 +1,119 @@
+from collections import deque
+
+import pytest
+
+import dfs_tracing
+
+
+@pytest.fixture(autouse=True)
+def buffer(monkeypatch):
+    """A fresh span buffer and no reporters (e.g. dfs_client_lib's) per test."""
+    spans = deque(maxlen=dfs_tracing.BUFFER_SPANS)
+    monkeypatch.setattr(dfs_tracing, "_spans", spans)
+    monkeypatch.setattr(dfs_tracing, "REPORTERS", [])
+    return spans
+
+
+def test_unsampled_operations_carry_and_record_nothing():
+    with dfs_tracing.trace("upload", sample=False) as root:
+        assert root is None
+        header = dfs_tracing.inject({"type": "UPLOAD_REQUEST"})
+        with dfs_tracing.span("step") as s:
+            assert s is None
+    assert "trace" not in header
+    with dfs_tracing.server_span(header, "UPLOAD_REQUEST", "master") as s:
+        assert s is None
+    assert dfs_tracing.dump() == []
+
+
+def test_context_propagates_through_inject_and_server_span():
+    with dfs_tracing.trace("download", sample=True) as root:
+        with dfs_tracing.span("master DOWNLOAD_REQUEST") as child:
+            header = dfs_tracing.inject({"type": "DOWNLOAD_REQUEST"})
+        assert header["trace"] == {"id": root.trace_id, "parent": child.span_id}
+        # the receiving process only has the header
+        with dfs_tracing.server_span(header, "DOWNLOAD_REQUEST", "master:5000") as server:
+            dfs_tracing.add("lock_wait_ms", 1.5)
+            dfs_tracing.add("lock_wait_ms", 1.0)
+    assert server.trace_id == root.trace_id
+    assert server.parent_id == child.span_id
+    assert server.attrs == {"lock_wait_ms": 2.5}
+    spans = dfs_tracing.dump(root.trace_id)
+    assert [s["name"] for s in spans] == ["master DOWNLOAD_REQUEST", "DOWNLOAD_REQUEST", "download"]
+    assert dfs_tracing.inject({}) == {}  # the context ends with the trace
+
+
+def test_nested_trace_is_a_child_span():
+    with dfs_tracing.trace("sync", sample=True) as root:
+        with dfs_tracing.trace("upload") as inner:
+            assert inner.parent_id == root.span_id
+            assert inner.trace_id == root.trace_id
+
+
+def test_errors_are_recorded_on_the_span():
+    with pytest.raises(KeyError):
+        with dfs_tracing.trace("upload", sample=True):
+            raise KeyError("x")
+    assert dfs_tracing.dump()[0]["attrs"]["error"] == "KeyError('x')"
+
+
+def test_reporters_get_each_finished_trace_once():
+    reports = []
+    dfs_tracing.REPORTERS.append(reports.append)
+    dfs_tracing.REPORTERS.append(lambda spans: 1 / 0)  # a failing reporter is ignored
+    with dfs_tracing.trace("upload", sample=True) as root:
+        with dfs_tracing.span("a"):
+            pass
+        with dfs_tracing.span("b"):
+            pass
+    assert len(reports) == 1
+    assert [s["name"] for s in reports[0]] == ["a", "b", "upload"]
+    assert all(s["trace_id"] == root.trace_id for s in reports[0])
+
+
+def test_ring_buffer_keeps_the_latest_spans(monkeypatch):
+    monkeypatch.setattr(dfs_tracing, "_spans", deque(maxlen=3))
+    for i in range(5):
+        with dfs_tracing.trace(f"op{i}", sample=True):
+            pass
+    dfs_tracing.record([{"trace_id": "t", "span_id": "s", "parent_id": None, "name": "reported",
+                         "service": "client", "start": 0, "duration_ms": 1, "attrs": {}}])
+    assert [s["name"] for s in dfs_tracing.dump()] == ["op3", "op4", "reported"]
+
+
+def span(span_id, parent_id, name, start, duration_ms, service="client", **attrs):
+    return {"trace_id": "t1", "span_id": span_id, "parent_id": parent_id, "name": name,
+            "service": service, "start": start, "duration_ms": duration_ms, "attrs": attrs}
+
+
+def test_timeline_nests_children_in_start_order():
+    spans = [
+        span("n", "m", "UPLOAD_FILE", 100.010, 5.0, service="node:node1", bytes_in=10),
+        span("r", None, "upload", 100.0, 20.0),
+        span("m", "r", "master UPLOAD_REQUEST", 100.002, 3.0),
+        span("u", "r", "upload to node", 100.008, 8.0),
+        span("n", "m", "UPLOAD_FILE", 100.010, 5.0, service="node:node1", bytes_in=10),  # duplicate
+        span("x", "gone", "orphan", 100.001, 1.0),  # parent not collected
+    ]
+    lines = dfs_tracing.timeline(spans)
+    assert lines[0].split() == ["offset", "ms", "dur", "ms", "service", "span"]
+    rows = [line.split() for line in lines[1:]]
+    assert [row[3:] for row in rows] == [
+        ["upload"],
+        ["master", "UPLOAD_REQUEST"],
+        ["UPLOAD_FILE", "bytes_in=10"],
+        ["upload", "to", "node"],
+        ["orphan"],
+    ]
+    assert [row[0] for row in rows] == ["0.0", "2.0", "10.0", "8.0", "1.0"]
+    assert "    UPLOAD_FILE" in lines[3]  # two levels deep
+    assert dfs_tracing.timeline([]) == []
+
+
+def test_summarize_one_entry_per_trace():
+    spans = [span("r", None, "upload", 10.0, 20.0), span("c", "r", "child", 10.5, 1.0),
+             dict(span("o", None, "download", 5.0, 3.0), trace_id="t2")]
+    assert dfs_tracing.summarize(spans) == [
+        {"trace_id": "t2", "name": "download", "duration_ms": 3.0, "spans": 1, "start": 5.0},
+        {"trace_id": "t1", "name": "upload", "duration_ms": 20.0, "spans": 2, "start": 10.0},
+    ]